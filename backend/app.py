@@ -1,57 +1,116 @@
 
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Request, Response, abort, g, has_request_context, jsonify, make_response, request, stream_with_context
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
-from werkzeug.utils import secure_filename 
+from sqlalchemy import case, func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
+import hmac
+import io
 import json
-import re
-import PyPDF2 
-import requests
+import logging
+import math
 import os
+import time
 
-import google.generativeai as genai
-import groq
-import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import wraps
+
+from cache import MISSING, cache_from_env, make_cache_key, normalize_text
+from chunking import merge_qa_pairs, pick_evenly, split_into_chunks
+from compression import Compressor
+from fidelity import estimate_fidelity, format_fidelity
+from jobs import FINISHED_STATES, JobRunner, serialize_job
+from json_provider import install_json_provider
+from logs import configure_logging
+from llm import GeminiProvider, GroqProvider, LazyClient, LLMRouter, LLMUnavailable, StubProvider
+from db_pool import engine_options, env_flag, install_pool_metrics, pool_metrics
+from metrics import (http_request_db_queries, http_request_db_seconds, http_request_seconds,
+                     install_query_metrics, registry)
+from migrations import upgrade_database
+from note_patch import PatchError, apply_patch
+from ratelimit import RateLimiter
+from pdf_ingest import PDF_MAX_BYTES, InvalidPdf, PdfTooLarge, extract_pdf_text, read_limited
+from pagination import NEXT_CURSOR_HEADER, ListRequestError, fetch_page, parse_limit
+from search import SEARCH_KINDS, delete_documents, html_to_text, replace_documents, search_documents_for_user
+from serializers import row_to_dict, rows_to_dicts
+from singleflight import SingleFlight
+from structured_output import parse_qa_pairs
 
 load_dotenv()
+logger = logging.getLogger('thinkpal')
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-app.config['SESSION_COOKIE_SAMESITE'] = 'None'
-app.config['SESSION_COOKIE_SECURE'] = True
+# Routes, hooks and CLI commands are registered on this blueprint; create_app() (at the
+# bottom of this file) builds an app around it. cli_group=None keeps `flask db-upgrade` top level.
+bp = Blueprint('thinkpal', __name__, cli_group=None)
 
+# Number of reverse proxies in front of the app, so request.remote_addr is the client's IP
+# from X-Forwarded-For rather than the proxy's. Rate limits key on it. Render runs one proxy
+# in front of every web service and sets RENDER, so that deployment gets 1 by default.
+PROXY_COUNT = int(os.getenv('PROXY_COUNT', 1 if os.getenv('RENDER') else 0))
 
 frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
-CORS(
-    app,
-    resources={r"/*": {
-        "origins": [frontend_url, "https://app-dev-project-frontend.onrender.com"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True,
-        "expose_headers": ["Content-Type", "Authorization"]
-    }}
-)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
+
+# gzip/brotli for large JSON bodies, negotiated per request (see compression.py)
+compressor = Compressor.from_env()
+
+db = SQLAlchemy()
+
+def count_request_query(seconds):
+    # Per-request totals, reported by record_request_metrics
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0.0) + seconds
+
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'  
+login_manager.login_view = 'thinkpal.login'
+
+
+class CachedUser(UserMixin):
+    """
+    The fields current_user needs, loaded from user_cache instead of the database.
+    Routes that change a user should load the User model and call invalidate_user()
+    """
+    def __init__(self, user_id, username, role):
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+
+    def get_id(self):
+        return str(self.user_id)
+
+
+# invalidate_user() only reaches other workers through the shared tier. With USER_CACHE_DB set,
+# lookups skip the per-process tier, so a role change or deletion applies on every worker on the
+# box at once. Without it each worker keeps its own copy, and a demoted or deleted user keeps
+# their old role on the other workers for up to USER_CACHE_TTL seconds.
+user_cache = cache_from_env('user', 'USER', default_ttl=60, default_size=1024, shared_only=True)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    cached = user_cache.get(str(user_id))
+    if cached is MISSING:
+        row = (
+            db.session.query(User.user_id, User.username, User.role)
+            .filter(User.user_id == int(user_id))
+            .first()
+        )
+        if not row:
+            return None
+        cached = row_to_dict(row)
+        user_cache.set(str(user_id), cached)
+    return CachedUser(**cached)
 
 
 
@@ -59,9 +118,19 @@ def load_user(user_id):
 def test_db_connection():
     try:
         db.session.execute(text('SELECT 1'))
-        print('Database connection successful!')
+        logger.info('Database connection successful')
     except Exception as e:
-        print(f'Database connection failed: {e}')
+        logger.error('Database connection failed: %s', e)
+
+
+def release_db_connection():
+    """
+    End the session's transaction so its pooled connection is free while we wait on a slow
+    upstream call. With threaded/gevent workers (see gunicorn.conf.py) hundreds of AI requests
+    can be waiting at once, far more than the pool has connections. Call only with nothing
+    unsaved; loaded objects stay in the session and reload on their next access.
+    """
+    db.session.rollback()
 
 class User(UserMixin, db.Model):
     __tablename__ = 'tbl_users'
@@ -88,12 +157,20 @@ class Title(db.Model):
 
     notes = db.relationship('Note', backref='title', lazy=True, cascade="all, delete", passive_deletes=True)
 
+    # Both start with user_id, so they also serve plain "WHERE user_id = ?" lookups
+    __table_args__ = (
+        db.Index('ix_tbl_titles_user_id_date_accessed', 'user_id', 'date_accessed'),
+        db.Index('ix_tbl_titles_user_id_note_title', 'user_id', 'note_title'),
+    )
+
 
 class Note(db.Model):
     __tablename__ = 'tbl_note'
     note_num = db.Column(db.Integer, primary_key=True)
-    title_num = db.Column(db.Integer, db.ForeignKey('tbl_titles.title_num', ondelete="CASCADE"), nullable=False)
+    title_num = db.Column(db.Integer, db.ForeignKey('tbl_titles.title_num', ondelete="CASCADE"), nullable=False, index=True)
     notes = db.Column(db.Text, nullable=False)
+    # Bumped on every content change; PUT/PATCH can send it back to detect concurrent edits
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
 
     quizzes = db.relationship('Quiz', backref='note', lazy=True, cascade="all, delete", passive_deletes=True)
 
@@ -101,7 +178,7 @@ class Note(db.Model):
 class Quiz(db.Model):
     __tablename__ = 'tbl_quiz'
     quiz_num = db.Column(db.Integer, primary_key=True)
-    note_num = db.Column(db.Integer, db.ForeignKey('tbl_note.note_num', ondelete="CASCADE"), nullable=False)
+    note_num = db.Column(db.Integer, db.ForeignKey('tbl_note.note_num', ondelete="CASCADE"), nullable=False, index=True)
     quiz_title = db.Column(db.String(100), nullable=False)
     question = db.Column(db.Text, nullable=False)
     answer = db.Column(db.Text, nullable=False)
@@ -110,7 +187,7 @@ class Quiz(db.Model):
 class Task(db.Model):
     __tablename__ = 'tbl_tasks'
     task_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('tbl_users.user_id', ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('tbl_users.user_id', ondelete="CASCADE"), nullable=False, index=True)
 
     task_name = db.Column(db.String(255), nullable=False)
     task_details = db.Column(db.Text, nullable=True)
@@ -122,64 +199,191 @@ class Task(db.Model):
     date_completed = db.Column(db.DateTime, nullable=True)
 
 
-# Test DB connection at startup with app context
-with app.app_context():
-    db.create_all()
+class UserVersion(db.Model):
+    __tablename__ = 'tbl_user_versions'
+    user_id = db.Column(db.Integer, db.ForeignKey('tbl_users.user_id', ondelete="CASCADE"), primary_key=True)
+    # Bumped in the same transaction as every change to the user's titles, notes, quizzes or tasks
+    version = db.Column(db.Integer, nullable=False)
+    # Unix seconds, raised by at least one on every bump so Last-Modified (1 s resolution) still
+    # tells two changes in the same second apart
+    modified_at = db.Column(db.Integer, nullable=False)
+
+
+class Job(db.Model):
+    __tablename__ = 'tbl_jobs'
+    job_id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('tbl_users.user_id', ondelete="CASCADE"), nullable=True)
+    kind = db.Column(db.String(50), nullable=False)
+
+    # "queued", "running", "done" or "failed"
+    status = db.Column(db.String(20), default="queued", nullable=False)
+    payload = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    date_created = db.Column(db.DateTime, default=datetime.now)
+    date_started = db.Column(db.DateTime, nullable=True)
+    date_completed = db.Column(db.DateTime, nullable=True)
+
+
+# Creating and upgrading the schema is an explicit step: gunicorn runs `flask --app app db-upgrade`
+# before starting workers (see gunicorn.conf.py); set DB_UPGRADE_ON_STARTUP=1 for local dev (see create_app).
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations (see migrations.py)."""
+    applied = upgrade_database(db.engine, db.metadata)
+    print(f"Applied migrations: {applied or 'none, schema is up to date'}")
+
+
+@bp.cli.command('db-check')
+def db_check_command():
+    """Test the database connection."""
     test_db_connection()
 
 
+@bp.cli.command('jobs-sweep')
+def jobs_sweep_command():
+    """Fail timed out jobs and delete expired ones (see jobs.py)."""
+    failed, deleted = job_runner.sweep()
+    print(f'Timed out jobs marked failed: {failed}; expired jobs deleted: {deleted}')
+
+# Worker pool for slow AI calls (see /jobs routes)
+job_runner = JobRunner(db, Job)
 
-# Initialize Gemini Pro model if API key is set
+
+# The SDKs are imported and their clients built on the first AI call (see LazyClient),
+# which keeps roughly a second of imports out of every worker's startup.
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel('gemini-1.5-flash-8b')
-        print("Gemini 1.5 Flash-8B model initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing Gemini model: {e}")
-        print("Ensure your API key is correct and the model name is valid for your region.")
-        gemini_model = None
-else:
-    print("GEMINI_API_KEY not found in environment variables. Gemini features will be unavailable.")
-    gemini_model = None
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-8b'
+if not GEMINI_API_KEY:
+    logger.warning('GEMINI_API_KEY not set; Gemini features are unavailable')
+
+
+def make_gemini_model():
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    logger.info('Gemini model %s initialized', GEMINI_MODEL_NAME)
+    return model
+
 
 # --- Groq AI Client ---
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-groq_client = None
-if GROQ_API_KEY:
-    try:
-        groq_client = groq.Groq(api_key=GROQ_API_KEY)
-        GROQ_MODEL_NAME = "openai/gpt-oss-120b" 
-        print(f"Groq client initialized with model: {GROQ_MODEL_NAME}.")
-    except Exception as e:
-        print(f"Error initializing Groq client: {e}")
-        groq_client = None
-        GROQ_MODEL_NAME = None
-else:
-    print("GROQ_API_KEY not found in environment variables. Groq AI features will be unavailable.")
+GROQ_MODEL_NAME = "openai/gpt-oss-120b"
+if not GROQ_API_KEY:
+    logger.warning('GROQ_API_KEY not set; Groq AI features are unavailable')
+
 
-@app.route('/')
+def make_groq_client():
+    import groq
+    # Retries are done by llm_router, so the SDK's own are turned off
+    client = groq.Groq(api_key=GROQ_API_KEY, max_retries=0)
+    logger.info('Groq client initialized with model %s', GROQ_MODEL_NAME)
+    return client
+
+
+# All AI calls go through this chain: Groq, falling back to Gemini, with retries, circuit
+# breakers and optional hedging (see llm.py). LLM_PROVIDERS=stub runs fully offline.
+llm_router = LLMRouter.from_env({
+    'groq': GroqProvider(LazyClient(make_groq_client), GROQ_MODEL_NAME) if GROQ_API_KEY else None,
+    'gemini': GeminiProvider(LazyClient(make_gemini_model), GEMINI_MODEL_NAME) if GEMINI_API_KEY else None,
+    'stub': StubProvider.from_env(),
+})
+LLM_NOT_CONFIGURED = 'No AI provider initialized. Check GROQ_API_KEY / GEMINI_API_KEY.'
+
+@bp.route('/')
 def home():
     return "Server is running!"
 
 # Utility: Save AI-generated quizzes to DB
+def quiz_rows(note_num, quiz_title, qa_pairs):
+    return [
+        {
+            'note_num': note_num,
+            'quiz_title': quiz_title,
+            'question': pair['question'],
+            'answer': pair['answer']
+        } for pair in qa_pairs
+    ]
+
 def save_ai_quiz_to_db(note_num, quiz_title, qa_pairs):
-    for pair in qa_pairs:
-        quiz = Quiz(
-            note_num=note_num, 
-            quiz_title=quiz_title,
-            question=pair['question'], 
-            answer=pair['answer'])
-        db.session.add(quiz)
+    rows = quiz_rows(note_num, quiz_title, qa_pairs)
+    if rows:
+        # One executemany instead of an ORM add (and flush) per pair
+        db.session.execute(insert(Quiz), rows)
+        reindex_quizzes([note_num])
+        # Also runs in the job worker, so the owner comes from the note rather than current_user
+        owner = db.session.query(Title.user_id).join(Note).filter(Note.note_num == note_num).scalar()
+        bump_user_version(owner)
     db.session.commit()
 
+# Bump this whenever the quiz prompt changes so stale cached quizzes are not reused.
+QUIZ_PROMPT_VERSION = 3
+
+# Cache of generated QA pairs keyed by note content, prompt version, model and question count.
+# Set QUIZ_CACHE_DB to a file path to share results across gunicorn workers.
+quiz_cache = cache_from_env('quiz', 'QUIZ')
+
+
+# Identical AI requests running at the same time wait on one upstream call (see singleflight.py).
+# Set SINGLE_FLIGHT_DB to coalesce across gunicorn workers too.
+quiz_flight = SingleFlight.from_env('quiz')
+elaboration_flight = SingleFlight.from_env('elaborate')
+
+
+def quiz_cache_key(text, num_questions):
+    return make_cache_key(normalize_text(text), QUIZ_PROMPT_VERSION, llm_router.model_key, num_questions)
+
+
+def get_or_generate_quiz_pairs(text, num_questions=5):
+    """
+    Return QA pairs for the text, reusing a cached result when the note hasn't changed
+    """
+    key = quiz_cache_key(text, num_questions)
+    qa_pairs = quiz_cache.get(key)
+    if qa_pairs is not MISSING:
+        return qa_pairs
+
+    def generate():
+        qa_pairs = generate_questions_and_answers_with_groq(text, num_questions)
+        # Only cache usable results so a failed call can be retried
+        if qa_pairs:
+            quiz_cache.set(key, qa_pairs)
+        return qa_pairs
+
+    # Concurrent requests for the same note (double clicks, two tabs) share one generation
+    return quiz_flight.do(key, generate)
+
+# Long notes are split into chunks of QUIZ_CHUNK_TOKENS (estimated) and the chunks are
+# quizzed in parallel. QUIZ_MAX_CHUNKS bounds upstream calls per quiz for very long notes.
+QUIZ_CHUNK_TOKENS = int(os.getenv('QUIZ_CHUNK_TOKENS', 3000))
+QUIZ_MAX_CHUNKS = int(os.getenv('QUIZ_MAX_CHUNKS', 8))
+QUIZ_CHUNK_WORKERS = int(os.getenv('QUIZ_CHUNK_WORKERS', 4))
+quiz_chunk_executor = ThreadPoolExecutor(max_workers=QUIZ_CHUNK_WORKERS, thread_name_prefix='quiz-chunk')
+
+
 def generate_questions_and_answers_with_groq(text, num_questions=5):
     """
-    Generate both questions and answers using Groq in one go
+    Generate both questions and answers with the LLM chain (Groq first). Short notes
+    go in one call, long notes are map-reduced over chunks.
     """
-    try:
-        prompt = f"""
+    chunks = split_into_chunks(text, QUIZ_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        return generate_chunk_questions_with_groq(text, num_questions)
+
+    chunks = pick_evenly(chunks, QUIZ_MAX_CHUNKS)
+    # Ask every chunk for a little more than its share so de-duplication still leaves enough
+    per_chunk = math.ceil(num_questions / len(chunks)) + 1
+    logger.debug('Splitting note into %d chunks, %d questions each', len(chunks), per_chunk)
+
+    results = list(quiz_chunk_executor.map(
+        lambda chunk: generate_chunk_questions_with_groq(chunk, per_chunk), chunks
+    ))
+    return merge_qa_pairs(results, num_questions)
+
+
+def build_quiz_prompt(text, num_questions):
+    return f"""
         Based on the following text, generate {num_questions} question-answer pairs for a quiz.
         
         Requirements:
@@ -192,49 +396,53 @@ def generate_questions_and_answers_with_groq(text, num_questions=5):
         - The answers should be words from the text, not explanations or interpretations
         - Do not generate sentence answers only one word answers
         - Do not refer to the text as "the text" or "the content", use the actual text provided because the user cannot see the text in the quiz screen
-        - Return one question per line, no numbering
         - Answers should be specific and directly derived from the text    
-        - Return in JSON format as an array of objects with "question" and "answer" keys
+        - Return a JSON object whose "questions" key is an array of objects with "question" and "answer" keys
         
         Text: {text}
         
-        Return ONLY a valid JSON array in this exact format:
-        [
+        Return ONLY a valid JSON object in this exact format:
+        {{"questions": [
             {{"question": "What is...", "answer": "The answer is..."}},
             {{"question": "How does...", "answer": "It works by..."}}
-        ]
+        ]}}
         """
 
-        response = groq_client.chat.completions.create(
-            model=GROQ_MODEL_NAME,  # e.g., "llama-3.1-8b-instant"
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates quizzes."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,  # keep answers deterministic
-        )
 
-        response_text = response.choices[0].message.content.strip()
+# Extra calls made when a reply has no usable pairs even after local repair
+QUIZ_PARSE_RETRIES = int(os.getenv('QUIZ_PARSE_RETRIES', 1))
 
-        # Try to extract JSON from the response
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            qa_pairs = json.loads(json_str)
-            return qa_pairs
-        else:
-            print(f"--- Debug: Could not extract JSON from Groq response: {response_text} ---")
+
+def generate_chunk_questions_with_groq(text, num_questions=5):
+    """
+    Generate both questions and answers for one piece of text in one go.
+    Uses the provider's JSON mode, and keeps every valid pair from a partly broken reply.
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that generates quizzes."},
+        {"role": "user", "content": build_quiz_prompt(text, num_questions)}
+    ]
+    for attempt in range(QUIZ_PARSE_RETRIES + 1):
+        try:
+            response_text = llm_router.complete(
+                messages,
+                temperature=0.2,  # keep answers deterministic
+                json_mode=True
+            )
+        except Exception as e:
+            logger.error('Error generating questions: %s', e)
             return []
 
-    except json.JSONDecodeError as e:
-        print(f"--- Debug: JSON parsing error: {e} ---")
-        return []
-    except Exception as e:
-        print(f"--- Debug: Error generating questions with Groq: {e} ---")
-        return []
+        qa_pairs, rejected = parse_qa_pairs(response_text)
+        if rejected:
+            logger.info('Dropped %d malformed quiz item(s)', rejected)
+        if qa_pairs:
+            return qa_pairs[:num_questions]
+        logger.warning('No usable QA pairs in response (attempt %d, %d chars)', attempt + 1, len(response_text))
+    return []
 
 # Authentication routes
-@app.route('/login/register', methods=['POST'])
+@bp.route('/login/register', methods=['POST'])
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -260,7 +468,7 @@ def register():
     return jsonify({'message': 'User registered successfully', 'role': role})
 
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
@@ -274,91 +482,233 @@ def login():
     return jsonify({'message': f'Welcome, {user.username}!'})
 
 
-@app.route('/logout', methods=['POST'])
+@bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
     logout_user()
     return jsonify({'message': 'Logged out successfully'})
 
-@app.route('/protected', methods=['GET'])
+@bp.route('/protected', methods=['GET'])
 @login_required
 def protected():
     return jsonify({'message': f'Hello {current_user.username}, you are logged in!'})
 
+# ------------------ AI RATE LIMITS ------------------
+
+# Token buckets per user and per IP, plus a cap on AI calls running at once per user
+# (see ratelimit.py). Set RATE_LIMIT_DB to share the counts between workers.
+rate_limiter = RateLimiter.from_env()
+
+
+def throttled_response(message, retry_after):
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+_proxy_warning_logged = False
+
+
+def client_ip():
+    """The caller's IP for rate limiting (see PROXY_COUNT)."""
+    global _proxy_warning_logged
+    if not PROXY_COUNT and not _proxy_warning_logged and 'X-Forwarded-For' in request.headers:
+        _proxy_warning_logged = True
+        logger.warning('Requests arrive with X-Forwarded-For but PROXY_COUNT is 0, so every client behind '
+                       'the proxy shares one per-IP rate limit. Set PROXY_COUNT to the number of proxies.')
+    return request.remote_addr or 'unknown'
+
+
+def ai_rate_limited(hold_slot=True, cost=None):
+    """
+    Rate limit an AI route. With hold_slot the request also takes in-flight slots from the
+    caller until its response (including a streamed one) has been sent. `cost` returns how
+    many AI calls the request will make (default one); it is charged that many tokens and
+    holds that many slots (up to the caller's whole allowance).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = current_user.user_id if current_user.is_authenticated else None
+            ip = client_ip()
+            calls = cost() if cost else 1
+            throttled = rate_limiter.check('ai', user_id, ip, calls)
+            if throttled:
+                return throttled_response('Too many AI requests, please slow down.', throttled[1])
+            if not hold_slot:
+                return view(*args, **kwargs)
+
+            owner = f'user:{user_id}' if user_id is not None else f'ip:{ip}'
+            slots = rate_limiter.acquire(owner, calls)
+            if slots is None:
+                return throttled_response('Too many AI requests running at once, wait for one to finish.', 1)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                rate_limiter.release(owner, slots)
+                raise
+            if response.is_streamed:
+                response.call_on_close(lambda: rate_limiter.release(owner, slots))
+            else:
+                rate_limiter.release(owner, slots)
+            return response
+        return wrapper
+    return decorator
+
+
 # AI Routes
-@app.route('/generate_quiz', methods=['POST'])
-def generate_quiz():
-    data = request.get_json()
+def parse_num_questions(data):
+    try:
+        num_questions = int(data.get('num_questions', 5))
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'num_questions must be an integer'}), 400)
+    if not 1 <= num_questions <= 50:
+        return None, (jsonify({'error': 'num_questions must be between 1 and 50'}), 400)
+    return num_questions, None
+
+
+def parse_quiz_request(data):
+    """
+    Validate a quiz generation request. Returns (note, quiz_title, num_questions, error_response)
+    """
     title_num = data.get('title_num')
     quiz_title = data.get('quiz_title')
-    note = None
-    if title_num:
-        note = Note.query.get(title_num)
-        if not note:
-            print(f"--- Debug: Error: Note with title_num={title_num} does not exist. ---")
-            return jsonify({'error': f'Note with note_num={title_num} does not exist.'}), 404
-    else:
-        print("--- Debug: Error: title_num is required. ---")
-        return jsonify({'error': 'title_num is required to fetch notes for quiz generation.'}), 400
-    
-    input_text = note.notes
-    print(f"\n--- Debug: Fetched Note Content (first 200 chars): {input_text[:200] if input_text else 'EMPTY'} ---")
-    print(f"--- Debug: Fetched Note Content Length: {len(input_text) if input_text else 0} ---")
-    
+    num_questions, error = parse_num_questions(data)
+    if error:
+        return None, None, None, error
+
+    if not title_num:
+        return None, None, None, (jsonify({'error': 'title_num is required to fetch notes for quiz generation.'}), 400)
+
+    # Another user's note gets the same 404 as a missing one
+    note = (
+        db.session.query(Note)
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Note.note_num == title_num, Title.user_id == current_user.user_id)
+        .first()
+    )
+    if not note:
+        return None, None, None, (jsonify({'error': f'Note with note_num={title_num} does not exist.'}), 404)
+
+    return note, quiz_title, num_questions, None
+
+
+def build_quiz_for_note(note, quiz_title, num_questions=5):
+    """
+    Generate QA pairs for a note and save them. Shared by /generate_quiz and the job worker
+    """
+    input_text, note_num = note.notes, note.note_num
+    # Note contents are never logged, only their size
+    logger.debug('Generating quiz', extra={'note_num': note_num, 'note_chars': len(input_text or '')})
+
     if not input_text.strip():
-        print("--- Debug: Input text is empty or only whitespace. ---")
-        return jsonify({'message': 'Provided notes are empty, cannot generate quiz.', 'quiz': []}), 200
-    
+        return {'message': 'Provided notes are empty, cannot generate quiz.', 'quiz': []}
+
+    release_db_connection()
+    # Generate both questions and answers with Groq (cached per note content)
+    qa_pairs = get_or_generate_quiz_pairs(input_text, num_questions)
+
+    logger.debug('Quiz generated', extra={'note_num': note_num, 'pairs': len(qa_pairs)})
+
+    if not qa_pairs:
+        return {'message': 'Quiz generated, but no valid question-answer pairs could be formed.', 'quiz': []}
+
+    save_ai_quiz_to_db(note_num, quiz_title, qa_pairs)
+    return {'message': 'Quiz generated and saved', 'quiz': qa_pairs}
+
+
+@bp.route('/generate_quiz', methods=['POST'])
+@login_required
+@ai_rate_limited()
+def generate_quiz():
+    note, quiz_title, num_questions, error = parse_quiz_request(request.get_json())
+    if error:
+        return error
+
     try:
-        # Option 1: Generate both questions and answers with Gemini
-        qa_pairs = generate_questions_and_answers_with_groq(input_text)
-        
-        print(f"\n--- Debug: Final QA Pairs collected: {qa_pairs} (Count: {len(qa_pairs)}) ---")
-        
-        if not qa_pairs:
-            print("--- Debug: No complete QA pairs could be generated. ---")
-            return jsonify({'message': 'Quiz generated, but no valid question-answer pairs could be formed.', 'quiz': []}), 200
-        
-        # Save to database (assuming you have this function)
-        save_ai_quiz_to_db(note.note_num, quiz_title, qa_pairs)
-        
-        # Return in the exact same format as your original endpoint
-        return jsonify({'message': 'Quiz generated and saved', 'quiz': qa_pairs})
-        
+        return jsonify(build_quiz_for_note(note, quiz_title, num_questions))
     except Exception as e:
-        print(f"--- Debug: Error during quiz generation: {e} ---")
+        logger.exception('Error during quiz generation')
         return jsonify({'error': f'Failed during quiz generation: {str(e)}'}), 500
 
 
-# Utility: PDF to plain text (kept for completeness, though not used in this specific endpoint)
-def pdf_to_text(pdf_path, txt_path):
-    with open(pdf_path, 'rb') as pdf_file:
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text() or ''
-    with open(txt_path, 'w', encoding='utf-8') as txt_file:
-        txt_file.write(text)
-    return txt_path
+# Separate from quiz_chunk_executor: batch tasks wait on chunk tasks, so sharing a pool could deadlock
+quiz_batch_executor = ThreadPoolExecutor(max_workers=QUIZ_CHUNK_WORKERS, thread_name_prefix='quiz-batch')
+MAX_QUIZ_BATCH = 10
 
-# Endpoint to elaborate notes using Gemini and fact-check with Groq AI
 
+def quiz_batch_cost():
+    """One quiz generation per title_num; a malformed body is charged as one and rejected by the view."""
+    title_nums = (request.get_json(silent=True) or {}).get('title_nums')
+    if not isinstance(title_nums, list) or not title_nums:
+        return 1
+    return min(len(title_nums), MAX_QUIZ_BATCH)
 
-@app.route('/groq/elaborate_note', methods=['POST'])
-def groq_elaborate_note():
-    if not groq_client:
-        return jsonify({'error': 'Groq client not initialized. Check API key.'}), 500
 
+@bp.route('/generate_quiz/batch', methods=['POST'])
+@login_required
+@ai_rate_limited(cost=quiz_batch_cost)
+def generate_quiz_batch():
+    """
+    Generate quizzes for several notes in one request and save them in one transaction.
+    Body: {"title_nums": [...], "quiz_title": "...", "quiz_titles": {"<title_num>": "..."}, "num_questions": 5}
+    """
     data = request.get_json()
-    note_content = data.get('note_content')
+    title_nums, error = parse_id_list(data, 'title_nums', MAX_QUIZ_BATCH)
+    if error:
+        return error
+    num_questions, error = parse_num_questions(data)
+    if error:
+        return error
+
+    quiz_titles = data.get('quiz_titles') or {}
+    titles_by_num = {t: quiz_titles.get(str(t), data.get('quiz_title')) for t in title_nums}
+    if not all(titles_by_num.values()):
+        return jsonify({'error': 'quiz_title (or a quiz_titles entry) is required for every title_num'}), 400
 
-    if not note_content:
-        return jsonify({'error': 'No note_content provided for elaboration.'}), 400
+    notes = (
+        db.session.query(Note)
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Title.user_id == current_user.user_id, Note.title_num.in_(title_nums))
+        .all()
+    )
+    notes_by_title = {n.title_num: (n.note_num, n.notes) for n in notes}
+    missing = [t for t in title_nums if t not in notes_by_title]
+    if missing:
+        return jsonify({'error': 'Notes not found', 'title_nums': missing}), 404
+
+    release_db_connection()
+    # The LLM calls run concurrently; the DB work stays on the request thread
+    futures = {
+        t: quiz_batch_executor.submit(get_or_generate_quiz_pairs, notes_by_title[t][1], num_questions)
+        for t in title_nums if notes_by_title[t][1].strip()
+    }
 
     try:
-        # --- Stage 1: Elaboration by Groq ---
-        print("--- Debug: Stage 1: Groq elaborating notes (HTML bullet points)...")
-        prompt_groq_elaborate = f"""Review the following study notes provided below.
+        results, rows = [], []
+        for t in title_nums:
+            qa_pairs = futures[t].result() if t in futures else []
+            rows.extend(quiz_rows(notes_by_title[t][0], titles_by_num[t], qa_pairs))
+            results.append({'title_num': t, 'quiz': qa_pairs})
+
+        if rows:
+            db.session.execute(insert(Quiz), rows)
+            reindex_quizzes([notes_by_title[t][0] for t in title_nums])
+            bump_user_version(current_user.user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Error during batch quiz generation')
+        return jsonify({'error': f'Failed during quiz generation: {str(e)}'}), 500
+
+    return jsonify({'message': 'Quizzes generated and saved', 'results': results})
+
+
+# Endpoint to elaborate notes using Gemini and fact-check with Groq AI
+
+def build_elaboration_prompt(note_content):
+    return f"""Review the following study notes provided below.
         Highlight the important information in bullet form.
         **Do not add any new information; just focus on extracting and rephrasing the existing content.**
         Each bullet point should represent a key piece of information.
@@ -372,19 +722,9 @@ def groq_elaborate_note():
         {note_content}
         """
 
-        response_groq_elaborate = groq_client.chat.completions.create(
-            model=GROQ_MODEL_NAME,
-            messages=[{"role": "user", "content": prompt_groq_elaborate}],
-            max_tokens=1000,
-            temperature=0.0
-        )
-        elaborated_notes = response_groq_elaborate.choices[0].message.content.strip()
-        print("--- Debug: Stage 1: Groq elaboration complete. ---")
-
-        # --- Stage 2 (Optional): Fidelity check with Groq again ---
-        print(f"--- Debug: Stage 2: Groq ({GROQ_MODEL_NAME}) performing STRICT fidelity check...")
 
-        prompt_groq_fidelity = f"""Compare the 'Expanded Notes' to the 'Original Notes'.
+def build_fidelity_prompt(note_content, elaborated_notes):
+    return f"""Compare the 'Expanded Notes' to the 'Original Notes'.
         Respond ONLY with a percentage (0-100%) showing how much of the Expanded Notes is a direct reformulation
         of the Original Notes without adding new information.
 
@@ -395,53 +735,523 @@ def groq_elaborate_note():
         {elaborated_notes}
         """
 
-        response_groq_fidelity = groq_client.chat.completions.create(
-            model=GROQ_MODEL_NAME,
-            messages=[{"role": "user", "content": prompt_groq_fidelity}],
-            max_tokens=10,
-            temperature=0.0,
-        )   
-        fidelity_score = response_groq_fidelity.choices[0].message.content.strip()
 
-        # --- Return combined result ---
-        return jsonify({
-            'expanded_notes': elaborated_notes,
-            'fidelity_score': fidelity_score
-        })
+# How the Stage 2 fidelity score is produced:
+#   "llm"   - second Groq call (original behaviour)
+#   "local" - word/bigram overlap estimate, no upstream call
+#   "async" - return the elaboration right away and run the LLM check as a background job
+FIDELITY_MODES = ('llm', 'local', 'async')
+DEFAULT_FIDELITY_MODE = os.getenv('ELABORATION_FIDELITY_MODE', 'llm')
+
+
+def get_fidelity_score(note_content, elaborated_notes, mode='llm'):
+    if mode == 'local':
+        return format_fidelity(estimate_fidelity(note_content, elaborated_notes))
+
+    return llm_router.complete(
+        [{"role": "user", "content": build_fidelity_prompt(note_content, elaborated_notes)}],
+        max_tokens=10,
+        temperature=0.0,
+    )
+
+
+def elaborate_note_content(note_content, fidelity_mode='llm'):
+    """
+    Stage 1 elaborates the notes, Stage 2 scores how faithful the elaboration is.
+    With fidelity_mode="async" Stage 2 is skipped and left to the caller.
+    Identical requests made at the same time share one run.
+    """
+    key = make_cache_key(llm_router.model_key, fidelity_mode, note_content)
+    return elaboration_flight.do(key, lambda: run_elaboration(note_content, fidelity_mode))
+
+
+def run_elaboration(note_content, fidelity_mode):
+    # --- Stage 1: Elaboration by Groq ---
+    elaborated_notes = llm_router.complete(
+        [{"role": "user", "content": build_elaboration_prompt(note_content)}],
+        max_tokens=1000,
+        temperature=0.0
+    )
+
+    if fidelity_mode == 'async':
+        return {'expanded_notes': elaborated_notes, 'fidelity_score': None}
+
+    # --- Stage 2 (Optional): Fidelity check with Groq again, or estimated locally ---
+    fidelity_score = get_fidelity_score(note_content, elaborated_notes, fidelity_mode)
 
+    return {
+        'expanded_notes': elaborated_notes,
+        'fidelity_score': fidelity_score
+    }
+
+
+@bp.route('/groq/elaborate_note', methods=['POST'])
+@ai_rate_limited()
+def groq_elaborate_note():
+    if not llm_router.available:
+        return jsonify({'error': LLM_NOT_CONFIGURED}), 500
+
+    data = request.get_json()
+    note_content = data.get('note_content')
+
+    if not note_content:
+        return jsonify({'error': 'No note_content provided for elaboration.'}), 400
+
+    fidelity_mode = data.get('fidelity_mode', DEFAULT_FIDELITY_MODE)
+    if fidelity_mode not in FIDELITY_MODES:
+        return jsonify({'error': f'fidelity_mode must be one of {", ".join(FIDELITY_MODES)}'}), 400
+    if fidelity_mode == 'async' and not current_user.is_authenticated:
+        return jsonify({'error': 'Login required for fidelity_mode=async'}), 401
+
+    try:
+        release_db_connection()
+        result = elaborate_note_content(note_content, fidelity_mode)
+        if fidelity_mode == 'async':
+            # Poll GET /jobs/<fidelity_job_id> (or /stream it) for the score
+            job = job_runner.submit('fidelity_check', {
+                'note_content': note_content,
+                'expanded_notes': result['expanded_notes']
+            }, user_id=current_user.user_id)
+            result['fidelity_job_id'] = job.job_id
+        return jsonify(result)
+    except LLMUnavailable as e:
+        logger.error('No AI provider could elaborate the notes: %s', e)
+        return jsonify({'error': 'AI providers are unavailable, please try again shortly.'}), 503
     except Exception as e:
-        print(f"--- Debug: Error during Groq elaboration process: {e} ---")
+        logger.exception('Error during elaboration')
         return jsonify({'error': f'Failed to elaborate notes with Groq: {str(e)}'}), 500
 
 
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@bp.route('/groq/elaborate_note/stream', methods=['POST'])
+@ai_rate_limited()
+def groq_elaborate_note_stream():
+    """
+    Same as /groq/elaborate_note but streams the elaboration as it is generated.
+    Events: "token" (text delta), "fidelity" (score), "done", or "error"
+    """
+    if not llm_router.available:
+        return jsonify({'error': LLM_NOT_CONFIGURED}), 500
+
+    data = request.get_json()
+    note_content = data.get('note_content')
+
+    if not note_content:
+        return jsonify({'error': 'No note_content provided for elaboration.'}), 400
+
+    # The score is sent as a follow-up event anyway, so only "llm" and "local" apply here
+    fidelity_mode = data.get('fidelity_mode', DEFAULT_FIDELITY_MODE)
+    if fidelity_mode not in ('llm', 'local'):
+        fidelity_mode = 'llm'
+
+    def events():
+        try:
+            release_db_connection()
+            tokens = llm_router.stream(
+                [{"role": "user", "content": build_elaboration_prompt(note_content)}],
+                max_tokens=1000,
+                temperature=0.0
+            )
+            parts = []
+            for token in tokens:
+                parts.append(token)
+                yield sse_event('token', {'token': token})
+
+            elaborated_notes = ''.join(parts).strip()
+            yield sse_event('fidelity', {'fidelity_score': get_fidelity_score(note_content, elaborated_notes, fidelity_mode)})
+            yield sse_event('done', {})
+        except Exception as e:
+            logger.exception('Error during streamed elaboration')
+            yield sse_event('error', {'error': f'Failed to elaborate notes with Groq: {str(e)}'})
+
+    return sse_response(events())
+
+
+# ------------------ BACKGROUND JOBS ------------------
+
+@job_runner.register('generate_quiz')
+def run_generate_quiz_job(payload):
+    note = db.session.get(Note, payload['note_num'])
+    if not note:
+        raise ValueError(f"Note with note_num={payload['note_num']} does not exist.")
+    return build_quiz_for_note(note, payload.get('quiz_title'), payload.get('num_questions', 5))
+
+
+@job_runner.register('elaborate_note')
+def run_elaborate_note_job(payload):
+    return elaborate_note_content(payload['note_content'], payload.get('fidelity_mode', 'llm'))
+
+
+@job_runner.register('fidelity_check')
+def run_fidelity_check_job(payload):
+    return {'fidelity_score': get_fidelity_score(payload['note_content'], payload['expanded_notes'])}
+
+
+@bp.route('/jobs/generate_quiz', methods=['POST'])
+@login_required
+@ai_rate_limited(hold_slot=False)
+def submit_generate_quiz_job():
+    note, quiz_title, num_questions, error = parse_quiz_request(request.get_json())
+    if error:
+        return error
+
+    job = job_runner.submit('generate_quiz', {
+        'note_num': note.note_num,
+        'quiz_title': quiz_title,
+        'num_questions': num_questions
+    }, user_id=current_user.user_id)
+    return jsonify({'job_id': job.job_id, 'status': job.status}), 202
+
+
+@bp.route('/jobs/elaborate_note', methods=['POST'])
+@login_required
+@ai_rate_limited(hold_slot=False)
+def submit_elaborate_note_job():
+    if not llm_router.available:
+        return jsonify({'error': LLM_NOT_CONFIGURED}), 500
+
+    data = request.get_json()
+    note_content = data.get('note_content')
+    if not note_content:
+        return jsonify({'error': 'No note_content provided for elaboration.'}), 400
+
+    fidelity_mode = data.get('fidelity_mode', DEFAULT_FIDELITY_MODE)
+    if fidelity_mode not in ('llm', 'local'):
+        fidelity_mode = 'llm'
+
+    job = job_runner.submit('elaborate_note', {
+        'note_content': note_content,
+        'fidelity_mode': fidelity_mode
+    }, user_id=current_user.user_id)
+    return jsonify({'job_id': job.job_id, 'status': job.status}), 202
+
+
+def get_user_job_or_404(job_id):
+    # Pollers of a job whose worker died are what notice it, so they drive the sweep
+    job_runner.maybe_sweep()
+    job = db.session.get(Job, job_id)
+    if not job or job.user_id != current_user.user_id:
+        abort(404)
+    return job
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    return jsonify(serialize_job(get_user_job_or_404(job_id)))
+
+
+@bp.route('/jobs/<job_id>/stream', methods=['GET'])
+@login_required
+def stream_job(job_id):
+    get_user_job_or_404(job_id)
+    poll_interval = float(os.getenv('JOB_STREAM_POLL_SECONDS', 0.5))
+    max_wait = float(os.getenv('JOB_STREAM_MAX_SECONDS', 300))
+
+    def events():
+        last_status = None
+        deadline = time.monotonic() + max_wait
+        while True:
+            job_runner.maybe_sweep()
+            job = db.session.get(Job, job_id, populate_existing=True)
+            if job.status != last_status:
+                last_status = job.status
+                yield sse_event('status', serialize_job(job))
+            if job.status in FINISHED_STATES or time.monotonic() > deadline:
+                break
+            # Give the connection back to the pool while we wait
+            db.session.close()
+            time.sleep(poll_interval)
+        yield sse_event('end', {})
+
+    return sse_response(events())
+
 
 # CRUD API ENDPOINTS
 
+# Columns returned by the list endpoints (and selectable with ?fields=). Title.user_id
+# comes from the join, so no per-row lookup is needed.
+TITLE_COLUMNS = {
+    'title_num': Title.title_num,
+    'note_title': Title.note_title,
+    'date_accessed': Title.date_accessed,
+    'user_id': Title.user_id
+}
+NOTE_COLUMNS = {
+    'note_num': Note.note_num,
+    'title_num': Note.title_num,
+    'notes': Note.notes,
+    'version': Note.version,
+    'user_id': Title.user_id
+}
+QUIZ_COLUMNS = {
+    'quiz_num': Quiz.quiz_num,
+    'note_num': Quiz.note_num,
+    'quiz_title': Quiz.quiz_title,
+    'question': Quiz.question,
+    'answer': Quiz.answer,
+    'user_id': Title.user_id
+}
+TASK_COLUMNS = {
+    'task_id': Task.task_id,
+    'user_id': Task.user_id,
+    'task_name': Task.task_name,
+    'task_details': Task.task_details,
+    'status': Task.status,
+    'date_created': Task.date_created,
+    'date_completed': Task.date_completed
+}
+USER_COLUMNS = {
+    'user_id': User.user_id,
+    'username': User.username,
+    'role': User.role,
+    'date_created': User.date_created
+}
+
+
+# Batch endpoints accept at most this many items per request
+MAX_BATCH_SIZE = 200
+
+
+def parse_id_list(data, key, max_size=MAX_BATCH_SIZE):
+    """Read a non-empty list of integer ids from the request body. Returns (ids, error_response)"""
+    ids = (data or {}).get(key)
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({'error': f'{key} must be a non-empty list'}), 400)
+    if len(ids) > max_size:
+        return None, (jsonify({'error': f'{key} can have at most {max_size} items'}), 400)
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None, (jsonify({'error': f'{key} must contain integers'}), 400)
+    return list(dict.fromkeys(ids)), None
+
+
+def parse_item_list(data, key, max_size=MAX_BATCH_SIZE):
+    """Read a non-empty list of objects from the request body. Returns (items, error_response)"""
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'{key} must be a non-empty list'}), 400)
+    if len(items) > max_size:
+        return None, (jsonify({'error': f'{key} can have at most {max_size} items'}), 400)
+    if not all(isinstance(item, dict) for item in items):
+        return None, (jsonify({'error': f'{key} must contain objects'}), 400)
+    return items, None
+
+
+def insert_returning(model, rows, columns):
+    """
+    INSERT rows with one statement and return {column: value} dicts of the new rows in
+    primary key order (columns[0]). Values come back through RETURNING, so nothing needs
+    reloading after the commit expires the session. Where the database can't return
+    values from a multi-row INSERT (MySQL), the ORM inserts them and the values are read
+    before the commit.
+    """
+    if db.session.connection().dialect.insert_executemany_returning:
+        # No sort_by_parameter_order: SQLite would fall back to one INSERT per row for it
+        result = db.session.execute(insert(model).returning(*columns), rows)
+        return sorted(rows_to_dicts(result), key=lambda row: row[columns[0].key])
+    objects = [model(**row) for row in rows]
+    db.session.add_all(objects)
+    db.session.flush()
+    return [{column.key: getattr(obj, column.key) for column in columns} for obj in objects]
+
+
+@bp.app_errorhandler(ListRequestError)
+def handle_list_request_error(e):
+    return jsonify({'error': str(e)}), 400
+
+
+def list_response(query, columns, order_by, default_fields=None):
+    """
+    jsonify one page of a list query (see pagination.fetch_page for the ?limit=,
+    ?cursor= and ?fields= options). default_fields keeps an endpoint's original
+    payload shape when ?fields= is not given.
+    """
+    args = request.args
+    if default_fields and not args.get('fields'):
+        args = {**args.to_dict(), 'fields': ','.join(default_fields)}
+    items, next_cursor = fetch_page(query, columns, order_by, args)
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+# ------------------ CONDITIONAL GET ------------------
+
+# Bump when the payload of a conditional route changes shape, so clients drop their old ETags
+ETAG_VERSION = 1
+
+
+def bump_user_version(user_id):
+    """Mark the user's titles/notes/quizzes/tasks as changed. Call before the commit that changes them."""
+    now = int(time.time())
+    bump = (
+        update(UserVersion)
+        .where(UserVersion.user_id == user_id)
+        .values(
+            version=UserVersion.version + 1,
+            modified_at=case((UserVersion.modified_at >= now, UserVersion.modified_at + 1), else_=now)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(bump).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(UserVersion).values(user_id=user_id, version=1, modified_at=now))
+    except IntegrityError:
+        # Another request created the row first
+        db.session.execute(bump)
+
+
+def user_version_conditional(view):
+    """
+    ETag / Last-Modified for a GET route whose response depends only on the URL and
+    the current user's data. A revalidation that still matches the user's version is
+    answered with 304 before the view runs its queries.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Read before the view's queries: a change landing in between only costs one extra refetch
+        row = (
+            db.session.query(UserVersion.version, UserVersion.modified_at)
+            .filter(UserVersion.user_id == current_user.user_id)
+            .first()
+        )
+        version, modified_at = (row.version, row.modified_at) if row else (0, None)
+        etag = f"{current_user.user_id}-{version}-{make_cache_key(ETAG_VERSION, request.full_path)[:16]}"
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(since and modified_at is not None and modified_at <= since.timestamp())
+
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        # Weak: the same data may be sent with a different encoding
+        response.set_etag(etag, weak=True)
+        # A burst of changes can push modified_at past the clock; the ETag still covers that window
+        if modified_at is not None and modified_at <= time.time():
+            response.last_modified = modified_at
+        # Browsers keep the copy but revalidate on every use; proxies must not share it
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return wrapper
+
+# ------------------ SEARCH ------------------
+
+def reindex_titles(title_nums):
+    """Refresh the "note" search documents (title + note body) for these titles"""
+    rows = (
+        db.session.query(Title.title_num, Title.user_id, Title.note_title, Note.notes)
+        .outerjoin(Note, Note.title_num == Title.title_num)
+        .filter(Title.title_num.in_(title_nums))
+        .all()
+    )
+    replace_documents(db.session.connection(), 'note', [
+        {
+            'ref_id': r.title_num,
+            'user_id': r.user_id,
+            'title_num': r.title_num,
+            'title': r.note_title,
+            'body': html_to_text(r.notes)
+        } for r in rows
+    ], ref_ids=title_nums)
+
+
+def reindex_quizzes(note_nums):
+    """Refresh the "quiz" search documents for every quiz under these notes"""
+    rows = (
+        db.session.query(Quiz.quiz_num, Quiz.quiz_title, Quiz.question, Quiz.answer, Title.title_num, Title.user_id)
+        .join(Note, Quiz.note_num == Note.note_num)
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Note.note_num.in_(note_nums))
+        .all()
+    )
+    # note_num == title_num (see create_note), so the notes' documents are keyed by title_num
+    replace_documents(db.session.connection(), 'quiz', [
+        {
+            'ref_id': r.quiz_num,
+            'user_id': r.user_id,
+            'title_num': r.title_num,
+            'title': r.quiz_title,
+            'body': f"{r.question}\n{r.answer}"
+        } for r in rows
+    ], title_nums=note_nums)
+
+
+@bp.route('/search', methods=['GET'])
+@login_required
+def search():
+    """
+    Ranked full-text search over the user's notes and quizzes.
+    ?q=terms&kind=note|quiz&limit=20&offset=0
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+
+    kind = request.args.get('kind') or None
+    if kind and kind not in SEARCH_KINDS:
+        return jsonify({'error': f'kind must be one of {", ".join(SEARCH_KINDS)}'}), 400
+
+    limit = parse_limit(request.args.get('limit'), max_limit=100) or 20
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'offset must be an integer'}), 400
+
+    # Fetch one extra row to know whether there is another page
+    results = search_documents_for_user(
+        db.session.connection(), current_user.user_id, query, kind, limit + 1, offset
+    )
+    has_more = len(results) > limit
+    return jsonify({
+        'results': results[:limit],
+        'next_offset': offset + limit if has_more else None
+    })
+
+
 # ------------------ TITLES ------------------
 
-@app.route('/titles', methods=['GET'])
+@bp.route('/titles', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_titles():
-    titles = Title.query.filter_by(user_id=current_user.user_id).all()
-    return jsonify([
-        {'title_num': t.title_num, 'note_title': t.note_title, 'user_id': t.user_id}
-        for t in titles
-    ])
+    return list_response(
+        Title.query.filter_by(user_id=current_user.user_id),
+        TITLE_COLUMNS,
+        [('title_num', False)],
+        default_fields=['title_num', 'note_title', 'user_id']
+    )
 
-@app.route('/titles/sorted', methods=['GET'])
+@bp.route('/titles/sorted', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_titles_sorted():
-    titles = Title.query.filter_by(user_id=current_user.user_id).order_by(Title.date_accessed.desc()).all()
-    return jsonify([
-        {
-            'title_num': t.title_num,
-            'note_title': t.note_title,
-            'date_accessed': t.date_accessed,
-            'user_id': t.user_id
-        } for t in titles
-    ])
+    # title_num breaks ties between titles accessed at the same moment
+    return list_response(
+        Title.query.filter_by(user_id=current_user.user_id),
+        TITLE_COLUMNS,
+        [('date_accessed', True), ('title_num', True)]
+    )
 
-@app.route('/titles/get-num', methods=['GET'])
+@bp.route('/titles/get-num', methods=['GET'])
 @login_required
 def get_title_num():
     title = request.args.get('title')
@@ -454,8 +1264,9 @@ def get_title_num():
 
     return jsonify({'title_num': result.title_num, 'user_id': result.user_id})
 
-@app.route('/titles/<int:title_num>', methods=['GET'])
+@bp.route('/titles/<int:title_num>', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_selected_titles(title_num):
     title = Title.query.filter_by(title_num=title_num, user_id=current_user.user_id).first_or_404()
     return jsonify({
@@ -464,7 +1275,7 @@ def get_selected_titles(title_num):
         'user_id': title.user_id
     })
 
-@app.route('/titles', methods=['POST'])
+@bp.route('/titles', methods=['POST'])
 @login_required
 def create_title():
     data = request.get_json()
@@ -477,6 +1288,9 @@ def create_title():
         date_accessed=datetime.now()
     )
     db.session.add(new_title)
+    db.session.flush()
+    reindex_titles([new_title.title_num])
+    bump_user_version(current_user.user_id)
     db.session.commit()
     return jsonify({
         'title_num': new_title.title_num,
@@ -484,13 +1298,15 @@ def create_title():
         'user_id': new_title.user_id
     }), 201
 
-@app.route('/titles/<int:title_num>', methods=['PUT'])
+@bp.route('/titles/<int:title_num>', methods=['PUT'])
 @login_required
 def update_title(title_num):
     data = request.get_json()
     title = Title.query.filter_by(title_num=title_num, user_id=current_user.user_id).first_or_404()
     title.note_title = data.get('note_title', title.note_title)
     title.date_accessed = datetime.now()
+    reindex_titles([title_num])
+    bump_user_version(current_user.user_id)
     db.session.commit()
     return jsonify({
         'title_num': title.title_num,
@@ -499,46 +1315,91 @@ def update_title(title_num):
         'user_id': title.user_id
     })
 
-@app.route('/titles/<int:title_num>', methods=['DELETE'])
+@bp.route('/titles/<int:title_num>', methods=['DELETE'])
 @login_required
 def delete_title(title_num):
     title = Title.query.filter_by(title_num=title_num, user_id=current_user.user_id).first_or_404()
     db.session.delete(title)
+    delete_documents(db.session.connection(), current_user.user_id, title_nums=[title_num])
+    bump_user_version(current_user.user_id)
     db.session.commit()
     return jsonify({'message': 'Title deleted', 'user_id': current_user.user_id})
 
+@bp.route('/titles/batch', methods=['POST'])
+@login_required
+def create_titles_batch():
+    titles, error = parse_item_list(request.get_json(), 'titles')
+    if error:
+        return error
+    if not all(t.get('note_title') for t in titles):
+        return jsonify({'error': 'note_title is required for every title'}), 400
+
+    now = datetime.now()
+    new_titles = insert_returning(
+        Title,
+        [{'note_title': t['note_title'], 'user_id': current_user.user_id, 'date_accessed': now} for t in titles],
+        [Title.title_num, Title.note_title, Title.user_id]
+    )
+    reindex_titles([t['title_num'] for t in new_titles])
+    bump_user_version(current_user.user_id)
+    db.session.commit()
+    return jsonify(new_titles), 201
+
+@bp.route('/titles/batch', methods=['DELETE'])
+@login_required
+def delete_titles_batch():
+    title_nums, error = parse_id_list(request.get_json(), 'title_nums')
+    if error:
+        return error
+
+    owned = select(Title.title_num).where(Title.user_id == current_user.user_id, Title.title_num.in_(title_nums))
+    owned_notes = select(Note.note_num).where(Note.title_num.in_(owned))
+    # Children are removed explicitly so this doesn't depend on the backend enforcing ON DELETE CASCADE
+    Quiz.query.filter(Quiz.note_num.in_(owned_notes)).delete(synchronize_session=False)
+    Note.query.filter(Note.title_num.in_(owned)).delete(synchronize_session=False)
+    deleted = (
+        Title.query
+        .filter(Title.user_id == current_user.user_id, Title.title_num.in_(title_nums))
+        .delete(synchronize_session=False)
+    )
+    delete_documents(db.session.connection(), current_user.user_id, title_nums=title_nums)
+    if deleted:
+        bump_user_version(current_user.user_id)
+    db.session.commit()
+    return jsonify({'message': 'Titles deleted', 'deleted': deleted, 'user_id': current_user.user_id})
+
 # ------------------ NOTES ------------------
 
-@app.route('/notes', methods=['GET'])
+@bp.route('/notes', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_notes():
-    notes = (
+    return list_response(
         db.session.query(Note)
-        .join(Title)
-        .filter(Title.user_id == current_user.user_id)
-        .all()
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Title.user_id == current_user.user_id),
+        NOTE_COLUMNS,
+        [('note_num', False)]
     )
-    return jsonify([
-        {'note_num': n.note_num, 'title_num': n.title_num, 'notes': n.notes, 'user_id': Title.query.get(n.title_num).user_id}
-        for n in notes
-    ])
 
-@app.route('/notes/<int:note_num>', methods=['GET'])
+@bp.route('/notes/<int:note_num>', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_selected_note(note_num):
-    note = Note.query.filter_by(note_num=note_num).first_or_404()
-    title = Title.query.get(note.title_num)
-    if title.user_id != current_user.user_id:
+    row = (
+        db.session.query(*NOTE_COLUMNS.values())
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Note.note_num == note_num)
+        .first()
+    )
+    if not row:
+        abort(404)
+    if row.user_id != current_user.user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    return jsonify({
-        'note_num': note.note_num,
-        'title_num': note.title_num,
-        'notes': note.notes,
-        'user_id': title.user_id
-    })
+    return jsonify(row_to_dict(row))
 
-@app.route('/notes', methods=['POST'])
+@bp.route('/notes', methods=['POST'])
 @login_required
 def create_note():
     data = request.get_json()
@@ -559,34 +1420,176 @@ def create_note():
         notes=note_text
     )
     db.session.add(new_note)
+    reindex_titles([title.title_num])
+    bump_user_version(current_user.user_id)
     db.session.commit()
     return jsonify({
         'note_num': new_note.note_num,
         'title_num': new_note.title_num,
         'notes': new_note.notes,
+        'version': new_note.version,
         'user_id': current_user.user_id
     }), 201
 
-@app.route('/notes/<int:note_num>', methods=['PUT'])
+@bp.route('/notes/upload', methods=['POST'])
 @login_required
-def update_note(note_num):
-    data = request.get_json()
-    note = (
+def upload_note_pdf():
+    """
+    Extract the text of a PDF on the server and save it as the note of a title.
+    Send the PDF as the raw body (Content-Type: application/pdf) or as the "file"
+    field of a multipart form, with ?title_num=. Replaces the title's note if it has one.
+    """
+    # Bound the body before anything reads it. Werkzeug then rejects a larger Content-Length
+    # up front and stops a chunked upload (which has none) once it passes the limit.
+    request.max_content_length = PDF_MAX_BYTES
+
+    # From the query string only: reading request.form would parse the whole body first
+    title_num = request.args.get('title_num', type=int)
+    if not title_num:
+        return jsonify({'error': 'title_num is required'}), 400
+
+    title = Title.query.filter_by(title_num=title_num, user_id=current_user.user_id).first()
+    if not title:
+        return jsonify({'error': 'Title not found or does not belong to this user'}), 403
+
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({'error': 'file is required'}), 400
+            data = read_limited(upload.stream)
+        else:
+            data = read_limited(request.stream)
+        note_text = extract_pdf_text(data)
+    except (PdfTooLarge, RequestEntityTooLarge):
+        return jsonify({'error': f'PDF is larger than the {PDF_MAX_BYTES // (1024 * 1024)} MB limit'}), 413
+    except InvalidPdf as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not note_text:
+        return jsonify({'error': 'No text could be extracted from the PDF'}), 422
+
+    note = db.session.get(Note, title.title_num)
+    if note:
+        if note.notes != note_text:
+            note.notes = note_text
+            note.version += 1
+    else:
+        note = Note(note_num=title.title_num, title_num=title.title_num, notes=note_text)
+        db.session.add(note)
+    reindex_titles([title.title_num])
+    bump_user_version(current_user.user_id)
+    db.session.commit()
+    return jsonify({
+        'note_num': note.note_num,
+        'title_num': note.title_num,
+        'notes': note.notes,
+        'version': note.version,
+        'user_id': current_user.user_id
+    }), 201
+
+def get_user_note_or_404(note_num):
+    return (
         db.session.query(Note)
         .join(Title)
         .filter(Note.note_num == note_num, Title.user_id == current_user.user_id)
         .first_or_404()
     )
-    note.notes = data.get('notes', note.notes)
-    db.session.commit()
+
+def note_version_conflict(note):
+    return jsonify({
+        'error': 'The note was changed by another save; reload it and try again',
+        'note_num': note.note_num,
+        'version': note.version
+    }), 409
+
+@bp.route('/notes/<int:note_num>', methods=['PUT'])
+@login_required
+def update_note(note_num):
+    data = request.get_json()
+    note = get_user_note_or_404(note_num)
+    if 'version' in data and data['version'] != note.version:
+        return note_version_conflict(note)
+
+    new_text = data.get('notes', note.notes)
+    # Saving unchanged text keeps the version and skips the search reindex
+    if new_text != note.notes:
+        # Compare-and-set, as in patch_note: a save racing from the same version loses with a 409.
+        # Without a version the client asked for last-write-wins, but the bump is still atomic.
+        conditions = [Note.note_num == note.note_num]
+        if 'version' in data:
+            conditions.append(Note.version == data['version'])
+        result = db.session.execute(
+            update(Note)
+            .where(*conditions)
+            .values(notes=new_text, version=Note.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            db.session.refresh(note)
+            return note_version_conflict(note)
+        db.session.refresh(note)
+        reindex_titles([note.title_num])
+        bump_user_version(current_user.user_id)
+        db.session.commit()
     return jsonify({
         'note_num': note.note_num,
         'title_num': note.title_num,
         'notes': note.notes,
+        'version': note.version,
         'user_id': current_user.user_id
     })
 
-@app.route('/notes/<int:note_num>', methods=['DELETE'])
+@bp.route('/notes/<int:note_num>', methods=['PATCH'])
+@login_required
+def patch_note(note_num):
+    """
+    Apply text edits to a note instead of re-sending all of it.
+    Body: {"version": 3, "ops": [{"start": 10, "end": 15, "text": "..."}]} (see note_patch.py).
+    Responds 409 with the current version if the note changed since the version the edits were made on.
+    """
+    data = request.get_json()
+    base_version = data.get('version')
+    if not isinstance(base_version, int) or isinstance(base_version, bool):
+        return jsonify({'error': 'version is required'}), 400
+
+    note = get_user_note_or_404(note_num)
+    if note.version != base_version:
+        return note_version_conflict(note)
+
+    try:
+        new_text = apply_patch(note.notes, data.get('ops'))
+    except PatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if new_text != note.notes:
+        # Compare-and-set on the version so two saves racing from the same version can't both win
+        result = db.session.execute(
+            update(Note)
+            .where(Note.note_num == note.note_num, Note.version == base_version)
+            .values(notes=new_text, version=Note.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            db.session.refresh(note)
+            return note_version_conflict(note)
+        db.session.refresh(note)
+        reindex_titles([note.title_num])
+        bump_user_version(current_user.user_id)
+        db.session.commit()
+
+    # The client already has the text, so only the new version goes back
+    return jsonify({
+        'note_num': note.note_num,
+        'title_num': note.title_num,
+        'version': note.version,
+        'length': len(note.notes),
+        'user_id': current_user.user_id
+    })
+
+@bp.route('/notes/<int:note_num>', methods=['DELETE'])
 @login_required
 def delete_note(note_num):
     note = (
@@ -596,52 +1599,67 @@ def delete_note(note_num):
         .first_or_404()
     )
     db.session.delete(note)
+    db.session.flush()
+    # The title stays searchable without its body; the note's quizzes went with it
+    reindex_titles([note.title_num])
+    reindex_quizzes([note.note_num])
+    bump_user_version(current_user.user_id)
     db.session.commit()
     return jsonify({'message': 'Note deleted', 'user_id': current_user.user_id})
 
 # ------------------ QUIZZES ------------------
-@app.route('/quizzes', methods=['GET'])
+@bp.route('/quizzes', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_quizzes():
-    quizzes = (
+    return list_response(
         db.session.query(Quiz)
-        .join(Note)
-        .join(Title)
-        .filter(Title.user_id == current_user.user_id)
-        .all()
+        .join(Note, Quiz.note_num == Note.note_num)
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Title.user_id == current_user.user_id),
+        QUIZ_COLUMNS,
+        [('quiz_num', False)]
     )
-    return jsonify([
-        {
-            'quiz_num': q.quiz_num,
-            'note_num': q.note_num,
-            'quiz_title': q.quiz_title,
-            'question': q.question,
-            'answer': q.answer,
-            'user_id': Title.query.join(Note).filter(Note.note_num == q.note_num).first().user_id
-        } for q in quizzes
-    ])
+
+
+@bp.route('/quizzes/batch', methods=['DELETE'])
+@login_required
+def delete_quizzes_batch():
+    quiz_nums, error = parse_id_list(request.get_json(), 'quiz_nums')
+    if error:
+        return error
+
+    owned_notes = (
+        select(Note.note_num)
+        .join(Title, Note.title_num == Title.title_num)
+        .where(Title.user_id == current_user.user_id)
+    )
+    deleted = (
+        Quiz.query
+        .filter(Quiz.quiz_num.in_(quiz_nums), Quiz.note_num.in_(owned_notes))
+        .delete(synchronize_session=False)
+    )
+    delete_documents(db.session.connection(), current_user.user_id, kind='quiz', ref_ids=quiz_nums)
+    if deleted:
+        bump_user_version(current_user.user_id)
+    db.session.commit()
+    return jsonify({'message': 'Quizzes deleted', 'deleted': deleted})
 
 
 # ------------------ TASKS ------------------
 
-@app.route('/task/all', methods=['GET'])
+@bp.route('/task/all', methods=['GET'])
 @login_required
+@user_version_conditional
 def get_all_tasks():
-    tasks = Task.query.filter_by(user_id=current_user.user_id).all()
-    return jsonify([
-        {
-            'task_id': t.task_id,
-            'user_id': t.user_id,
-            'task_name': t.task_name,
-            'task_details': t.task_details,
-            'status': t.status,
-            'date_created': t.date_created,
-            'date_completed': t.date_completed
-        } for t in tasks
-    ]), 200
+    return list_response(
+        Task.query.filter_by(user_id=current_user.user_id),
+        TASK_COLUMNS,
+        [('task_id', False)]
+    ), 200
 
 
-@app.route('/task/add', methods=['POST'])
+@bp.route('/task/add', methods=['POST'])
 @login_required
 def add_task():
     data = request.get_json()
@@ -657,6 +1675,7 @@ def add_task():
     )
 
     db.session.add(new_task)
+    bump_user_version(current_user.user_id)
     db.session.commit()
 
     return jsonify({
@@ -668,7 +1687,7 @@ def add_task():
     }), 201
 
 
-@app.route('/task/edit/<int:task_id>', methods=['PUT'])
+@bp.route('/task/edit/<int:task_id>', methods=['PUT'])
 @login_required
 def edit_task(task_id):
     task = Task.query.filter_by(task_id=task_id, user_id=current_user.user_id).first_or_404()
@@ -681,6 +1700,7 @@ def edit_task(task_id):
     if task.status.lower() == "completed" and not task.date_completed:
         task.date_completed = datetime.now()
 
+    bump_user_version(current_user.user_id)
     db.session.commit()
 
     return jsonify({
@@ -692,37 +1712,236 @@ def edit_task(task_id):
     }), 200
 
 
-@app.route('/task/delete/<int:task_id>', methods=['DELETE'])
+@bp.route('/task/delete/<int:task_id>', methods=['DELETE'])
 @login_required
 def delete_task(task_id):
     task = Task.query.filter_by(task_id=task_id, user_id=current_user.user_id).first_or_404()
 
     db.session.delete(task)
+    bump_user_version(current_user.user_id)
     db.session.commit()
 
     return jsonify({'message': 'Task deleted successfully'}), 200
 
+
+@bp.route('/task/batch', methods=['POST'])
+@login_required
+def add_tasks_batch():
+    tasks, error = parse_item_list(request.get_json(), 'tasks')
+    if error:
+        return error
+    if not all(t.get('task_name') for t in tasks):
+        return jsonify({'error': 'task_name is required for every task'}), 400
+
+    now = datetime.now()
+    new_tasks = insert_returning(
+        Task,
+        [
+            {
+                'user_id': current_user.user_id,
+                'task_name': t['task_name'],
+                'task_details': t.get('task_details'),
+                'status': t.get('status', 'Pending'),
+                'date_created': now
+            } for t in tasks
+        ],
+        [Task.task_id, Task.task_name, Task.task_details, Task.status]
+    )
+    bump_user_version(current_user.user_id)
+    db.session.commit()
+
+    return jsonify({'message': 'Tasks added successfully', 'tasks': new_tasks}), 201
+
+
+@bp.route('/task/batch', methods=['DELETE'])
+@login_required
+def delete_tasks_batch():
+    task_ids, error = parse_id_list(request.get_json(), 'task_ids')
+    if error:
+        return error
+
+    deleted = (
+        Task.query
+        .filter(Task.user_id == current_user.user_id, Task.task_id.in_(task_ids))
+        .delete(synchronize_session=False)
+    )
+    if deleted:
+        bump_user_version(current_user.user_id)
+    db.session.commit()
+    return jsonify({'message': 'Tasks deleted successfully', 'deleted': deleted}), 200
+
+# ------------------ DASHBOARD ------------------
+
+@bp.route('/dashboard/summary', methods=['GET'])
+@login_required
+@user_version_conditional
+def dashboard_summary():
+    """
+    Everything the dashboard shows in one request: the user, the most recently
+    accessed titles (?limit=, default 10), and task and quiz counts. The counts
+    are computed with GROUP BY in the database rather than by shipping rows.
+    """
+    limit = parse_limit(request.args.get('limit'), max_limit=50) or 10
+    user_id = current_user.user_id
+
+    recent_titles = (
+        db.session.query(Title.title_num, Title.note_title, Title.date_accessed)
+        .filter(Title.user_id == user_id)
+        .order_by(Title.date_accessed.desc(), Title.title_num.desc())
+        .limit(limit)
+        .all()
+    )
+    title_count = db.session.query(func.count(Title.title_num)).filter(Title.user_id == user_id).scalar()
+    task_counts = (
+        db.session.query(Task.status, func.count(Task.task_id))
+        .filter(Task.user_id == user_id)
+        .group_by(Task.status)
+        .all()
+    )
+    quiz_counts = (
+        db.session.query(Note.note_num, Title.title_num, Title.note_title, func.count(Quiz.quiz_num).label('quiz_count'))
+        .join(Note, Quiz.note_num == Note.note_num)
+        .join(Title, Note.title_num == Title.title_num)
+        .filter(Title.user_id == user_id)
+        .group_by(Note.note_num, Title.title_num, Title.note_title)
+        .order_by(Note.note_num)
+        .all()
+    )
+
+    return jsonify({
+        'user': {
+            'user_id': user_id,
+            'username': current_user.username,
+            'role': getattr(current_user, 'role', 'user')
+        },
+        'recent_titles': rows_to_dicts(recent_titles),
+        'title_count': title_count,
+        'tasks': {
+            'total': sum(count for _, count in task_counts),
+            'by_status': {status: count for status, count in task_counts}
+        },
+        'quizzes': {
+            'total': sum(row.quiz_count for row in quiz_counts),
+            'by_note': rows_to_dicts(quiz_counts)
+        }
+    })
+
+# ------------------ METRICS ------------------
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The rule ("/notes/<int:note_num>") rather than the path keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, method=request.method, route=route,
+                                     status=str(response.status_code))
+        http_request_db_queries.observe(g.get('db_queries', 0), method=request.method, route=route)
+        http_request_db_seconds.observe(g.get('db_seconds', 0.0), method=request.method, route=route)
+    return response
+
+
+@registry.collector
+def collect_app_stats():
+    caches = [('quiz', quiz_cache.stats()), ('user', user_cache.stats())]
+    pool = pool_metrics.snapshot()
+    limits = rate_limiter.stats()
+    flights = [quiz_flight.stats(), elaboration_flight.stats()]
+    llm = llm_router.stats()
+    return [
+        ('thinkpal_cache_requests_total', 'counter', 'Result cache lookups by outcome',
+         [({'cache': name, 'result': result}, stats[key])
+          for name, stats in caches
+          for result, key in (('hit_local', 'hits_local'), ('hit_shared', 'hits_shared'), ('miss', 'misses'))]),
+        ('thinkpal_cache_hit_ratio', 'gauge', 'Result cache hit rate since start',
+         [({'cache': name}, stats['hit_rate']) for name, stats in caches]),
+        ('thinkpal_db_pool_checked_out', 'gauge', 'Connections checked out of the pool',
+         [({}, pool['checked_out'])]),
+        ('thinkpal_db_pool_timeouts_total', 'counter', 'Checkouts that timed out waiting for a connection',
+         [({}, pool['timeouts'])]),
+        ('thinkpal_rate_limit_requests_total', 'counter', 'AI requests seen by the rate limiter by outcome',
+         [({'result': key}, limits[key])
+          for key in ('allowed', 'throttled_user', 'throttled_ip', 'throttled_inflight')]),
+        ('thinkpal_single_flight_calls_total', 'counter', 'Coalesced AI calls by role',
+         [({'flight': stats['name'], 'role': role}, stats[role])
+          for stats in flights for role in ('leaders', 'shared_local', 'shared_workers')]),
+        ('thinkpal_llm_router_events_total', 'counter', 'LLM retries, fallbacks and hedges',
+         [({'event': key}, llm[key]) for key in ('requests', 'retries', 'fallbacks', 'hedges', 'hedge_wins', 'unavailable')]),
+        ('thinkpal_llm_circuit_open', 'gauge', '1 while a provider circuit breaker is not closed',
+         [({'provider': name}, int(state['breaker'] != 'closed')) for name, state in llm['providers'].items()]),
+    ]
+
+
+# Prometheus scrape endpoint. It exposes traffic and internals, so it doesn't exist (404)
+# until METRICS_TOKEN is set; scrapers then send "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    if not METRICS_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 # ------------------ USERS ------------------
 
+# AI result cache counters (admin only)
+@bp.route('/admin/cache-stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify({'quiz': quiz_cache.stats(), 'user': user_cache.stats()}), 200
+
+# Rate limiter counters: allowed and throttled AI requests (admin only)
+@bp.route('/admin/rate-limits', methods=['GET'])
+@login_required
+def get_rate_limit_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(rate_limiter.stats()), 200
+
+# AI provider health: breaker states, latencies, retries, fallbacks and hedges (admin only)
+@bp.route('/admin/llm', methods=['GET'])
+@login_required
+def get_llm_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify({
+        **llm_router.stats(),
+        'single_flight': {'quiz': quiz_flight.stats(), 'elaborate': elaboration_flight.stats()}
+    }), 200
+
+# Connection pool metrics (admin only)
+@bp.route('/admin/db-pool', methods=['GET'])
+@login_required
+def get_db_pool_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(pool_metrics.snapshot()), 200
+
 # Get all users (admin only, optionally)
-@app.route('/admin-users', methods=['GET'])
+@bp.route('/admin-users', methods=['GET'])
 @login_required
 def get_users():
     if current_user.role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    users = User.query.all()
-    return jsonify([
-        {
-            'user_id': u.user_id,
-            'username': u.username,
-            'role': u.role,
-            'date_created': u.date_created
-        } for u in users
-    ]), 200
+    return list_response(User.query, USER_COLUMNS, [('user_id', False)]), 200
 
 # Create a new user (admin only)
-@app.route('/admin/create-user', methods=['POST'])
+@bp.route('/admin/create-user', methods=['POST'])
 @login_required
 def create_user():
     if current_user.role != 'admin':
@@ -747,7 +1966,7 @@ def create_user():
     return jsonify({'message': 'User created', 'user_id': new_user.user_id}), 201
 
 # Update a user (self or admin)
-@app.route('/admin/update-user/<int:user_id>', methods=['PUT'])
+@bp.route('/admin/update-user/<int:user_id>', methods=['PUT'])
 @login_required
 def update_user(user_id):
     if current_user.user_id != user_id and current_user.role != 'admin':
@@ -770,11 +1989,14 @@ def update_user(user_id):
     if 'role' in data and current_user.role == 'admin':
         user.role = data['role']
 
+    # The dashboard summary includes the username and role
+    bump_user_version(user_id)
     db.session.commit()
+    invalidate_user(user_id)
     return jsonify({'message': 'User updated'}), 200
 
 # Delete a user (admin only)
-@app.route('/admin/delete-user/<int:user_id>', methods=['DELETE'])
+@bp.route('/admin/delete-user/<int:user_id>', methods=['DELETE'])
 @login_required
 def delete_user(user_id):
     if current_user.role != 'admin':
@@ -782,10 +2004,13 @@ def delete_user(user_id):
 
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
+    UserVersion.query.filter_by(user_id=user_id).delete()
+    delete_documents(db.session.connection(), user_id)
     db.session.commit()
+    invalidate_user(user_id)
     return jsonify({'message': 'User deleted'}), 200
 
-@app.route('/current-user', methods=['GET'])
+@bp.route('/current-user', methods=['GET'])
 @login_required
 def current_user_info():
     return jsonify({
@@ -793,8 +2018,81 @@ def current_user_info():
         'username': current_user.username,
         'role': getattr(current_user, 'role', 'user')  # fallback to 'user'
     })
+# ------------------ APP FACTORY ------------------
+
+class ThinkPalRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # A route that bounds its body (see upload_note_pdf) keeps uploads in memory, not in temp files
+        if self.max_content_length is not None:
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def create_app(config=None):
+    """
+    Build the Flask app. `config` overrides settings read from the environment
+    (e.g. a test database URI). Nothing here connects to the database or to an
+    AI provider.
+    """
+    # Once per process; importing this module leaves the host's logging alone
+    configure_logging()
+    app = Flask(__name__)
+    app.request_class = ThinkPalRequest
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+    app.config['SESSION_COOKIE_SECURE'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+    # Pool size, overflow, recycle, pre-ping and statement timeout (see db_pool.py)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # orjson-backed jsonify / get_json when orjson is installed (see json_provider.py)
+    install_json_provider(app)
+    if PROXY_COUNT:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_COUNT, x_proto=PROXY_COUNT)
+
+    CORS(
+        app,
+        resources={r"/*": {
+            "origins": [frontend_url, "https://app-dev-project-frontend.onrender.com"],
+            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "If-Modified-Since"],
+            "supports_credentials": True,
+            "expose_headers": ["Content-Type", "Authorization", "X-Next-Cursor", "Retry-After", "ETag", "Last-Modified"]
+        }}
+    )
+    app.after_request(compressor)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+
+    with app.app_context():
+        install_pool_metrics(db.engine)
+        install_query_metrics(db.engine, on_query=count_request_query)
+        if env_flag('DB_UPGRADE_ON_STARTUP', '0'):
+            upgrade_database(db.engine, db.metadata)
+            test_db_connection()
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # `gunicorn app:app` and `flask --app app` get an app built on first access, so
+    # importing this module (e.g. for create_app or the models) doesn't build one
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 """
 if __name__ == '__main__':
     print("Starting Flask server...")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
 """
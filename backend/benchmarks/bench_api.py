@@ -0,0 +1,406 @@
+"""
+Benchmark every route in app.py against a seeded SQLite database.
+
+Runs the app in-process through Flask test clients (no network, so numbers
+measure the app, the ORM and SQLite), with the offline stub LLM provider in
+place of Groq. Seeds users, titles, notes, quizzes and tasks, then calls each
+route from --concurrency threads, each with its own logged-in client, and
+reports throughput and latency percentiles per route as JSON. Setup a route
+needs (e.g. creating the title a DELETE removes) is done outside the timing.
+
+    python benchmarks/bench_api.py --output bench_api.json
+    python benchmarks/bench_api.py --baseline bench_api.json --max-regression 0.25
+
+With --baseline the exit status is 1 when any route's p95 got slower by more
+than --max-regression (and by more than --noise-ms).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BASE_URL = 'https://localhost'  # session cookies are Secure
+BENCH_USER = {'username': 'bench', 'password': 'bench-password', 'role': 'admin'}
+METRICS_TOKEN = 'bench'
+NOTE_TEXT = (
+    'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs mostly blue and red light. '
+    'The Calvin cycle fixes carbon dioxide into sugars. Mitochondria release energy through respiration. '
+)
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of text per page."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))}] /Count {len(pages)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i, text in enumerate(pages):
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'.encode())
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+    out, offsets = b'%PDF-1.4\n', []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f'{i + 1} 0 obj\n'.encode() + obj + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF'.encode()
+    return out
+
+
+def configure_environment(args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='thinkpal-bench-'), 'bench.db')
+    os.environ['DATABASE_URI'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ['LLM_PROVIDERS'] = 'stub'
+    os.environ['LLM_STUB_LATENCY_MS'] = str(args.llm_latency_ms)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['METRICS_TOKEN'] = METRICS_TOKEN
+    # The benchmark is one user hammering every route; don't let the limiter turn that into 429s
+    for name in ('AI_RATE_PER_MIN', 'AI_RATE_BURST', 'AI_IP_RATE_PER_MIN', 'AI_IP_RATE_BURST', 'AI_MAX_INFLIGHT'):
+        os.environ[name] = '1000000'
+    if not args.quiz_cache:
+        os.environ['QUIZ_CACHE_SIZE'] = '0'
+    for name in ('GROQ_API_KEY', 'GEMINI_API_KEY', 'QUIZ_CACHE_DB', 'USER_CACHE_DB', 'RATE_LIMIT_DB', 'SINGLE_FLIGHT_DB'):
+        os.environ.pop(name, None)
+
+
+def seed(app_module, args):
+    """Bulk insert data for args.users users; user 1 is the logged-in benchmark user."""
+    db = app_module.db
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+
+    users = [{'user_id': u, 'username': f'user{u}', 'password': 'x', 'role': 'user', 'date_created': start}
+             for u in range(2, args.users + 1)]
+    titles, notes, quizzes, tasks = [], [], [], []
+    title_num = 0
+    for user_id in range(1, args.users + 1):
+        for _ in range(args.titles_per_user):
+            title_num += 1
+            titles.append({'title_num': title_num, 'user_id': user_id, 'note_title': f'Title {title_num}',
+                           'date_accessed': start + timedelta(minutes=rng.randint(0, 500000))})
+            notes.append({'note_num': title_num, 'title_num': title_num, 'notes': NOTE_TEXT * 3, 'version': 1})
+            for q in range(args.quizzes_per_note):
+                quizzes.append({'note_num': title_num, 'quiz_title': f'Quiz {title_num}',
+                                'question': f'What does part {q} of title {title_num} describe?', 'answer': 'Energy'})
+        for t in range(args.tasks_per_user):
+            tasks.append({'user_id': user_id, 'task_name': f'Task {t}', 'status': 'Pending', 'date_created': start})
+
+    for model, rows in ((app_module.User, users), (app_module.Title, titles), (app_module.Note, notes),
+                        (app_module.Quiz, quizzes), (app_module.Task, tasks)):
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+    from search import backfill_search_index
+    with db.engine.begin() as conn:
+        tables = db.metadata.tables
+        backfill_search_index(conn, tables['tbl_titles'], tables['tbl_note'], tables['tbl_quiz'])
+
+    return {'users': args.users, 'titles': len(titles), 'notes': len(notes),
+            'quizzes': len(quizzes), 'tasks': len(tasks)}
+
+
+class Bench:
+    """Shared state the scenarios use to build requests."""
+
+    def __init__(self, app_module, args):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.args = args
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.own_titles = list(range(1, args.titles_per_user + 1))
+        self.pdf = make_pdf([NOTE_TEXT[:80]] * 3)
+
+    def unique(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def client(self):
+        client = self.app.test_client()
+        response = client.post('/login', json=BENCH_USER, base_url=BASE_URL)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return client
+
+    def title(self, i):
+        return self.own_titles[i % len(self.own_titles)]
+
+    # Untimed setup helpers
+    def new_title(self, client, with_note=True):
+        num = client.post('/titles', json={'note_title': f'Bench {self.unique()}'}, base_url=BASE_URL).json['title_num']
+        if with_note:
+            client.post('/notes', json={'title_num': num, 'notes': NOTE_TEXT}, base_url=BASE_URL)
+        return num
+
+    def new_task(self, client):
+        return client.post('/task/add', json={'task_name': f'Bench {self.unique()}'}, base_url=BASE_URL).json['task_id']
+
+    def new_quizzes(self, note_num, count):
+        app_module = self.app_module
+        with self.app.app_context():
+            quizzes = [app_module.Quiz(note_num=note_num, quiz_title='Bench', question=f'Q{i}?', answer='A')
+                       for i in range(count)]
+            app_module.db.session.add_all(quizzes)
+            app_module.db.session.commit()
+            return [q.quiz_num for q in quizzes]
+
+    def finished_job(self, client):
+        job_id = client.post('/jobs/elaborate_note', json={'note_content': NOTE_TEXT, 'fidelity_mode': 'local'},
+                             base_url=BASE_URL).json['job_id']
+        for _ in range(500):
+            if client.get(f'/jobs/{job_id}', base_url=BASE_URL).json['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.01)
+        return job_id
+
+
+def request(method, path, **kwargs):
+    """A scenario step: the request to time, as (method, path, kwargs)."""
+    return method, path, kwargs
+
+
+def scenarios(bench):
+    """route -> prepare(client, i) returning the request to time (and optionally a client to use)."""
+    b = bench
+    return {
+        'GET /': lambda c, i: request('get', '/'),
+        'POST /login/register': lambda c, i: request(
+            'post', '/login/register', json={'username': f'new{b.unique()}', 'password': 'pw'}),
+        'POST /login': lambda c, i: request('post', '/login', json=BENCH_USER),
+        'POST /logout': lambda c, i: (request('post', '/logout'), b.client()),
+        'GET /protected': lambda c, i: request('get', '/protected'),
+        'GET /current-user': lambda c, i: request('get', '/current-user'),
+
+        'GET /titles': lambda c, i: request('get', '/titles'),
+        'GET /titles/sorted': lambda c, i: request('get', '/titles/sorted'),
+        'GET /titles/get-num': lambda c, i: request('get', f'/titles/get-num?title=Title {b.title(i)}'),
+        'GET /titles/<int:title_num>': lambda c, i: request('get', f'/titles/{b.title(i)}'),
+        'POST /titles': lambda c, i: request('post', '/titles', json={'note_title': f'Bench {b.unique()}'}),
+        'PUT /titles/<int:title_num>': lambda c, i: request(
+            'put', f'/titles/{b.title(i)}', json={'note_title': f'Title {b.title(i)}'}),
+        'DELETE /titles/<int:title_num>': lambda c, i: request('delete', f'/titles/{b.new_title(c)}'),
+        'POST /titles/batch': lambda c, i: request(
+            'post', '/titles/batch', json={'titles': [{'note_title': f'Bench {b.unique()}'} for _ in range(10)]}),
+        'DELETE /titles/batch': lambda c, i: request(
+            'delete', '/titles/batch', json={'title_nums': [b.new_title(c) for _ in range(5)]}),
+
+        'GET /notes': lambda c, i: request('get', '/notes'),
+        'GET /notes/<int:note_num>': lambda c, i: request('get', f'/notes/{b.title(i)}'),
+        'POST /notes': lambda c, i: request(
+            'post', '/notes', json={'title_num': b.new_title(c, with_note=False), 'notes': NOTE_TEXT}),
+        'PUT /notes/<int:note_num>': lambda c, i: request(
+            'put', f'/notes/{b.title(i)}', json={'notes': NOTE_TEXT * (2 + i % 2)}),
+        'PATCH /notes/<int:note_num>': lambda c, i: request(
+            'patch', f'/notes/{b.title(i)}', json={
+                'version': c.get(f'/notes/{b.title(i)}', base_url=BASE_URL).json['version'],
+                'ops': [{'start': 0, 'end': 0, 'text': f'Edit {i}. '}]}),
+        'DELETE /notes/<int:note_num>': lambda c, i: request('delete', f'/notes/{b.new_title(c)}'),
+        'POST /notes/upload': lambda c, i: request(
+            'post', f'/notes/upload?title_num={b.new_title(c, with_note=False)}', data=b.pdf,
+            content_type='application/pdf'),
+
+        'GET /quizzes': lambda c, i: request('get', '/quizzes'),
+        'DELETE /quizzes/batch': lambda c, i: request(
+            'delete', '/quizzes/batch', json={'quiz_nums': b.new_quizzes(b.title(i), 5)}),
+        'POST /generate_quiz': lambda c, i: request(
+            'post', '/generate_quiz', json={'title_num': b.title(i), 'quiz_title': 'Bench', 'num_questions': 5}),
+        'POST /generate_quiz/batch': lambda c, i: request(
+            'post', '/generate_quiz/batch', json={'title_nums': [b.title(i + k) for k in range(3)],
+                                                  'quiz_title': 'Bench', 'num_questions': 3}),
+        'POST /groq/elaborate_note': lambda c, i: request(
+            'post', '/groq/elaborate_note', json={'note_content': f'{NOTE_TEXT} ({i})'}),
+        'POST /groq/elaborate_note/stream': lambda c, i: request(
+            'post', '/groq/elaborate_note/stream', json={'note_content': f'{NOTE_TEXT} ({i})'}),
+
+        'POST /jobs/generate_quiz': lambda c, i: request(
+            'post', '/jobs/generate_quiz', json={'title_num': b.title(i), 'quiz_title': 'Bench'}),
+        'POST /jobs/elaborate_note': lambda c, i: request(
+            'post', '/jobs/elaborate_note', json={'note_content': NOTE_TEXT, 'fidelity_mode': 'local'}),
+        'GET /jobs/<job_id>': lambda c, i: request('get', f'/jobs/{b.finished_job(c)}'),
+        'GET /jobs/<job_id>/stream': lambda c, i: request('get', f'/jobs/{b.finished_job(c)}/stream'),
+
+        'GET /search': lambda c, i: request('get', '/search?q=chlorophyll light'),
+        'GET /dashboard/summary': lambda c, i: request('get', '/dashboard/summary'),
+
+        'GET /task/all': lambda c, i: request('get', '/task/all'),
+        'POST /task/add': lambda c, i: request('post', '/task/add', json={'task_name': f'Bench {b.unique()}'}),
+        'PUT /task/edit/<int:task_id>': lambda c, i: request(
+            'put', f'/task/edit/{b.new_task(c)}', json={'status': 'Completed'}),
+        'DELETE /task/delete/<int:task_id>': lambda c, i: request('delete', f'/task/delete/{b.new_task(c)}'),
+        'POST /task/batch': lambda c, i: request(
+            'post', '/task/batch', json={'tasks': [{'task_name': f'Bench {b.unique()}'} for _ in range(10)]}),
+        'DELETE /task/batch': lambda c, i: request(
+            'delete', '/task/batch', json={'task_ids': [b.new_task(c) for _ in range(5)]}),
+
+        'GET /admin-users': lambda c, i: request('get', '/admin-users'),
+        'GET /admin/cache-stats': lambda c, i: request('get', '/admin/cache-stats'),
+        'GET /admin/db-pool': lambda c, i: request('get', '/admin/db-pool'),
+        'GET /admin/llm': lambda c, i: request('get', '/admin/llm'),
+        'GET /admin/rate-limits': lambda c, i: request('get', '/admin/rate-limits'),
+        'POST /admin/create-user': lambda c, i: request(
+            'post', '/admin/create-user', json={'username': f'admin-made{b.unique()}', 'password': 'pw'}),
+        'PUT /admin/update-user/<int:user_id>': lambda c, i: request(
+            'put', f'/admin/update-user/{2 + i % max(b.args.users - 1, 1)}', json={'role': 'user'}),
+        'DELETE /admin/delete-user/<int:user_id>': lambda c, i: request(
+            'delete', f'/admin/delete-user/{c.post("/admin/create-user", json={"username": f"doomed{b.unique()}", "password": "pw"}, base_url=BASE_URL).json["user_id"]}'),
+        'GET /metrics': lambda c, i: request('get', '/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'}),
+    }
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, max(0, int(round(len(ordered) * pct / 100)) - 1))]
+
+
+def run_route(bench, prepare, args):
+    """Call one route args.iterations times from args.concurrency threads."""
+    timings, statuses, errors = [], {}, []
+    lock = threading.Lock()
+    per_thread = max(1, args.iterations // args.concurrency)
+
+    def worker(thread_index):
+        client = bench.client()
+        for n in range(args.warmup + per_thread):
+            i = thread_index * per_thread + n
+            try:
+                prepared = prepare(client, i)
+                (method, path, kwargs), use_client = prepared if isinstance(prepared[0], tuple) else (prepared, client)
+                started = time.perf_counter()
+                response = getattr(use_client, method)(path, base_url=BASE_URL, **kwargs)
+                response.get_data()  # drain streamed responses inside the timing
+                elapsed = time.perf_counter() - started
+                response.close()
+            except Exception as e:
+                with lock:
+                    errors.append(f'{type(e).__name__}: {e}')
+                continue
+            if n < args.warmup:
+                continue
+            with lock:
+                timings.append(elapsed * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    timings.sort()
+    result = {
+        'requests': len(timings),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': len(errors) + sum(count for code, count in statuses.items() if code >= 500),
+        'throughput_rps': round(len(timings) / wall, 1) if wall else None,
+    }
+    if timings:
+        result.update({
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'max_ms': round(timings[-1], 3),
+        })
+    if errors:
+        result['error_samples'] = sorted(set(errors))[:3]
+    return result
+
+
+def compare(report, baseline, max_regression, noise_ms):
+    """Routes whose p95 is more than max_regression (and noise_ms) slower than in the baseline."""
+    regressions = []
+    for route, now in report['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if not before or 'p95_ms' not in now or 'p95_ms' not in before:
+            continue
+        if now['p95_ms'] > before['p95_ms'] * (1 + max_regression) and now['p95_ms'] - before['p95_ms'] > noise_ms:
+            regressions.append({'route': route, 'baseline_p95_ms': before['p95_ms'], 'p95_ms': now['p95_ms'],
+                                'change': round(now['p95_ms'] / before['p95_ms'] - 1, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--titles-per-user', type=int, default=40)
+    parser.add_argument('--quizzes-per-note', type=int, default=10)
+    parser.add_argument('--tasks-per-user', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=100, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per thread per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--llm-latency-ms', type=float, default=20, help='stub LLM response time')
+    parser.add_argument('--quiz-cache', action='store_true', help='keep the quiz result cache on')
+    parser.add_argument('--routes', help='comma separated route names to run (default: all)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier report to compare p95 latencies against')
+    parser.add_argument('--max-regression', type=float, default=0.25)
+    parser.add_argument('--noise-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    import app as app_module
+    from migrations import upgrade_database
+
+    with app_module.app.app_context():
+        upgrade_database(app_module.db.engine, app_module.db.metadata)
+        register = app_module.app.test_client().post('/login/register', json=BENCH_USER, base_url=BASE_URL)
+        assert register.status_code == 200, register.get_data(as_text=True)
+        counts = seed(app_module, args)
+
+    bench = Bench(app_module, args)
+    all_scenarios = scenarios(bench)
+    selected = args.routes.split(',') if args.routes else list(all_scenarios)
+
+    routes = {}
+    for name in selected:
+        routes[name] = run_route(bench, all_scenarios[name], args)
+        print(f'{name}: p50 {routes[name].get("p50_ms")} ms, p95 {routes[name].get("p95_ms")} ms', file=sys.stderr)
+
+    rules = {
+        f'{method} {rule.rule}'
+        for rule in app_module.app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    }
+    report = {
+        'database': 'sqlite',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'rows': counts,
+        'routes': routes,
+        # New routes show up here until a scenario is added for them
+        'uncovered_routes': sorted(rules - set(all_scenarios)),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['regressions'] = compare(report, json.load(f), args.max_regression, args.noise_ms)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Measure how long a worker takes to import app.py and build the app.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters. The run with
+the lowest total is reported: the total, the modules app.py imports directly
+(ranked by cumulative time) and the slowest individual imports. A second
+process times create_app(). It also checks that the SDKs meant to load on
+first use (groq, google.generativeai, PyPDF2) were not imported along the way.
+API keys are set to dummy values so the AI providers are configured the way
+they are in production.
+
+    python benchmarks/bench_importtime.py --output bench_importtime.json
+    python benchmarks/bench_importtime.py --max-import-ms 800
+
+With --max-import-ms, the exit status is 1 when importing takes longer than
+that or a lazy SDK was imported eagerly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ('groq', 'google.generativeai', 'PyPDF2')
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+built = time.perf_counter()
+print(json.dumps({
+    'import_wall_ms': (imported - started) * 1000,
+    'create_app_ms': (built - imported) * 1000,
+    'lazy_modules_loaded': [m for m in %r if m in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def environment():
+    env = {
+        **os.environ,
+        'DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='thinkpal-import-'), 'import.db')}",
+        'SECRET_KEY': 'bench',
+        'GROQ_API_KEY': 'bench-key',
+        'GEMINI_API_KEY': 'bench-key',
+        'LOG_LEVEL': 'ERROR',
+    }
+    env.pop('DB_UPGRADE_ON_STARTUP', None)
+    return env
+
+
+def parse_importtime(stderr):
+    """[(depth, module, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def app_imports(rows):
+    """The 'app' row and the rows of the modules it imported directly (printed just before it)."""
+    index = next(i for i, row in enumerate(rows) if row[1] == 'app' and row[0] == 0)
+    children = []
+    for depth, name, self_us, cumulative_us in reversed(rows[:index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative_us))
+    return rows[index], children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters to run (the fastest is kept)')
+    parser.add_argument('--top', type=int, default=15, help='modules to list')
+    parser.add_argument('--max-import-ms', type=float, help='fail when importing app takes longer')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    env = environment()
+    best = None
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+        rows = parse_importtime(result.stderr)
+        app_row, children = app_imports(rows)
+        if best is None or app_row[3] < best[0][3]:
+            best = (app_row, children, rows)
+    app_row, children, rows = best
+
+    startup = min(
+        (json.loads(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=BACKEND_DIR, env=env,
+                                   capture_output=True, text=True, check=True).stdout)
+         for _ in range(args.repeat)),
+        key=lambda r: r['import_wall_ms'],
+    )
+
+    report = {
+        'python': sys.version.split()[0],
+        'import_app_ms': round(app_row[3] / 1000, 1),
+        'import_wall_ms': round(startup['import_wall_ms'], 1),
+        'create_app_ms': round(startup['create_app_ms'], 1),
+        'lazy_modules_loaded': startup['lazy_modules_loaded'],
+        'direct_imports': [{'module': name, 'cumulative_ms': round(us / 1000, 1)}
+                           for name, us in sorted(children, key=lambda c: -c[1])[:args.top]],
+        'slowest_modules_self': [{'module': name, 'self_ms': round(self_us / 1000, 1)}
+                                 for _, name, self_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]],
+    }
+
+    failures = []
+    if report['lazy_modules_loaded']:
+        failures.append(f"imported at startup: {', '.join(report['lazy_modules_loaded'])}")
+    if args.max_import_ms is not None and report['import_app_ms'] > args.max_import_ms:
+        failures.append(f"import took {report['import_app_ms']} ms, budget {args.max_import_ms} ms")
+    report['failures'] = failures
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(1 if args.max_import_ms is not None and failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark the hot lookup queries with and without the migration 2 indexes.
+
+Seeds a throwaway SQLite database with synthetic users, titles, notes,
+quizzes and tasks, then for each query records the query plan and the
+latency percentiles before the indexes exist and after they are created.
+
+    python benchmarks/bench_indexes.py --users 200 --titles-per-user 50 --output bench_indexes.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+INDEX_NAMES = [
+    'ix_tbl_titles_user_id_date_accessed',
+    'ix_tbl_titles_user_id_note_title',
+    'ix_tbl_note_title_num',
+    'ix_tbl_quiz_note_num',
+    'ix_tbl_tasks_user_id',
+]
+
+
+def seed(app_module, args):
+    db = app_module.db
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+
+    users = [{'user_id': u, 'username': f'user{u}', 'password': 'x', 'role': 'user', 'date_created': start}
+             for u in range(1, args.users + 1)]
+    titles, notes, quizzes, tasks = [], [], [], []
+    title_num = 0
+    for user in users:
+        for _ in range(args.titles_per_user):
+            title_num += 1
+            titles.append({
+                'title_num': title_num,
+                'user_id': user['user_id'],
+                'note_title': f'Title {title_num}',
+                'date_accessed': start + timedelta(minutes=rng.randint(0, 500000)),
+            })
+            notes.append({'note_num': title_num, 'title_num': title_num, 'notes': 'lorem ipsum ' * 50})
+            for q in range(args.quizzes_per_note):
+                quizzes.append({'note_num': title_num, 'quiz_title': f'Quiz {title_num}',
+                                'question': f'Question {q}?', 'answer': f'Answer {q}'})
+        for t in range(args.tasks_per_user):
+            tasks.append({'user_id': user['user_id'], 'task_name': f'Task {t}', 'status': 'Pending',
+                          'date_created': start})
+
+    for model, rows in ((app_module.User, users), (app_module.Title, titles), (app_module.Note, notes),
+                        (app_module.Quiz, quizzes), (app_module.Task, tasks)):
+        db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+    return {'users': len(users), 'titles': len(titles), 'notes': len(notes),
+            'quizzes': len(quizzes), 'tasks': len(tasks)}
+
+
+def build_queries(app_module, user_id, note_title):
+    """The statements behind the CRUD routes, as the routes build them."""
+    db = app_module.db
+    Title, Note, Quiz, Task = app_module.Title, app_module.Note, app_module.Quiz, app_module.Task
+    return {
+        'titles': Title.query.filter_by(user_id=user_id).order_by(Title.title_num),
+        'titles_sorted': Title.query.filter_by(user_id=user_id)
+            .order_by(Title.date_accessed.desc(), Title.title_num.desc()),
+        'title_get_num': Title.query.filter_by(note_title=note_title, user_id=user_id).limit(1),
+        'notes': db.session.query(*app_module.NOTE_COLUMNS.values())
+            .join(Title, Note.title_num == Title.title_num).filter(Title.user_id == user_id),
+        'quizzes': db.session.query(*app_module.QUIZ_COLUMNS.values())
+            .join(Note, Quiz.note_num == Note.note_num)
+            .join(Title, Note.title_num == Title.title_num).filter(Title.user_id == user_id),
+        'tasks': Task.query.filter_by(user_id=user_id).order_by(Task.task_id),
+    }
+
+
+def measure(app_module, args, user_ids):
+    db = app_module.db
+    results = {}
+    for name in build_queries(app_module, 1, 'Title 1'):
+        timings = []
+        plan = None
+        for i in range(args.iterations):
+            user_id = user_ids[i % len(user_ids)]
+            query = build_queries(app_module, user_id, f'Title {(user_id - 1) * args.titles_per_user + 1}')[name]
+            if plan is None:
+                sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+                plan = [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+            started = time.perf_counter()
+            query.all()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            'plan': plan,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--titles-per-user', type=int, default=50)
+    parser.add_argument('--quizzes-per-note', type=int, default=10)
+    parser.add_argument('--tasks-per-user', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='thinkpal-bench-'), 'bench.db')
+    os.environ['DATABASE_URI'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('SECRET_KEY', 'bench')
+
+    import app as app_module
+    from migrations import upgrade_database
+    db = app_module.db
+
+    with app_module.app.app_context():
+        upgrade_database(db.engine, db.metadata)
+        counts = seed(app_module, args)
+        user_ids = list(range(1, args.users + 1))
+        random.Random(7).shuffle(user_ids)
+
+        for name in INDEX_NAMES:
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+        before = measure(app_module, args, user_ids)
+
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in INDEX_NAMES:
+                    index.create(db.engine)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        after = measure(app_module, args, user_ids)
+
+    report = {
+        'database': 'sqlite',
+        'rows': counts,
+        'iterations': args.iterations,
+        'queries': {name: {'before': before[name], 'after': after[name]} for name in before},
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
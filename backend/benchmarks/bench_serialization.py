@@ -0,0 +1,139 @@
+"""
+Compare JSON providers and response encodings on /notes and /quizzes sized payloads.
+
+For each payload it times serialization with Flask's default provider and with
+the orjson provider (when installed), then the size and time of every encoding
+the server can negotiate. No database is needed: the payloads are built in
+the same shape list_response returns.
+
+    python benchmarks/bench_serialization.py --notes 200 --quizzes 2000 --output bench_serialization.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from compression import Compressor, brotli
+from json_provider import OrjsonProvider, orjson
+
+SENTENCES = [
+    'Photosynthesis converts light energy into chemical energy stored in glucose.',
+    'Chlorophyll absorbs mostly blue and red light and reflects green.',
+    'The Calvin cycle fixes carbon dioxide into three-carbon sugars.',
+    'Mitochondria release the energy in glucose through cellular respiration.',
+    'Enzymes lower the activation energy of the reactions they catalyse.',
+]
+
+
+def notes_payload(count, note_chars):
+    body = ' '.join(SENTENCES)
+    body = (body * (note_chars // len(body) + 1))[:note_chars]
+    return [
+        {'note_num': n, 'title_num': n, 'notes': f'{n}. {body}', 'version': 1 + n % 4, 'user_id': 1}
+        for n in range(1, count + 1)
+    ]
+
+
+def quizzes_payload(count):
+    return [
+        {'quiz_num': q, 'note_num': 1 + q // 10, 'quiz_title': f'Biology quiz {1 + q // 10}',
+         'question': f'Question {q}: {SENTENCES[q % len(SENTENCES)][:-1]}?', 'answer': SENTENCES[(q + 1) % len(SENTENCES)],
+         'user_id': 1}
+        for q in range(1, count + 1)
+    ]
+
+
+def titles_payload(count):
+    # The date-heavy payload (date_accessed), where providers differ most in per-value work
+    start = datetime(2025, 1, 1)
+    return [
+        {'title_num': t, 'note_title': f'Title {t}', 'date_accessed': start + timedelta(minutes=t), 'user_id': 1}
+        for t in range(1, count + 1)
+    ]
+
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` runs in milliseconds, and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+
+def bench_payload(app, providers, compressor, payload, repeat):
+    result = {'items': len(payload), 'serialize': {}, 'encodings': {}}
+    body = None
+    with app.app_context():
+        for name, provider in providers.items():
+            ms, response = best_of(lambda: provider.response(payload), repeat)
+            data = response.get_data()
+            result['serialize'][name] = {'ms': ms, 'bytes': len(data)}
+            body = body or data
+            if json.loads(data) != json.loads(body):
+                raise AssertionError(f'{name} output differs from the default provider')
+
+    result['encodings']['identity'] = {'bytes': len(body), 'ms': 0.0}
+    for encoding in compressor.encodings:
+        ms, compressed = best_of(lambda: compressor.compress(body, encoding), repeat)
+        result['encodings'][encoding] = {'bytes': len(compressed), 'ms': ms,
+                                         'ratio': round(len(compressed) / len(body), 3)}
+    for level in (1, 9):
+        ms, compressed = best_of(lambda: gzip.compress(body, compresslevel=level, mtime=0), repeat)
+        result['encodings'][f'gzip-{level}'] = {'bytes': len(compressed), 'ms': ms,
+                                                'ratio': round(len(compressed) / len(body), 3)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=200, help='notes in the /notes payload')
+    parser.add_argument('--note-chars', type=int, default=4000, help='characters per note body')
+    parser.add_argument('--quizzes', type=int, default=2000, help='quizzes in the /quizzes payload')
+    parser.add_argument('--titles', type=int, default=2000, help='titles in the /titles/sorted payload')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement (the fastest is kept)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = {'default': DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider(app)
+    compressor = Compressor.from_env()
+
+    payloads = {
+        '/notes': notes_payload(args.notes, args.note_chars),
+        '/quizzes': quizzes_payload(args.quizzes),
+        '/titles/sorted': titles_payload(args.titles),
+    }
+    report = {
+        'orjson': orjson is not None,
+        'brotli': brotli is not None,
+        'gzip_level': compressor.gzip_level,
+        'br_quality': compressor.br_quality,
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'payloads': {route: bench_payload(app, providers, compressor, payload, args.repeat)
+                     for route, payload in payloads.items()},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
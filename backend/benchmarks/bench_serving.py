@@ -0,0 +1,224 @@
+"""
+Compare gunicorn worker profiles (gunicorn.conf.py) on slow upstream LLM calls.
+
+For each profile this starts gunicorn on a fresh SQLite database with the stub
+LLM provider answering after --llm-latency-ms. It then sends --requests calls
+from --concurrency client threads to /groq/elaborate_note and /generate_quiz.
+Every request has its own note text, so caches and single-flight don't merge
+them. The report has throughput, p50/p95/p99 latency, the status codes and
+the memory of the worker processes.
+
+    python benchmarks/bench_serving.py --profiles sync,gthread --concurrency 200 --requests 400 --output bench_serving.json
+
+Profiles whose worker class isn't installed (gevent) are reported as skipped.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTE_TEXT = (
+    'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs mostly blue and red light. '
+    'The Calvin cycle fixes carbon dioxide into sugars. Mitochondria release energy through respiration.'
+)
+USER = {'username': 'bench', 'password': 'bench-password'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def worker_rss_mb(master_pid):
+    """Resident memory of the gunicorn master and its workers (Linux only, else None)."""
+    if not os.path.isdir('/proc'):
+        return None
+    total_kb = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        if int(pid) == master_pid or int(status.get('PPid', '0').strip()) == master_pid:
+            total_kb += int(status.get('VmRSS', '0 kB').split()[0])
+    return round(total_kb / 1024, 1)
+
+
+class Server:
+    def __init__(self, profile, args, workdir):
+        self.port = free_port()
+        self.base = f'http://127.0.0.1:{self.port}'
+        self.env = {
+            **os.environ,
+            'DATABASE_URI': f"sqlite:///{os.path.join(workdir, f'{profile}.db')}",
+            'SECRET_KEY': 'bench',
+            'LLM_PROVIDERS': 'stub',
+            'LLM_STUB_LATENCY_MS': str(args.llm_latency_ms),
+            'LOG_LEVEL': 'WARNING',
+            'GUNICORN_PROFILE': profile,
+            'PORT': str(self.port),
+            'WEB_CONCURRENCY': str(args.sync_workers if profile == 'sync' else args.workers),
+            'GUNICORN_THREADS': str(args.threads),
+            'GUNICORN_CONNECTIONS': str(args.connections),
+            # One client generates all the load; only the worker model should limit it
+            'AI_RATE_PER_MIN': '1000000', 'AI_RATE_BURST': '1000000',
+            'AI_IP_RATE_PER_MIN': '1000000', 'AI_IP_RATE_BURST': '1000000',
+            'AI_MAX_INFLIGHT': '1000000',
+        }
+        for name in ('GROQ_API_KEY', 'GEMINI_API_KEY', 'RATE_LIMIT_DB', 'SINGLE_FLIGHT_DB', 'QUIZ_CACHE_DB'):
+            self.env.pop(name, None)
+        self.log_path = os.path.join(workdir, f'{profile}.log')
+        self.process = None
+
+    def start(self):
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db-upgrade'],
+                       cwd=BACKEND_DIR, env=self.env, check=True, capture_output=True)
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                        cwd=BACKEND_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited, see {self.log_path}')
+            try:
+                if requests.get(self.base + '/', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f'gunicorn did not start, see {self.log_path}')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.process:
+            self.log.close()
+
+
+def login(base):
+    requests.post(base + '/login/register', json=USER, timeout=30)
+    response = requests.post(base + '/login', json=USER, timeout=30)
+    response.raise_for_status()
+    # The session cookie is Secure, so requests won't send it back over http by itself
+    return {'Cookie': f"session={response.cookies['session']}"}
+
+
+def seed_notes(base, headers, count):
+    """One title + note per quiz request, with distinct text so no two requests share a result."""
+    title_nums = []
+    with requests.Session() as session:
+        for i in range(count):
+            title_num = session.post(base + '/titles', json={'note_title': f'Bench {i}'},
+                                     headers=headers, timeout=30).json()['title_num']
+            session.post(base + '/notes', json={'title_num': title_num, 'notes': f'{NOTE_TEXT} ({i})'},
+                         headers=headers, timeout=30).raise_for_status()
+            title_nums.append(title_num)
+    return title_nums
+
+
+def run_load(request_for, count, concurrency):
+    def one(i):
+        method, url, kwargs = request_for(i)
+        started = time.perf_counter()
+        try:
+            status = requests.request(method, url, timeout=600, **kwargs).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        return status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - started
+
+    timings = sorted(ms for _, ms in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    pick = lambda pct: round(timings[min(len(timings) - 1, max(0, round(len(timings) * pct / 100) - 1))], 1)
+    return {
+        'requests': count,
+        'status_codes': statuses,
+        'wall_seconds': round(wall, 2),
+        'throughput_rps': round(count / wall, 1),
+        'p50_ms': pick(50), 'p95_ms': pick(95), 'p99_ms': pick(99),
+        'mean_ms': round(statistics.fmean(timings), 1),
+    }
+
+
+def bench_profile(profile, args, workdir):
+    if profile == 'gevent' and importlib.util.find_spec('gevent') is None:
+        return {'skipped': 'gevent is not installed (pip install gevent)'}
+
+    server = Server(profile, args, workdir)
+    try:
+        server.start()
+        headers = login(server.base)
+        title_nums = seed_notes(server.base, headers, args.requests)
+        result = {'workers': int(server.env['WEB_CONCURRENCY']), 'routes': {}}
+
+        result['routes']['POST /groq/elaborate_note'] = run_load(
+            lambda i: ('post', server.base + '/groq/elaborate_note',
+                       {'json': {'note_content': f'{NOTE_TEXT} [{profile} {i}]', 'fidelity_mode': 'local'}}),
+            args.requests, args.concurrency)
+        result['routes']['POST /generate_quiz'] = run_load(
+            lambda i: ('post', server.base + '/generate_quiz',
+                       {'json': {'title_num': title_nums[i], 'quiz_title': 'Bench', 'num_questions': 3},
+                        'headers': headers}),
+            args.requests, args.concurrency)
+        result['rss_mb'] = worker_rss_mb(server.process.pid)
+        return result
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='sync,gthread,gevent')
+    parser.add_argument('--requests', type=int, default=400, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=200, help='client threads')
+    parser.add_argument('--llm-latency-ms', type=float, default=1000, help='stub upstream response time')
+    parser.add_argument('--sync-workers', type=int, default=4, help='processes for the sync profile')
+    parser.add_argument('--workers', type=int, default=2, help='processes for gthread and gevent')
+    parser.add_argument('--threads', type=int, default=100, help='threads per gthread worker')
+    parser.add_argument('--connections', type=int, default=500, help='greenlets per gevent worker')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='thinkpal-serving-')
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'profiles': {},
+    }
+    for profile in args.profiles.split(','):
+        print(f'Benchmarking {profile}...', file=sys.stderr)
+        report['profiles'][profile] = bench_profile(profile, args, workdir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
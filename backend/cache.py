@@ -0,0 +1,222 @@
+"""
+Result cache for expensive AI calls.
+
+Two tiers:
+  - an in-process LRU with a TTL (fast, per gunicorn worker)
+  - an optional shared SQLite tier so every worker on the box can reuse results
+
+Values must be JSON serializable. A cache built with shared_only=True skips the
+in-process tier whenever the shared tier is configured, so a delete() is seen by
+every worker at once (at the cost of a SQLite read per lookup).
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+def make_cache_key(*parts):
+    """Hash the given parts into a stable, content-addressed key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic edits don't change the cache key."""
+    return ' '.join((text or '').split())
+
+
+class TTLCache:
+    """Thread safe in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize=512, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Shared cache tier backed by a SQLite file (one per box, all workers)."""
+
+    def __init__(self, path, maxsize=5000, ttl=3600):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_last_access ON cache_entries (last_access)')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, so open one per call.
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return MISSING
+            if row[1] < now:
+                conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                return MISSING
+            conn.execute('UPDATE cache_entries SET last_access = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), expires_at, now)
+            )
+            conn.execute('DELETE FROM cache_entries WHERE expires_at < ?', (now,))
+            conn.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                ' SELECT key FROM cache_entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.maxsize,)
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries')
+
+
+class ResultCache:
+    """In-process tier in front of an optional shared tier, with hit/miss counters."""
+
+    def __init__(self, name, maxsize=512, ttl=3600, shared_path=None, shared_maxsize=5000, shared_only=False):
+        self.name = name
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared = SQLiteCache(shared_path, maxsize=shared_maxsize, ttl=ttl) if shared_path else None
+        # Without a shared tier the local one is all there is
+        self.use_local = not (shared_only and self.shared is not None)
+        self._lock = threading.Lock()
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.local.get(key) if self.use_local else MISSING
+        if value is not MISSING:
+            self._count('hits_local')
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except sqlite3.Error as e:
+                logger.warning('Shared cache read failed (%s): %s', self.name, e)
+                value = MISSING
+            if value is not MISSING:
+                if self.use_local:
+                    self.local.set(key, value)
+                self._count('hits_shared')
+                return value
+
+        self._count('misses')
+        return MISSING
+
+    def set(self, key, value):
+        if self.use_local:
+            self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning('Shared cache write failed (%s): %s', self.name, e)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except sqlite3.Error as e:
+                logger.warning('Shared cache delete failed (%s): %s', self.name, e)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        hits = self.hits_local + self.hits_shared
+        total = hits + self.misses
+        return {
+            'name': self.name,
+            'hits_local': self.hits_local,
+            'hits_shared': self.hits_shared,
+            'misses': self.misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'local_size': len(self.local),
+            'shared_enabled': self.shared is not None,
+        }
+
+
+def cache_from_env(name, prefix, default_ttl=86400, default_size=512, shared_only=False):
+    """
+    Build a ResultCache from <PREFIX>_CACHE_TTL, <PREFIX>_CACHE_SIZE and
+    <PREFIX>_CACHE_DB (path to the shared SQLite file, optional).
+    """
+    return ResultCache(
+        name,
+        maxsize=int(os.getenv(f'{prefix}_CACHE_SIZE', default_size)),
+        ttl=int(os.getenv(f'{prefix}_CACHE_TTL', default_ttl)),
+        shared_path=os.getenv(f'{prefix}_CACHE_DB') or None,
+        shared_only=shared_only,
+    )
@@ -0,0 +1,92 @@
+"""
+Helpers for splitting long notes into prompt-sized chunks and merging the
+per-chunk quiz results back together.
+"""
+import re
+from itertools import zip_longest
+
+# Rough heuristic for English text; good enough to keep prompts under the context limit
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(piece, max_tokens):
+    """Split a paragraph into sentences, and a sentence into word runs, until each fits."""
+    if estimate_tokens(piece) <= max_tokens:
+        return [piece]
+
+    sentences = SENTENCE_RE.split(piece)
+    if len(sentences) > 1:
+        return [part for sentence in sentences for part in _split_oversized(sentence, max_tokens)]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    # Text without spaces (e.g. a long URL or a bad PDF extraction) is cut by length
+    words = [word[i:i + max_chars] for word in piece.split() for i in range(0, len(word), max_chars)]
+    parts, current, length = [], [], 0
+    for word in words:
+        if current and length + len(word) + 1 > max_chars:
+            parts.append(' '.join(current))
+            current, length = [], 0
+        current.append(word)
+        length += len(word) + 1
+    if current:
+        parts.append(' '.join(current))
+    return parts
+
+
+def split_into_chunks(text, max_tokens=3000):
+    """
+    Split text at paragraph boundaries (falling back to sentences, then words)
+    into chunks of at most max_tokens estimated tokens.
+    """
+    pieces = []
+    for paragraph in PARAGRAPH_RE.split(text or ''):
+        paragraph = paragraph.strip()
+        if paragraph:
+            pieces.extend(_split_oversized(paragraph, max_tokens))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def pick_evenly(items, limit):
+    """Pick at most `limit` items spread evenly across the list."""
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def merge_qa_pairs(results, num_questions):
+    """
+    Interleave per-chunk QA pairs so the quiz covers the whole note, dropping
+    duplicate questions, and trim to num_questions.
+    """
+    merged, seen = [], set()
+    for round_ in zip_longest(*results):
+        for pair in round_:
+            if not pair:
+                continue
+            key = ' '.join(str(pair.get('question', '')).lower().split()).rstrip('?')
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(pair)
+            if len(merged) >= num_questions:
+                return merged
+    return merged
@@ -0,0 +1,85 @@
+"""
+Compress responses for clients that accept it.
+
+Used as an after_request hook. Bodies of compressible types (JSON, text) above a
+size threshold are encoded with the best encoding in the request's
+Accept-Encoding: brotli when the brotli package is installed, otherwise gzip.
+Streamed responses (SSE) are left alone so events aren't held back by a buffer.
+
+  COMPRESS_MIN_BYTES    smallest body worth compressing (default 1024)
+  COMPRESS_GZIP_LEVEL   1-9 (default 6)
+  COMPRESS_BR_QUALITY   0-11 (default 4; higher levels cost a lot of CPU per response)
+  COMPRESS_ENABLED      set to 0 when a proxy in front already compresses (default 1)
+"""
+import gzip
+import os
+
+from flask import request
+
+from db_pool import env_flag
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/javascript', 'image/svg+xml'}
+
+
+def is_compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class Compressor:
+    def __init__(self, min_bytes=1024, gzip_level=6, br_quality=4, enabled=True):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.br_quality = br_quality
+        self.enabled = enabled
+        self.encodings = (['br'] if brotli is not None else []) + ['gzip']
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            min_bytes=int(os.getenv('COMPRESS_MIN_BYTES', 1024)),
+            gzip_level=int(os.getenv('COMPRESS_GZIP_LEVEL', 6)),
+            br_quality=int(os.getenv('COMPRESS_BR_QUALITY', 4)),
+            enabled=env_flag('COMPRESS_ENABLED', '1'),
+        )
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.br_quality)
+        # mtime=0 so the same body always gives the same bytes
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def __call__(self, response):
+        """after_request hook: returns the response, compressed when worthwhile."""
+        if (not self.enabled
+                or request.method == 'HEAD'
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or not is_compressible(response.mimetype or '')):
+            return response
+
+        # Even when this body is too small or the client can't decode it, a cache must key on the header
+        response.vary.add('Accept-Encoding')
+        if (response.content_length or 0) < self.min_bytes:
+            return response
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        compressed = self.compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity ones, so a strong ETag would be wrong
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
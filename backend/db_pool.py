@@ -0,0 +1,144 @@
+"""
+Connection pool configuration and metrics.
+
+Settings come from the environment and apply per worker process, so the
+database sees up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+With gunicorn threads, DB_POOL_SIZE should be about the thread count.
+
+  DB_POOL_SIZE            connections kept open per worker (default 5)
+  DB_MAX_OVERFLOW         extra connections allowed under bursts (default 5)
+  DB_POOL_TIMEOUT         seconds to wait for a free connection (default 10)
+  DB_POOL_RECYCLE         seconds before a connection is replaced (default 1800)
+  DB_POOL_PRE_PING        test connections on checkout, 1/0 (default 1)
+  DB_STATEMENT_TIMEOUT_MS per statement limit on PostgreSQL/MySQL (default 0 = off)
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+def env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool = None
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def on_checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def on_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        pool = self.pool
+        return {
+            'pool_class': type(pool).__name__ if pool is not None else None,
+            'pool_size': pool.size() if isinstance(pool, QueuePool) else None,
+            'overflow': pool.overflow() if isinstance(pool, QueuePool) else None,
+            'checked_out': self.checked_out,
+            'max_checked_out': self.max_checked_out,
+            'checkouts': self.checkouts,
+            'connects': self.connects,
+            'invalidations': self.invalidations,
+            'timeouts': self.timeouts,
+            'wait_seconds_total': round(self.wait_seconds_total, 6),
+            'wait_seconds_max': round(self.wait_seconds_max, 6),
+            'wait_seconds_avg': round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database."""
+    options = {'pool_pre_ping': env_flag('DB_POOL_PRE_PING', '1')}
+    if not database_uri or database_uri.startswith('sqlite'):
+        # SQLite is a local file; keep SQLAlchemy's default pool for it
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    })
+
+    # Set once per connection, so it costs nothing per request but bounds every statement
+    timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if timeout_ms > 0 and database_uri.startswith('postgres'):
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return options
+
+
+def install_pool_metrics(engine):
+    pool_metrics.pool = engine.pool
+
+    @event.listens_for(engine.pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.on_connect()
+        timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+        if timeout_ms > 0 and engine.dialect.name == 'mysql':
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET SESSION max_execution_time = {timeout_ms}')
+            cursor.close()
+
+    @event.listens_for(engine.pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.on_checkout()
+
+    @event.listens_for(engine.pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        pool_metrics.on_checkin()
+
+    @event.listens_for(engine.pool, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.on_invalidate()
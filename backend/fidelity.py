@@ -0,0 +1,46 @@
+"""
+Local (non-LLM) fidelity estimate for elaborated notes.
+
+Measures how much of the elaboration is contained in the original notes using
+word and word-pair (bigram) overlap. It answers the same question as the LLM
+fidelity prompt, in the same "NN%" format, without an upstream call.
+"""
+import html
+import re
+
+TAG_RE = re.compile(r'<[^>]+>')
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)?")
+
+
+def tokenize(text):
+    text = html.unescape(TAG_RE.sub(' ', text or ''))
+    return WORD_RE.findall(text.lower())
+
+
+def ngrams(tokens, n):
+    return [tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def containment(candidate, reference):
+    """Fraction of candidate items that also appear in the reference."""
+    if not candidate:
+        return 1.0
+    reference = set(reference)
+    return sum(1 for item in candidate if item in reference) / len(candidate)
+
+
+def estimate_fidelity(original_notes, elaborated_notes):
+    """Return a 0-100 score for how much of the elaboration comes from the original."""
+    original = tokenize(original_notes)
+    elaborated = tokenize(elaborated_notes)
+    if not elaborated:
+        return 0
+
+    unigram_score = containment(elaborated, original)
+    bigram_score = containment(ngrams(elaborated, 2), ngrams(original, 2)) if len(elaborated) > 1 else unigram_score
+    # Words alone miss rephrasings that add facts; word pairs are stricter, so blend both
+    return round(100 * (0.5 * unigram_score + 0.5 * bigram_score))
+
+
+def format_fidelity(score):
+    return f"{score}%"
@@ -0,0 +1,120 @@
+"""
+gunicorn settings. Start the server with:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+gunicorn loads this file on its own when started from this directory, so it
+also applies to a plain `gunicorn app:app`. The default profile keeps the worker
+model and process count gunicorn uses without a config file; the profiles that
+serve many requests per process are opt-in.
+
+AI routes spend seconds waiting on the upstream LLM and hold no database
+connection while they wait (see release_db_connection in app.py). Sync workers
+serve one request per process, so each slow call ties up a whole process.
+GUNICORN_PROFILE picks the worker model:
+
+  sync (default)  one request per process, WEB_CONCURRENCY processes (default 1, as
+                  with gunicorn's own defaults).
+  gthread         WEB_CONCURRENCY processes x GUNICORN_THREADS threads. Every library
+                  we use is thread-safe, so this needs nothing extra. 2 x 100 threads
+                  serves 200 concurrent upstream calls with two processes. Only AI calls
+                  run without a database connection; size DB_POOL_SIZE / DB_MAX_OVERFLOW
+                  for the threads that hit the database at once before turning it on.
+  gevent          WEB_CONCURRENCY processes x GUNICORN_CONNECTIONS greenlets. Scales to
+                  thousands of waiting calls per process. Needs `pip install gevent`,
+                  and psycogreen for PostgreSQL. See the notes in post_fork.
+
+  PORT                  listen port (default 5000)
+  WEB_CONCURRENCY       worker processes (default 1 for sync, 2 otherwise)
+  GUNICORN_THREADS      threads per process for gthread (default 100)
+  GUNICORN_CONNECTIONS  concurrent requests per process for gevent (default 500)
+  GUNICORN_TIMEOUT      seconds before a silent worker is restarted (default 120)
+
+Per-process limits in the app should grow with the profile. These are defaults
+here, and explicit environment values still win:
+  DB_POOL_SIZE / DB_MAX_OVERFLOW   only the short database phases need a connection
+  QUIZ_CHUNK_WORKERS               parallel chunk calls for long notes, shared by the process
+  JOB_WORKERS                      background job threads
+  LLM_HEDGE_WORKERS                threads for hedged LLM calls, two per thread that can call
+
+Run benchmarks/bench_serving.py to compare the profiles.
+
+The app no longer creates its tables on import. Before the workers start, the master
+runs `flask --app app db-upgrade` (see migrations.py) so a deploy that only runs
+`gunicorn app:app` still gets its schema. Set DB_UPGRADE_ON_DEPLOY=0 when the deploy
+runs the upgrade as its own step.
+"""
+import os
+import subprocess
+import sys
+
+profile = os.getenv('GUNICORN_PROFILE', 'sync').lower()
+if profile not in ('sync', 'gthread', 'gevent'):
+    raise ValueError(f'GUNICORN_PROFILE must be sync, gthread or gevent, not {profile!r}')
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+# Workers import the app after gevent has patched the standard library; preloading would import it before
+preload_app = False
+
+if profile == 'sync':
+    worker_class = 'sync'
+    workers = int(os.getenv('WEB_CONCURRENCY', 1))
+    concurrency = 1
+elif profile == 'gthread':
+    worker_class = 'gthread'
+    workers = int(os.getenv('WEB_CONCURRENCY', 2))
+    threads = int(os.getenv('GUNICORN_THREADS', 100))
+    concurrency = threads
+else:
+    worker_class = 'gevent'
+    workers = int(os.getenv('WEB_CONCURRENCY', 2))
+    worker_connections = int(os.getenv('GUNICORN_CONNECTIONS', 500))
+    concurrency = worker_connections
+
+# Read by the workers when they import app.py
+os.environ.setdefault('DB_POOL_SIZE', str(min(max(5, concurrency // 10), 20)))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(min(max(5, concurrency // 10), 20)))
+os.environ.setdefault('QUIZ_CHUNK_WORKERS', str(min(max(4, concurrency // 4), 64)))
+os.environ.setdefault('JOB_WORKERS', str(min(max(4, concurrency // 10), 32)))
+# Request threads, quiz chunk and batch threads and job threads can all be waiting on an LLM call
+# at once, and a hedged call runs on two pool threads (see llm.py)
+llm_callers = concurrency + 2 * int(os.environ['QUIZ_CHUNK_WORKERS']) + int(os.environ['JOB_WORKERS'])
+os.environ.setdefault('LLM_HEDGE_WORKERS', str(2 * llm_callers))
+
+
+def post_fork(server, worker):
+    if profile != 'gevent':
+        return
+    # psycopg2 blocks the whole process on queries unless it is told to yield to gevent
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        if (os.getenv('DATABASE_URI') or '').startswith('postgres'):
+            server.log.warning('psycogreen is not installed; PostgreSQL queries will block other greenlets')
+    # The Gemini SDK talks gRPC, which needs its gevent integration turned on before first use
+    try:
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except ImportError:
+        pass
+
+
+def on_starting(server):
+    if os.getenv('DB_UPGRADE_ON_DEPLOY', '1').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return
+    # In a child process: importing the app here would load it into the master before the fork
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db-upgrade'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    if result.returncode != 0:
+        server.log.error('Database upgrade failed:\n%s', result.stderr)
+        raise SystemExit('Database upgrade failed; not starting workers')
+    server.log.info(result.stdout.strip())
+
+
+def when_ready(server):
+    server.log.info('Serving with profile %s: %s workers x %s concurrent requests', profile, workers, concurrency)
@@ -0,0 +1,172 @@
+"""
+Background jobs for slow AI work.
+
+Jobs are persisted in tbl_jobs so any worker can answer GET /jobs/<id>, and run
+on a small thread pool so the request thread returns right away with a job id.
+
+A job only runs in the process that accepted it, so one left queued or running
+by a worker that restarted or crashed would never finish. sweep() marks jobs
+that have been unfinished for longer than JOB_TIMEOUT as failed, and deletes
+finished jobs (which hold note text in payload/result) after the retention
+period. Each worker sweeps on its first job request after starting and then at
+most every JOB_SWEEP_INTERVAL seconds; `flask --app app jobs-sweep` runs one
+from cron.
+
+  JOB_WORKERS          threads running jobs in each process (default 4)
+  JOB_TIMEOUT          seconds a job may stay queued or running (default 900)
+  JOB_RETENTION_HOURS  hours finished jobs are kept (default 24)
+  JOB_SWEEP_INTERVAL   seconds between sweeps in a worker (default 60)
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED)
+UNFINISHED_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+TIMED_OUT_ERROR = 'The job did not finish in time; its worker may have restarted. Please try again.'
+
+
+class JobRunner:
+    """Runs registered job handlers on a thread pool and records their state."""
+
+    def __init__(self, db, job_model, max_workers=None):
+        self.db = db
+        self.Job = job_model
+        self.handlers = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('JOB_WORKERS', 4)),
+            thread_name_prefix='job'
+        )
+        self.timeout = float(os.getenv('JOB_TIMEOUT', 900))
+        self.retention = float(os.getenv('JOB_RETENTION_HOURS', 24)) * 3600
+        self.sweep_interval = float(os.getenv('JOB_SWEEP_INTERVAL', 60))
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def register(self, kind):
+        """Decorator that registers fn(payload) -> JSON serializable result for a job kind."""
+        def decorator(fn):
+            self.handlers[kind] = fn
+            return fn
+        return decorator
+
+    def submit(self, kind, payload, user_id=None):
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        self.maybe_sweep()
+
+        job = self.Job(
+            job_id=str(uuid.uuid4()),
+            user_id=user_id,
+            kind=kind,
+            status=JOB_QUEUED,
+            payload=json.dumps(payload),
+            date_created=datetime.now()
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+
+        # The worker thread has no app context of its own, so it gets the submitting request's app
+        self.executor.submit(self._run, current_app._get_current_object(), job.job_id)
+        return job
+
+    def _run(self, app, job_id):
+        with app.app_context():
+            job = self.db.session.get(self.Job, job_id)
+            if job is None:
+                return
+            kind, payload = job.kind, json.loads(job.payload or '{}')
+            if not self._transition(job_id, JOB_QUEUED, status=JOB_RUNNING, date_started=datetime.now()):
+                # Swept as timed out while it waited in the queue
+                return
+
+            try:
+                values = {'status': JOB_DONE, 'result': json.dumps(self.handlers[kind](payload))}
+            except Exception as e:
+                self.db.session.rollback()
+                logger.exception('Job %s (%s) failed', job_id, kind)
+                values = {'status': JOB_FAILED, 'error': str(e)}
+
+            if not self._transition(job_id, JOB_RUNNING, date_completed=datetime.now(), **values):
+                logger.warning('Job %s (%s) finished after it timed out; its outcome was dropped', job_id, kind)
+
+    def _transition(self, job_id, from_status, **values):
+        """Update the job only if it is still in from_status, so a swept job stays failed."""
+        Job = self.Job
+        changed = self.db.session.execute(
+            update(Job)
+            .where(Job.job_id == job_id, Job.status == from_status)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.session.commit()
+        return bool(changed)
+
+    def sweep(self):
+        """
+        Fail jobs queued or running for longer than the timeout and delete finished jobs
+        past the retention period. Returns (failed, deleted).
+        """
+        Job = self.Job
+        now = datetime.now()
+        failed = self.db.session.execute(
+            update(Job)
+            .where(
+                Job.status.in_(UNFINISHED_STATES),
+                func.coalesce(Job.date_started, Job.date_created) < now - timedelta(seconds=self.timeout)
+            )
+            .values(status=JOB_FAILED, error=TIMED_OUT_ERROR, date_completed=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        deleted = self.db.session.execute(
+            delete(Job)
+            .where(Job.status.in_(FINISHED_STATES), Job.date_completed < now - timedelta(seconds=self.retention))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.session.commit()
+        if failed or deleted:
+            logger.info('Job sweep: %d timed out, %d expired', failed, deleted)
+        return failed, deleted
+
+    def maybe_sweep(self):
+        """sweep() if this worker hasn't swept in the last sweep_interval seconds."""
+        now = time.monotonic()
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        try:
+            self.sweep()
+        except SQLAlchemyError as e:
+            self.db.session.rollback()
+            logger.warning('Job sweep failed: %s', e)
+
+
+def serialize_job(job):
+    return {
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'status': job.status,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'date_created': job.date_created,
+        'date_started': job.date_started,
+        'date_completed': job.date_completed
+    }
@@ -0,0 +1,99 @@
+"""
+JSON provider for jsonify / request.get_json, backed by orjson when it is installed.
+
+Output is equivalent JSON to Flask's default provider, not the same bytes: it
+decodes to the same values. Dates are still sent as HTTP dates ("Wed, 01 Jan
+2025 10:00:00 GMT"), keys are sorted and Decimal, UUID and dataclasses are
+handled the same way. The bytes differ in three ways:
+  - non-ASCII text is written as UTF-8 rather than \\uXXXX escapes
+  - some floats are spelled differently (1e20 rather than 1e+20)
+  - NaN and infinity become null (the standard library writes NaN, which isn't JSON)
+Values orjson can't encode (e.g. integers wider than 64 bits) fall back to the
+standard library.
+
+  JSON_PROVIDER   "auto" (orjson if installed), "orjson" or "std" (default auto)
+"""
+import logging
+import os
+from datetime import datetime, timezone
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """werkzeug.http.http_date for datetimes (naive ones are taken as UTC), without its per-call overhead."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f'{DAY_NAMES[value.weekday()]}, {value.day:02d} {MONTH_NAMES[value.month - 1]} {value.year:04d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        # List endpoints send a date per row, so the common case skips werkzeug
+        if isinstance(o, datetime):
+            return http_date(o)
+        return DefaultJSONProvider.default(o)
+
+    def _options(self, indent=False):
+        # Dates and dataclasses go through self.default so their format matches DefaultJSONProvider
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dump_bytes(self, obj, indent=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # Callers passing json.dumps options get exactly what they asked for
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN, huge integers and other input the standard library accepts
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Bytes straight into the response, skipping the str round trip
+        return self._app.response_class(self.dump_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """Replace app.json according to JSON_PROVIDER. Returns the provider name in use."""
+    choice = os.getenv('JSON_PROVIDER', 'auto').lower()
+    if choice not in ('auto', 'orjson', 'std'):
+        raise ValueError(f'JSON_PROVIDER must be auto, orjson or std, not {choice!r}')
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+
+    if choice == 'std' or orjson is None:
+        return 'std'
+    app.json = OrjsonProvider(app)
+    logger.debug('Using orjson for JSON responses')
+    return 'orjson'
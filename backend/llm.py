@@ -0,0 +1,527 @@
+"""
+LLM provider chain used by the quiz and elaboration routes.
+
+Every call goes through LLMRouter, which tries the configured providers in
+order (Groq, then Gemini by default). Each provider has:
+
+  - a per-request timeout
+  - retries with full-jitter exponential backoff for transient errors
+    (timeouts, connection errors, 429 and 5xx)
+  - a circuit breaker: after LLM_BREAKER_FAILURES consecutive transient
+    failures the provider is skipped for LLM_BREAKER_RESET seconds, then one
+    trial request decides whether it is healthy again
+
+With LLM_HEDGE_PERCENTILE set (e.g. 95), a request to the first provider
+that is still running after that percentile of its recent latencies gets a
+second copy sent to the next provider, and whichever answers first wins.
+
+The "stub" provider answers deterministically without any network calls, so
+the whole pipeline can be load tested offline (LLM_PROVIDERS=stub).
+
+  LLM_PROVIDERS          comma separated order (default "groq,gemini")
+  LLM_TIMEOUT            seconds per request (default 30)
+  LLM_RETRIES            retries per provider after the first try (default 2)
+  LLM_BACKOFF_BASE       first backoff in seconds, doubled per retry (default 0.5)
+  LLM_BACKOFF_MAX        longest backoff in seconds (default 8)
+  LLM_BREAKER_FAILURES   consecutive failures that open the breaker (default 5)
+  LLM_BREAKER_RESET      seconds the breaker stays open (default 30)
+  LLM_HEDGE_PERCENTILE   latency percentile that triggers a hedge, 0 = off (default 0)
+  LLM_HEDGE_MIN_SAMPLES  latencies needed before hedging starts (default 20)
+  LLM_HEDGE_WORKERS      threads for hedged calls, at least two per concurrent caller (default 64;
+                         gunicorn.conf.py sizes it from the worker's thread count)
+  LLM_STUB_LATENCY_MS    stub response time (default 50)
+  LLM_STUB_JITTER_MS     extra stub response time, up to this much (default 0)
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from chunking import estimate_tokens
+from metrics import llm_errors, llm_request_seconds, llm_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """A provider call failed. `retryable` is False for errors a retry can't fix (e.g. 400, 401)."""
+
+    def __init__(self, message, provider=None, retryable=True):
+        super().__init__(message)
+        self.provider = provider
+        self.retryable = retryable
+
+
+class LLMUnavailable(LLMError):
+    """Every provider failed or has an open circuit breaker."""
+
+
+TRANSIENT_ERRORS = (TimeoutError, ConnectionError)
+# SDK and HTTP client transport errors (groq/httpx, requests), matched by class name anywhere
+# in the exception's hierarchy so the SDKs aren't imported before their first call
+TRANSIENT_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError', 'TransportError', 'TimeoutException',
+                         'ConnectionError', 'Timeout'}
+
+
+def is_retryable(exc):
+    """
+    Timeouts, connection errors, rate limits and server errors are worth retrying.
+    Anything else (a 4xx, a blocked or empty response, a bug) fails the same way again.
+    """
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    if status is None and isinstance(getattr(exc, 'code', None), int):
+        status = exc.code  # google.api_core exceptions
+    if status is None:
+        return isinstance(exc, TRANSIENT_ERRORS) or any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+    return status in (408, 409, 429) or status >= 500
+
+
+def backoff_delay(attempt, base, maximum, rng=random):
+    """Full jitter: uniform between 0 and the capped exponential delay."""
+    return rng.uniform(0, min(maximum, base * (2 ** (attempt - 1))))
+
+
+class LazyClient:
+    """
+    Stands in for an SDK client and builds it with factory() on first use, so the SDK
+    is only imported (and the client only constructed) by workers that call it.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+# ------------------ PROVIDERS ------------------
+# complete() returns (text, (prompt_tokens, completion_tokens) or None); stream() yields text deltas.
+
+class GroqProvider:
+    name = 'groq'
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+
+    def complete(self, messages, max_tokens=None, temperature=0.0, timeout=None, json_mode=False):
+        # JSON mode guarantees a JSON object, so prompts using it must ask for one
+        extra = {'response_format': {'type': 'json_object'}} if json_mode else {}
+        response = self.client.chat.completions.create(
+            model=self.model, messages=messages, max_tokens=max_tokens,
+            temperature=temperature, timeout=timeout, **extra
+        )
+        usage = getattr(response, 'usage', None)
+        tokens = (usage.prompt_tokens, usage.completion_tokens) if usage else None
+        return response.choices[0].message.content.strip(), tokens
+
+    def stream(self, messages, max_tokens=None, temperature=0.0, timeout=None):
+        chunks = self.client.chat.completions.create(
+            model=self.model, messages=messages, max_tokens=max_tokens,
+            temperature=temperature, timeout=timeout, stream=True
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class GeminiProvider:
+    name = 'gemini'
+
+    def __init__(self, model, model_name):
+        self.client = model
+        self.model = model_name
+
+    @staticmethod
+    def _prompt(messages):
+        # generate_content takes one prompt; system and user messages are sent in order
+        return '\n\n'.join(message['content'] for message in messages)
+
+    def _options(self, max_tokens, temperature, timeout, json_mode=False):
+        config = {'temperature': temperature}
+        if max_tokens:
+            config['max_output_tokens'] = max_tokens
+        if json_mode:
+            config['response_mime_type'] = 'application/json'
+        return {'generation_config': config, 'request_options': {'timeout': timeout} if timeout else {}}
+
+    def complete(self, messages, max_tokens=None, temperature=0.0, timeout=None, json_mode=False):
+        response = self.client.generate_content(
+            self._prompt(messages), **self._options(max_tokens, temperature, timeout, json_mode)
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        tokens = (usage.prompt_token_count, usage.candidates_token_count) if usage else None
+        return response.text.strip(), tokens
+
+    def stream(self, messages, max_tokens=None, temperature=0.0, timeout=None):
+        response = self.client.generate_content(
+            self._prompt(messages), stream=True, **self._options(max_tokens, temperature, timeout)
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubProvider:
+    """
+    Offline stand-in that answers the app's three prompt shapes (quiz JSON,
+    HTML bullet elaboration, fidelity percentage) from the prompt text itself.
+    The same prompt always gives the same answer and the same latency.
+    """
+    name = 'stub'
+    model = 'stub-1'
+
+    def __init__(self, latency_ms=50, jitter_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    @classmethod
+    def from_env(cls):
+        return cls(float(os.getenv('LLM_STUB_LATENCY_MS', 50)), float(os.getenv('LLM_STUB_JITTER_MS', 0)))
+
+    def _answer(self, messages):
+        prompt = messages[-1]['content']
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        time.sleep((self.latency_ms + rng.uniform(0, self.jitter_ms)) / 1000)
+
+        if 'question-answer pairs' in prompt:
+            count = int(re.search(r'(\d+) question-answer pairs', prompt).group(1))
+            body = prompt.split('Text:', 1)[-1].split('Return ONLY', 1)[0]
+            words = sorted({w for w in re.findall(r'[A-Za-z]{5,}', body)}) or ['placeholder']
+            picks = [words[rng.randrange(len(words))] for _ in range(count)]
+            pairs = ',\n'.join(
+                f'{{"question": "Which term is described in part {i + 1} of the notes?", "answer": "{word}"}}'
+                for i, word in enumerate(picks)
+            )
+            if '"questions"' in prompt:
+                return f'{{"questions": [\n{pairs}\n]}}'
+            return f'[\n{pairs}\n]'
+        if 'percentage' in prompt.lower():
+            return f'{80 + seed % 21}%'
+        notes = prompt.split('Study Notes:', 1)[-1]
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+|\n+', notes) if s.strip()]
+        return '<ul>' + ''.join(f'<li>{s}</li>' for s in sentences) + '</ul>'
+
+    def complete(self, messages, max_tokens=None, temperature=0.0, timeout=None, json_mode=False):
+        answer = self._answer(messages)
+        prompt_tokens = sum(estimate_tokens(message['content']) for message in messages)
+        return answer, (prompt_tokens, estimate_tokens(answer))
+
+    def stream(self, messages, max_tokens=None, temperature=0.0, timeout=None):
+        for part in re.split(r'(?<=</li>)', self._answer(messages)):
+            if part:
+                yield part
+
+
+# ------------------ RESILIENCE ------------------
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a request may go out now. Half-open lets a single trial request through."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """The trial request ended without saying anything about provider health."""
+        with self._lock:
+            self._trial_running = False
+
+
+class LatencyWindow:
+    """The most recent successful latencies of one provider."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ProviderState:
+    def __init__(self, provider, breaker):
+        self.provider = provider
+        self.breaker = breaker
+        self.latency = LatencyWindow()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, failed):
+        with self._lock:
+            self.calls += 1
+            self.failures += int(failed)
+
+    def snapshot(self):
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        return {
+            'model': self.provider.model,
+            'breaker': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class LLMRouter:
+    def __init__(self, providers, timeout=30.0, retries=2, backoff_base=0.5, backoff_max=8.0,
+                 breaker_failures=5, breaker_reset=30.0, hedge_percentile=0, hedge_min_samples=20,
+                 hedge_workers=64):
+        self.states = [ProviderState(p, CircuitBreaker(breaker_failures, breaker_reset)) for p in providers]
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._counts_lock = threading.Lock()
+        self.counts = {'requests': 0, 'retries': 0, 'fallbacks': 0, 'hedges': 0, 'hedge_wins': 0, 'unavailable': 0}
+        # Runs both sides of hedged calls; the losing call finishes in the background (bounded by
+        # the timeout). Threads are only started when needed, so a generous size costs nothing idle.
+        self._hedge_executor = (
+            ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='llm-hedge') if hedge_percentile else None
+        )
+
+    @classmethod
+    def from_env(cls, providers):
+        """`providers` maps names to configured providers (None when a key is missing)."""
+        order = [name.strip() for name in os.getenv('LLM_PROVIDERS', 'groq,gemini').split(',') if name.strip()]
+        return cls(
+            [providers[name] for name in order if providers.get(name)],
+            timeout=float(os.getenv('LLM_TIMEOUT', 30)),
+            retries=int(os.getenv('LLM_RETRIES', 2)),
+            backoff_base=float(os.getenv('LLM_BACKOFF_BASE', 0.5)),
+            backoff_max=float(os.getenv('LLM_BACKOFF_MAX', 8)),
+            breaker_failures=int(os.getenv('LLM_BREAKER_FAILURES', 5)),
+            breaker_reset=float(os.getenv('LLM_BREAKER_RESET', 30)),
+            hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', 0)),
+            hedge_min_samples=int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20)),
+            hedge_workers=int(os.getenv('LLM_HEDGE_WORKERS', 64)),
+        )
+
+    @property
+    def available(self):
+        return bool(self.states)
+
+    @property
+    def model_key(self):
+        """Identifies the preferred model, for cache keys."""
+        return f'{self.states[0].provider.name}:{self.states[0].provider.model}' if self.states else None
+
+    def _count(self, name):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        return {**counts, 'providers': {s.provider.name: s.snapshot() for s in self.states}}
+
+    def _call_once(self, state, call, record_latency=True):
+        """Run call(provider) against one provider, recorded in its breaker and latency window."""
+        if not state.breaker.allow():
+            # Another request is already probing this provider; move on rather than wait
+            raise LLMError(f'{state.provider.name} circuit is open', state.provider.name, retryable=False)
+        started = time.monotonic()
+        name = state.provider.name
+        try:
+            result = call(state.provider)
+        except Exception as e:
+            state.record(failed=True)
+            retryable = is_retryable(e)
+            llm_request_seconds.observe(time.monotonic() - started, provider=name, outcome='error')
+            llm_errors.inc(provider=name, retryable=str(retryable).lower())
+            if retryable:
+                state.breaker.record_failure()
+            else:
+                state.breaker.release()
+            raise LLMError(f'{state.provider.name}: {e}', state.provider.name, retryable) from e
+        elapsed = time.monotonic() - started
+        state.record(failed=False)
+        state.breaker.record_success()
+        if record_latency:
+            state.latency.add(elapsed)
+            llm_request_seconds.observe(elapsed, provider=name, outcome='ok')
+        return result
+
+    def _complete_call(self, kwargs):
+        def call(provider):
+            text, tokens = provider.complete(timeout=self.timeout, **kwargs)
+            if tokens:
+                llm_tokens.inc(tokens[0] or 0, provider=provider.name, kind='prompt')
+                llm_tokens.inc(tokens[1] or 0, provider=provider.name, kind='completion')
+            return text
+        return call
+
+    def _stream_call(self, kwargs):
+        def call(provider):
+            deltas = provider.stream(timeout=self.timeout, **kwargs)
+            # Generators only run (and fail) once iterated, so pull the first delta here
+            return next(deltas, None), deltas
+        return call
+
+    def _call_hedged(self, state, backup, kwargs):
+        delay = state.latency.percentile(self.hedge_percentile, self.hedge_min_samples)
+        if delay is None or backup.breaker.state == CircuitBreaker.OPEN:
+            return self._call_once(state, self._complete_call(kwargs))
+
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return self._call_once(state, self._complete_call(kwargs))
+
+        primary = self._hedge_executor.submit(run_primary)
+        # The delay counts from when the primary call goes out: time spent queued for a pool
+        # thread says nothing about the provider and must not trigger a hedge
+        started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        self._count('hedges')
+        hedge = self._hedge_executor.submit(self._call_once, backup, self._complete_call(kwargs))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def complete(self, messages, max_tokens=None, temperature=0.0, json_mode=False):
+        """
+        Return the text of the first successful completion in the provider chain.
+        json_mode asks providers that support it for syntactically valid JSON.
+        """
+        kwargs = {'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature, 'json_mode': json_mode}
+        self._count('requests')
+        errors = []
+        for index, state in enumerate(self.states):
+            if index:
+                self._count('fallbacks')
+            backup = self.states[index + 1] if index + 1 < len(self.states) else None
+            for attempt in range(self.retries + 1):
+                if state.breaker.state == CircuitBreaker.OPEN:
+                    errors.append(f'{state.provider.name}: circuit open')
+                    break
+                if attempt:
+                    self._count('retries')
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                try:
+                    if self._hedge_executor and backup and index == 0 and attempt == 0:
+                        return self._call_hedged(state, backup, kwargs)
+                    return self._call_once(state, self._complete_call(kwargs))
+                except LLMError as e:
+                    errors.append(str(e))
+                    logger.warning('LLM call failed (attempt %d): %s', attempt + 1, e)
+                    if not e.retryable:
+                        break
+        self._count('unavailable')
+        raise LLMUnavailable('; '.join(errors) or 'No LLM provider configured', retryable=False)
+
+    def stream(self, messages, max_tokens=None, temperature=0.0):
+        """
+        Yield text deltas. Retries and fallback apply until the first delta arrives;
+        after that a failure is raised, since the caller has already sent partial output.
+        """
+        kwargs = {'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        self._count('requests')
+        errors = []
+        for index, state in enumerate(self.states):
+            if index:
+                self._count('fallbacks')
+            for attempt in range(self.retries + 1):
+                if state.breaker.state == CircuitBreaker.OPEN:
+                    errors.append(f'{state.provider.name}: circuit open')
+                    break
+                if attempt:
+                    self._count('retries')
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                try:
+                    # Time to first token isn't comparable with full completions, so it isn't
+                    # added to the latency window used for hedging
+                    first, deltas = self._call_once(state, self._stream_call(kwargs), record_latency=False)
+                except LLMError as e:
+                    errors.append(str(e))
+                    logger.warning('LLM stream failed (attempt %d): %s', attempt + 1, e)
+                    if not e.retryable:
+                        break
+                    continue
+                if first is not None:
+                    yield first
+                yield from deltas
+                return
+        self._count('unavailable')
+        raise LLMUnavailable('; '.join(errors) or 'No LLM provider configured', retryable=False)
@@ -0,0 +1,59 @@
+"""
+Logging setup.
+
+  LOG_LEVEL   DEBUG, INFO, WARNING... (default INFO)
+  LOG_FORMAT  "json" for one JSON object per line, or "text" (default)
+
+Records are handed to a background thread through a queue, so request
+threads never block on writing to stderr. Pass structured fields with
+logger.info('message', extra={'note_num': 3}); the JSON format includes them.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came from `extra`
+STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in STANDARD_ATTRS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+
+
+def configure_logging():
+    """Install the queue handler on the root logger (once per process)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
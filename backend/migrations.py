@@ -0,0 +1,113 @@
+"""
+Versioned schema migrations.
+
+db.create_all() only creates missing tables; it never adds indexes or columns
+to tables that already exist. Each migration here runs once per database, in
+order, and the applied versions are recorded in tbl_schema_version.
+
+To change the schema: update the model in app.py, then append a migration
+with the next version number that brings existing databases to the same
+state. Migrations must be safe to run on a database created from the current
+models (e.g. use checkfirst / check the inspector before altering).
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from search import backfill_search_index, create_search_index, reindex_note_text
+
+logger = logging.getLogger(__name__)
+
+version_metadata = MetaData()
+schema_version = Table(
+    'tbl_schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def create_indexes(conn, metadata, names):
+    """Create the named indexes declared on the models, skipping ones that exist."""
+    wanted = set(names)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in wanted:
+                index.create(conn, checkfirst=True)
+                wanted.discard(index.name)
+    if wanted:
+        raise RuntimeError(f'Indexes not declared on any model: {", ".join(sorted(wanted))}')
+
+
+def baseline(conn, metadata):
+    # Tables as they existed before versioned migrations (a no-op for existing databases)
+    metadata.create_all(conn)
+
+
+def hot_lookup_indexes(conn, metadata):
+    create_indexes(conn, metadata, [
+        'ix_tbl_titles_user_id_date_accessed',
+        'ix_tbl_titles_user_id_note_title',
+        'ix_tbl_note_title_num',
+        'ix_tbl_quiz_note_num',
+        'ix_tbl_tasks_user_id',
+    ])
+
+
+def full_text_search(conn, metadata):
+    create_search_index(conn)
+    tables = metadata.tables
+    backfill_search_index(conn, tables['tbl_titles'], tables['tbl_note'], tables['tbl_quiz'])
+
+
+def note_version_column(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('tbl_note')}
+    if 'version' not in columns:
+        conn.execute(text('ALTER TABLE tbl_note ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+def user_versions_table(conn, metadata):
+    # Users without a row are at version 0 until their first change
+    metadata.tables['tbl_user_versions'].create(conn, checkfirst=True)
+
+
+def plain_text_note_documents(conn, metadata):
+    # Note documents were indexed from the editor's HTML; markup matched queries and leaked into snippets
+    tables = metadata.tables
+    reindex_note_text(conn, tables['tbl_titles'], tables['tbl_note'])
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', baseline),
+    (2, 'indexes for hot lookup columns', hot_lookup_indexes),
+    (3, 'full-text search index', full_text_search),
+    (4, 'note version column', note_version_column),
+    (5, 'per-user data versions for conditional GETs', user_versions_table),
+    (6, 'plain text note search documents', plain_text_note_documents),
+]
+
+
+def current_version(conn):
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    versions = conn.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def upgrade_database(engine, metadata):
+    """Apply pending migrations, each in its own transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        version_metadata.create_all(conn)
+        version = current_version(conn)
+
+    applied = []
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn, metadata)
+            conn.execute(schema_version.insert().values(version=number, name=name, applied_at=datetime.now()))
+        logger.info('Applied migration %d: %s', number, name)
+        applied.append(number)
+    return applied
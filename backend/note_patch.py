@@ -0,0 +1,44 @@
+"""
+Apply text edits sent by PATCH /notes/<note_num>.
+
+An edit replaces the characters [start, end) of the base version with `text`:
+  insert -> {"start": 10, "end": 10, "text": "new words"}
+  delete -> {"start": 10, "end": 25, "text": ""}
+  replace-> {"start": 10, "end": 25, "text": "other words"}
+
+All offsets refer to the base version the client edited, and edits must not
+overlap, so the client can send its diff as-is without rebasing offsets.
+"""
+
+
+class PatchError(ValueError):
+    """The edits are malformed or don't fit the base text."""
+
+
+def apply_patch(text, ops):
+    if not isinstance(ops, list):
+        raise PatchError('ops must be a list')
+
+    edits = []
+    for op in ops:
+        if not isinstance(op, dict):
+            raise PatchError('each op must be an object')
+        start, end, new_text = op.get('start'), op.get('end', op.get('start')), op.get('text', '')
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (start, end)):
+            raise PatchError('start and end must be integers')
+        if not isinstance(new_text, str):
+            raise PatchError('text must be a string')
+        if not 0 <= start <= end <= len(text):
+            raise PatchError(f'op [{start}, {end}) is outside the note (length {len(text)})')
+        edits.append((start, end, new_text))
+
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    parts, position = [], 0
+    for start, end, new_text in edits:
+        if start < position:
+            raise PatchError('ops must not overlap')
+        parts.append(text[position:start])
+        parts.append(new_text)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination and field projection for the list endpoints.
+
+Query string options understood by fetch_page:
+  limit   - max rows to return (optional, all rows when omitted)
+  cursor  - opaque value from the previous page's X-Next-Cursor header
+  fields  - comma separated column names to return, e.g. fields=title_num,note_title
+
+The body stays a plain JSON list so existing clients keep working; the cursor
+for the next page is returned in the X-Next-Cursor header.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class ListRequestError(ValueError):
+    """Raised for a bad limit, cursor or fields parameter (returned as a 400)."""
+
+
+def encode_cursor(values):
+    values = [{'$dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        values = [datetime.fromisoformat(v['$dt']) if isinstance(v, dict) else v for v in values]
+    except (ValueError, TypeError, KeyError):
+        raise ListRequestError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ListRequestError('Invalid cursor')
+    return values
+
+
+def parse_limit(raw, max_limit=DEFAULT_MAX_LIMIT):
+    if raw is None or raw == '':
+        return None
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ListRequestError('limit must be an integer')
+    if not 1 <= limit <= max_limit:
+        raise ListRequestError(f'limit must be between 1 and {max_limit}')
+    return limit
+
+
+def parse_fields(raw, allowed):
+    if not raw:
+        return list(allowed)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ListRequestError(f'Unknown fields: {", ".join(unknown)}. Allowed: {", ".join(allowed)}')
+    return fields
+
+
+def keyset_filter(order_columns, values):
+    """
+    Rows strictly after `values` in the given order, written out as
+    (a > x) OR (a = x AND b > y) ... so it works on every backend.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_columns):
+        equal_prefix = [col == value for (col, _), value in zip(order_columns[:i], values[:i])]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+def fetch_page(query, columns, order_by, args, max_limit=DEFAULT_MAX_LIMIT):
+    """
+    Run a list query with projection and keyset pagination.
+
+    query    - query carrying the joins/filters; its selected entities are replaced
+    columns  - {name: column} of everything the endpoint may return
+    order_by - [(name, descending)] ending in a unique column (usually the primary key)
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    fields = parse_fields(args.get('fields'), columns)
+    limit = parse_limit(args.get('limit'), max_limit)
+    order_columns = [(columns[name], descending) for name, descending in order_by]
+
+    # Order-by columns are always selected so the next cursor can be built
+    selected = list(dict.fromkeys(fields + [name for name, _ in order_by]))
+    query = query.with_entities(*[columns[name].label(name) for name in selected])
+
+    cursor = args.get('cursor')
+    if cursor:
+        query = query.filter(keyset_filter(order_columns, decode_cursor(cursor, len(order_by))))
+
+    query = query.order_by(*[col.desc() if descending else col.asc() for col, descending in order_columns])
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[name] for name, _ in order_by])
+
+    items = [{name: row._mapping[name] for name in fields} for row in rows]
+    return items, next_cursor
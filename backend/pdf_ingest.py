@@ -0,0 +1,106 @@
+"""
+Server-side PDF text extraction for /notes/upload.
+
+Pages are extracted lazily (a generator) so callers can join them in one
+pass. PDFs with many pages are split into page ranges that are extracted
+in a process pool, because PyPDF2 is pure Python and CPU bound.
+
+  PDF_MAX_BYTES           largest accepted upload (default 20 MB)
+  PDF_MAX_PAGES           largest accepted page count (default 500)
+  PDF_PARALLEL_MIN_PAGES  use the process pool from this many pages (default 40)
+  PDF_WORKERS             process pool size (default min(4, CPU count))
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', 20 * 1024 * 1024))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 500))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 40))
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PdfTooLarge(ValueError):
+    """The upload is over PDF_MAX_BYTES or PDF_MAX_PAGES."""
+
+
+class InvalidPdf(ValueError):
+    """The upload isn't a readable PDF."""
+
+
+def read_limited(stream, limit=PDF_MAX_BYTES, chunk_size=64 * 1024):
+    """Read an upload stream into memory, stopping as soon as it passes the size limit."""
+    buffer = io.BytesIO()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > limit:
+            raise PdfTooLarge(f'PDF is larger than the {limit // (1024 * 1024)} MB limit')
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def _pdf_reader(data):
+    # Imported on the first upload rather than at app startup
+    from PyPDF2 import PdfReader
+    return PdfReader(io.BytesIO(data))
+
+
+def _extract_page(page, number):
+    # A document that opens can still have a page PyPDF2 can't decode
+    try:
+        return page.extract_text() or ''
+    except Exception as e:
+        raise InvalidPdf(f'Could not read page {number}: {e}')
+
+
+def _extract_range(data, start, end):
+    # Runs in a worker process, so it reopens the document from the raw bytes
+    reader = _pdf_reader(data)
+    return [_extract_page(reader.pages[i], i + 1) for i in range(start, end)]
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a threaded web worker can copy held locks into the child
+            _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def iter_pdf_pages(data, max_pages=PDF_MAX_PAGES):
+    """Yield the text of each page in order. Raises InvalidPdf for a page that can't be read."""
+    if not data.startswith(b'%PDF'):
+        raise InvalidPdf('File is not a PDF')
+    try:
+        reader = _pdf_reader(data)
+        page_count = len(reader.pages)
+    except Exception as e:
+        raise InvalidPdf(f'Could not read PDF: {e}')
+
+    if page_count > max_pages:
+        raise PdfTooLarge(f'PDF has {page_count} pages; the limit is {max_pages}')
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+        for number, page in enumerate(reader.pages, 1):
+            yield _extract_page(page, number)
+        return
+
+    step = -(-page_count // PDF_WORKERS)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    executor = _get_executor()
+    futures = [executor.submit(_extract_range, data, start, end) for start, end in ranges]
+    for future in futures:
+        yield from future.result()
+
+
+def extract_pdf_text(data, max_pages=PDF_MAX_PAGES):
+    """Join the page texts in one pass, skipping empty pages."""
+    return '\n\n'.join(text.strip() for text in iter_pdf_pages(data, max_pages) if text.strip())
@@ -0,0 +1,277 @@
+"""
+Rate limits and in-flight caps for the AI endpoints.
+
+Each request spends one token from a bucket for the user (when logged in)
+and one for the client IP. Buckets refill continuously at `rate` tokens per
+minute up to `burst`. A request turned away by either bucket spends nothing
+from the other. A user may also only have a few AI calls running at
+once; further calls are turned away instead of queuing for a worker.
+
+A request that makes several AI calls (a batch) costs one token per call. It
+needs its cost, or a full bucket when the cost is more than the burst, and
+may leave the bucket below zero, so the user then waits as long as after that
+many single requests. It also holds one in-flight slot per call, up to the
+user's whole allowance.
+
+State lives in process memory by default. Set RATE_LIMIT_DB to a SQLite file
+path to share buckets and in-flight counts between the gunicorn workers on a
+box. Errors from the shared store let requests through rather than failing them.
+
+  AI_RATE_PER_MIN        requests per minute per user (default 20)
+  AI_RATE_BURST          requests a user can make at once (default 5)
+  AI_IP_RATE_PER_MIN     requests per minute per IP (default 60)
+  AI_IP_RATE_BURST       requests an IP can make at once (default 15)
+  AI_MAX_INFLIGHT        AI calls running at once per user or anonymous IP (default 2)
+  AI_INFLIGHT_TTL        seconds before a slot left by a crashed worker is reclaimed (default 300)
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Buckets idle this long have refilled for any sane rate, so they can be dropped
+IDLE_BUCKET_SECONDS = 3600
+
+
+class Limit:
+    def __init__(self, rate_per_min, burst):
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+
+    def refill(self, tokens, elapsed):
+        return min(self.burst, tokens + elapsed * self.rate_per_min / 60)
+
+    def needed(self, cost):
+        """Tokens a request of this cost must find in the bucket; more than the burst can never be."""
+        return min(cost, self.burst)
+
+    def wait_for(self, tokens, cost=1):
+        """Seconds until a request of this cost would be allowed."""
+        return max(0.0, (self.needed(cost) - tokens) * 60 / self.rate_per_min)
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._inflight = {}
+        self.max_keys = 10000
+
+    def take(self, key, limit, cost=1):
+        """Spend tokens from the bucket. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) > self.max_keys:
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < IDLE_BUCKET_SECONDS}
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = limit.refill(tokens, now - updated)
+            if tokens >= limit.needed(cost):
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, limit.wait_for(tokens, cost)
+
+    def refund(self, key, limit, cost=1):
+        """Give back tokens spent by a request that was turned away by another bucket."""
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                self._buckets[key] = (min(limit.burst, entry[0] + cost), entry[1])
+
+    def acquire(self, key, max_inflight, ttl, count=1):
+        """Take `count` in-flight slots; returns their ids, or None when that would pass the cap."""
+        with self._lock:
+            running = self._inflight.get(key, set())
+            if len(running) + count > max_inflight:
+                return None
+            slots = [uuid.uuid4().hex for _ in range(count)]
+            self._inflight[key] = running | set(slots)
+            return slots
+
+    def release(self, key, slots):
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None:
+                running.difference_update(slots)
+                if not running:
+                    del self._inflight[key]
+
+
+class SQLiteBackend:
+    """Buckets and slots in a SQLite file shared by every worker on the box."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_buckets ('
+                ' key TEXT PRIMARY KEY,'
+                ' tokens REAL NOT NULL,'
+                ' updated REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_inflight ('
+                ' slot TEXT PRIMARY KEY,'
+                ' key TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_inflight_key ON rate_inflight (key)')
+
+    def _connect(self):
+        # Autocommit mode so BEGIN IMMEDIATE can take the write lock before reading
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self, key, limit, cost=1):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = limit.refill(row[0], now - row[1]) if row else limit.burst
+            allowed = tokens >= limit.needed(cost)
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            if random.random() < 0.01:
+                conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - IDLE_BUCKET_SECONDS,))
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return allowed, 0.0 if allowed else limit.wait_for(tokens, cost)
+
+    def refund(self, key, limit, cost=1):
+        with self._connect() as conn:
+            conn.execute('UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?', (limit.burst, cost, key))
+
+    def acquire(self, key, max_inflight, ttl, count=1):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM rate_inflight WHERE expires_at < ?', (now,))
+            running = conn.execute('SELECT COUNT(*) FROM rate_inflight WHERE key = ?', (key,)).fetchone()[0]
+            slots = None
+            if running + count <= max_inflight:
+                slots = [uuid.uuid4().hex for _ in range(count)]
+                conn.executemany('INSERT INTO rate_inflight (slot, key, expires_at) VALUES (?, ?, ?)',
+                                 [(slot, key, now + ttl) for slot in slots])
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return slots
+
+    def release(self, key, slots):
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM rate_inflight WHERE slot = ?', [(slot,) for slot in slots])
+
+
+class RateLimiter:
+    def __init__(self, backend, user_limit, ip_limit, max_inflight=2, inflight_ttl=300):
+        self.backend = backend
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.max_inflight = max_inflight
+        self.inflight_ttl = inflight_ttl
+        self._lock = threading.Lock()
+        self.counts = {'allowed': 0, 'throttled_user': 0, 'throttled_ip': 0, 'throttled_inflight': 0, 'backend_errors': 0}
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv('RATE_LIMIT_DB')
+        return cls(
+            SQLiteBackend(path) if path else MemoryBackend(),
+            Limit(float(os.getenv('AI_RATE_PER_MIN', 20)), int(os.getenv('AI_RATE_BURST', 5))),
+            Limit(float(os.getenv('AI_IP_RATE_PER_MIN', 60)), int(os.getenv('AI_IP_RATE_BURST', 15))),
+            max_inflight=int(os.getenv('AI_MAX_INFLIGHT', 2)),
+            inflight_ttl=float(os.getenv('AI_INFLIGHT_TTL', 300)),
+        )
+
+    def _count(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def _take(self, key, limit, cost):
+        try:
+            return self.backend.take(key, limit, cost)
+        except sqlite3.Error as e:
+            logger.warning('Rate limit store failed, allowing request: %s', e)
+            self._count('backend_errors')
+            return True, 0.0
+
+    def _refund(self, key, limit, cost):
+        try:
+            self.backend.refund(key, limit, cost)
+        except sqlite3.Error as e:
+            logger.warning('Could not refund rate limit tokens: %s', e)
+
+    def check(self, scope, user_id, ip, cost=1):
+        """
+        Spend `cost` tokens for the user and the IP. Returns None when allowed,
+        otherwise (reason, retry_after_seconds). A rejected request spends nothing:
+        tokens already taken from the user bucket are refunded when the IP bucket
+        turns it away.
+        """
+        buckets = [('ip', f'{scope}:ip:{ip}', self.ip_limit)]
+        if user_id is not None:
+            buckets.insert(0, ('user', f'{scope}:user:{user_id}', self.user_limit))
+        spent = []
+        for kind, key, limit in buckets:
+            allowed, retry_after = self._take(key, limit, cost)
+            if not allowed:
+                for spent_key, spent_limit in spent:
+                    self._refund(spent_key, spent_limit, cost)
+                self._count(f'throttled_{kind}')
+                return kind, math.ceil(retry_after)
+            spent.append((key, limit))
+        self._count('allowed')
+        return None
+
+    def acquire(self, owner, count=1):
+        """
+        Take `count` in-flight slots (at most the cap) for the owner ("user:1" or "ip:...").
+        Returns a list of slot ids, or None when the owner has too many calls running.
+        """
+        count = min(count, self.max_inflight)
+        try:
+            slots = self.backend.acquire(f'inflight:{owner}', self.max_inflight, self.inflight_ttl, count)
+        except sqlite3.Error as e:
+            logger.warning('Rate limit store failed, allowing request: %s', e)
+            self._count('backend_errors')
+            return []
+        if slots is None:
+            self._count('throttled_inflight')
+        return slots
+
+    def release(self, owner, slots):
+        if not slots:
+            return
+        try:
+            self.backend.release(f'inflight:{owner}', slots)
+        except sqlite3.Error as e:
+            logger.warning('Could not release in-flight slot: %s', e)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            'backend': type(self.backend).__name__,
+            'user_rate_per_min': self.user_limit.rate_per_min,
+            'ip_rate_per_min': self.ip_limit.rate_per_min,
+            'max_inflight': self.max_inflight,
+        }
@@ -0,0 +1,275 @@
+"""
+Full-text search over notes (title + body) and quizzes (title + question/answer).
+
+Every searchable item is a row in tbl_search_documents, kept up to date by the
+routes that change titles, notes and quizzes. The inverted index on top of it
+depends on the database:
+
+  PostgreSQL - generated tsvector column with a GIN index, ranked by ts_rank
+  SQLite     - FTS5 external-content table synced by triggers, ranked by bm25
+  others     - no inverted index; falls back to LIKE matching
+
+Writes only touch tbl_search_documents, so they are the same on every backend
+and happen in the caller's transaction. Note bodies are stored as editor HTML;
+they are indexed as plain text (html_to_text) so markup never matches a query.
+
+Snippets are HTML: the document text escaped, with each match wrapped in
+<mark>...</mark>. Clients can render them as HTML without rendering note markup.
+"""
+import html
+import logging
+import re
+import time
+
+from sqlalchemy import (Column, Index, Integer, MetaData, String, Table, Text, and_, delete, func,
+                        insert, inspect, literal, or_, select, text)
+
+logger = logging.getLogger(__name__)
+
+search_metadata = MetaData()
+search_documents = Table(
+    'tbl_search_documents', search_metadata,
+    Column('doc_id', Integer, primary_key=True, autoincrement=True),
+    # "note" (ref_id = title_num, title + note body) or "quiz" (ref_id = quiz_num)
+    Column('kind', String(10), nullable=False),
+    Column('ref_id', Integer, nullable=False),
+    Column('user_id', Integer, nullable=False),
+    Column('title_num', Integer, nullable=False),
+    Column('title', String(255), nullable=False, default=''),
+    Column('body', Text, nullable=False, default=''),
+    Index('ux_tbl_search_documents_kind_ref_id', 'kind', 'ref_id', unique=True),
+    Index('ix_tbl_search_documents_user_id', 'user_id'),
+    Index('ix_tbl_search_documents_title_num', 'title_num'),
+)
+
+SEARCH_KINDS = ('note', 'quiz')
+SNIPPET_START, SNIPPET_END = '<mark>', '</mark>'
+# Placeholders the database puts around matches; swapped for the tags after escaping
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+# Tags that end a line in the editor's output; every other tag is dropped without a space
+BLOCK_TAG_RE = re.compile(r'<\s*/?\s*(?:p|div|br|li|ul|ol|h[1-6]|blockquote|pre|tr|td|th)\b[^>]*>', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+SPACES_RE = re.compile(r'[ \t\r\f\v]+')
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tbl_search_fts USING fts5("
+    " title, body, content='tbl_search_documents', content_rowid='doc_id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS tbl_search_documents_ai AFTER INSERT ON tbl_search_documents BEGIN"
+    " INSERT INTO tbl_search_fts(rowid, title, body) VALUES (new.doc_id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS tbl_search_documents_ad AFTER DELETE ON tbl_search_documents BEGIN"
+    " INSERT INTO tbl_search_fts(tbl_search_fts, rowid, title, body) VALUES ('delete', old.doc_id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS tbl_search_documents_au AFTER UPDATE ON tbl_search_documents BEGIN"
+    " INSERT INTO tbl_search_fts(tbl_search_fts, rowid, title, body) VALUES ('delete', old.doc_id, old.title, old.body);"
+    " INSERT INTO tbl_search_fts(rowid, title, body) VALUES (new.doc_id, new.title, new.body); END",
+]
+
+POSTGRES_DDL = [
+    "ALTER TABLE tbl_search_documents ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS ("
+    " setweight(to_tsvector('english', coalesce(title, '')), 'A') ||"
+    " setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tbl_search_documents_tsv ON tbl_search_documents USING GIN (tsv)",
+]
+
+
+def html_to_text(markup):
+    """Plain text of a note's HTML: tags removed, entities decoded, one line per block."""
+    plain = html.unescape(TAG_RE.sub('', BLOCK_TAG_RE.sub('\n', markup or '')))
+    lines = (SPACES_RE.sub(' ', line.replace('\xa0', ' ')).strip() for line in plain.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def render_snippet(snippet):
+    """Escape a snippet's text and turn the match placeholders into <mark> tags."""
+    return html.escape(snippet or '', quote=False).replace(MATCH_START, SNIPPET_START).replace(MATCH_END, SNIPPET_END)
+
+
+def create_search_index(conn):
+    """Create the documents table and the backend's inverted index (used by a migration)."""
+    search_metadata.create_all(conn)
+    if conn.dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL:
+            conn.execute(text(statement))
+    elif conn.dialect.name == 'sqlite':
+        try:
+            for statement in SQLITE_FTS_DDL:
+                conn.execute(text(statement))
+        except Exception as e:
+            # SQLite builds without FTS5 use the LIKE fallback
+            logger.warning('FTS5 unavailable, search will use LIKE: %s', e)
+
+
+def note_documents(conn, titles, notes):
+    """Search documents for every title, with the note body as plain text."""
+    rows = conn.execute(
+        select(titles.c.title_num, titles.c.user_id, titles.c.note_title, notes.c.notes)
+        .select_from(titles.outerjoin(notes, notes.c.title_num == titles.c.title_num))
+    )
+    return [
+        {'ref_id': r.title_num, 'user_id': r.user_id, 'title_num': r.title_num,
+         'title': r.note_title, 'body': html_to_text(r.notes)}
+        for r in rows
+    ]
+
+
+def backfill_search_index(conn, titles, notes, quizzes):
+    """Index everything already in the database. Takes the model tables to avoid importing app."""
+    documents = note_documents(conn, titles, notes)
+    if documents:
+        conn.execute(insert(search_documents), [{**doc, 'kind': 'note'} for doc in documents])
+    conn.execute(insert(search_documents).from_select(
+        ['kind', 'ref_id', 'user_id', 'title_num', 'title', 'body'],
+        select(
+            literal('quiz'), quizzes.c.quiz_num, titles.c.user_id, titles.c.title_num,
+            quizzes.c.quiz_title, quizzes.c.question + literal('\n') + quizzes.c.answer
+        ).select_from(
+            quizzes.join(notes, notes.c.note_num == quizzes.c.note_num)
+            .join(titles, titles.c.title_num == notes.c.title_num)
+        )
+    ))
+
+
+def reindex_note_text(conn, titles, notes):
+    """Replace every note document with one built from the note's plain text."""
+    replace_documents(conn, 'note', note_documents(conn, titles, notes))
+
+
+def replace_documents(conn, kind, documents, ref_ids=None, title_nums=None):
+    """
+    Delete the `kind` documents matching ref_ids or title_nums, then insert
+    `documents` (dicts of ref_id, user_id, title_num, title, body).
+    """
+    conditions = [search_documents.c.kind == kind]
+    if ref_ids is not None:
+        conditions.append(search_documents.c.ref_id.in_(ref_ids))
+    if title_nums is not None:
+        conditions.append(search_documents.c.title_num.in_(title_nums))
+    conn.execute(delete(search_documents).where(*conditions))
+    if documents:
+        conn.execute(insert(search_documents), [{**doc, 'kind': kind} for doc in documents])
+
+
+def delete_documents(conn, user_id, kind=None, ref_ids=None, title_nums=None):
+    conditions = [search_documents.c.user_id == user_id]
+    if kind:
+        conditions.append(search_documents.c.kind == kind)
+    if ref_ids is not None:
+        conditions.append(search_documents.c.ref_id.in_(ref_ids))
+    if title_nums is not None:
+        conditions.append(search_documents.c.title_num.in_(title_nums))
+    conn.execute(delete(search_documents).where(*conditions))
+
+
+# A database without the index yet (migrations pending) is checked again after this long
+LIKE_RECHECK_SECONDS = 60
+
+_backends = {}
+
+
+def detect_backend(conn):
+    """
+    Which search implementation the connected database supports. An inverted index is
+    remembered per engine; "like" is re-checked every LIKE_RECHECK_SECONDS, so a worker
+    that started before the search migration picks the index up once it exists.
+    """
+    key = str(conn.engine.url)
+    cached = _backends.get(key)
+    if cached and (cached[0] != 'like' or cached[1] > time.monotonic()):
+        return cached[0]
+
+    backend = 'like'
+    if conn.dialect.name == 'postgresql':
+        if any(column['name'] == 'tsv' for column in inspect(conn).get_columns('tbl_search_documents')):
+            backend = 'postgresql'
+    elif conn.dialect.name == 'sqlite' and inspect(conn).has_table('tbl_search_fts'):
+        backend = 'fts5'
+    _backends[key] = (backend, time.monotonic() + LIKE_RECHECK_SECONDS)
+    return backend
+
+
+def like_pattern(term):
+    """A LIKE pattern matching `term` anywhere, with its wildcards escaped (ESCAPE '\\')."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def fts5_query(query):
+    """Quote each term so user input can't break FTS5 syntax; the last term matches as a prefix."""
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def like_snippet(body, terms, width=80):
+    lowered = body.lower()
+    positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+    start = max(min(positions, default=0) - width // 2, 0)
+    snippet = body[start:start + width]
+    # One pass over all terms, longest first, so a match is never marked inside another
+    pattern = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    snippet = re.sub(f'({pattern})', f'{MATCH_START}\\1{MATCH_END}', snippet, flags=re.IGNORECASE)
+    return ('…' if start else '') + render_snippet(snippet) + ('…' if start + width < len(body) else '')
+
+
+def search_documents_for_user(conn, user_id, query, kind=None, limit=20, offset=0, backend=None):
+    """Return ranked matches as dicts: kind, ref_id, title_num, title, snippet, rank."""
+    backend = backend or detect_backend(conn)
+    params = {'user_id': user_id, 'limit': limit, 'offset': offset, 'kind': kind}
+    kind_filter = 'AND d.kind = :kind' if kind else ''
+
+    if backend == 'postgresql':
+        sql = f"""
+            SELECT kind, ref_id, title_num, title, rank,
+                   ts_headline('english', body, query,
+                               'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxFragments=2, MaxWords=20, MinWords=5') AS snippet
+            FROM (
+                SELECT d.doc_id, d.kind, d.ref_id, d.title_num, d.title, d.body, query, ts_rank(d.tsv, query) AS rank
+                FROM tbl_search_documents d, websearch_to_tsquery('english', :query) AS query
+                WHERE d.user_id = :user_id AND d.tsv @@ query {kind_filter}
+                ORDER BY rank DESC, d.doc_id
+                LIMIT :limit OFFSET :offset
+            ) page
+            ORDER BY rank DESC, doc_id
+        """
+        rows = conn.execute(text(sql), {**params, 'query': query})
+    elif backend == 'fts5':
+        match = fts5_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT d.kind, d.ref_id, d.title_num, d.title,
+                   snippet(tbl_search_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', 16) AS snippet,
+                   -bm25(tbl_search_fts, 5.0, 1.0) AS rank
+            FROM tbl_search_fts
+            JOIN tbl_search_documents d ON d.doc_id = tbl_search_fts.rowid
+            WHERE tbl_search_fts MATCH :query AND d.user_id = :user_id {kind_filter}
+            ORDER BY bm25(tbl_search_fts, 5.0, 1.0), d.doc_id
+            LIMIT :limit OFFSET :offset
+        """
+        rows = conn.execute(text(sql), {**params, 'query': match})
+    else:
+        terms = [term.lower() for term in re.findall(r'\w+', query)]
+        if not terms:
+            return []
+        docs = search_documents.c
+        conditions = [docs.user_id == user_id] + [
+            or_(func.lower(docs.title).like(like_pattern(term), escape='\\'),
+                func.lower(docs.body).like(like_pattern(term), escape='\\'))
+            for term in terms
+        ]
+        if kind:
+            conditions.append(docs.kind == kind)
+        result = conn.execute(
+            select(docs.kind, docs.ref_id, docs.title_num, docs.title, docs.body)
+            .where(and_(*conditions)).order_by(docs.doc_id).limit(limit).offset(offset)
+        )
+        return [
+            {'kind': r.kind, 'ref_id': r.ref_id, 'title_num': r.title_num, 'title': r.title,
+             'snippet': like_snippet(r.body or r.title, terms), 'rank': None}
+            for r in result
+        ]
+
+    return [{**row._mapping, 'snippet': render_snippet(row.snippet)} for row in rows]
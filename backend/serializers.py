@@ -0,0 +1,15 @@
+"""
+Serialization helpers that work on row tuples from column queries, e.g.
+db.session.query(Note.note_num, Note.notes, Title.user_id), instead of ORM
+objects. Column selects avoid building ORM instances and the lazy loads
+that come with them (one extra query per row).
+"""
+
+
+def row_to_dict(row):
+    """Map a result row to {column_label: value}."""
+    return dict(row._mapping)
+
+
+def rows_to_dicts(rows):
+    return [row_to_dict(row) for row in rows]
@@ -0,0 +1,183 @@
+"""
+Single-flight: concurrent calls with the same key share one execution.
+
+The first caller for a key (the leader) runs the function; callers that
+arrive while it is running wait and get the leader's result (or exception).
+
+Within a process this uses an Event per key. Set SINGLE_FLIGHT_DB to a SQLite
+file path to also coalesce across the gunicorn workers on a box. Workers then
+claim a key in a lock table, and a worker that finds the key claimed polls
+until the leader publishes its result there. Results stay readable for a few
+seconds so a late duplicate still gets them. Shared results must be JSON
+serializable.
+
+  SINGLE_FLIGHT_DB          lock table file (default: in-process only)
+  SINGLE_FLIGHT_LOCK_TTL    seconds before a claim from a crashed worker is ignored (default 120)
+  SINGLE_FLIGHT_RESULT_TTL  seconds a finished result stays readable (default 5)
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SQLiteFlights:
+    """Lock table shared by every worker on the box."""
+
+    def __init__(self, path, lock_ttl=120, result_ttl=5):
+        self.path = path
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS flights ('
+                ' key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' result TEXT,'
+                ' expires_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def claim(self, key, owner):
+        """
+        Returns ('leader', None) when this worker should run the call,
+        ('done', result) when another worker has just finished it, or
+        ('wait', None) while another worker is running it.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM flights WHERE key = ? AND expires_at < ?', (key, now))
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO flights (key, owner, status, expires_at) VALUES (?, ?, 'running', ?)",
+                (key, owner, now + self.lock_ttl)
+            ).rowcount
+            if inserted:
+                return 'leader', None
+            row = conn.execute('SELECT status, result FROM flights WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return 'wait', None
+        if row[0] == 'done':
+            return 'done', json.loads(row[1])
+        return 'wait', None
+
+    def finish(self, key, owner, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE flights SET status = 'done', result = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                (json.dumps(result), time.time() + self.result_ttl, key, owner)
+            )
+
+    def abandon(self, key, owner):
+        # Waiting workers will claim the key and run the call themselves
+        with self._connect() as conn:
+            conn.execute('DELETE FROM flights WHERE key = ? AND owner = ?', (key, owner))
+
+
+class SingleFlight:
+    def __init__(self, name, shared=None, poll_interval=0.05):
+        self.name = name
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counts = {'leaders': 0, 'shared_local': 0, 'shared_workers': 0, 'store_errors': 0}
+
+    @classmethod
+    def from_env(cls, name):
+        path = os.getenv('SINGLE_FLIGHT_DB')
+        shared = None
+        if path:
+            shared = SQLiteFlights(
+                path,
+                lock_ttl=float(os.getenv('SINGLE_FLIGHT_LOCK_TTL', 120)),
+                result_ttl=float(os.getenv('SINGLE_FLIGHT_RESULT_TTL', 5)),
+            )
+        return cls(name, shared)
+
+    def _count(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with this key and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count('shared_local')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(f'{self.name}:{key}', fn)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run(self, key, fn):
+        if self.shared is None:
+            self._count('leaders')
+            return fn()
+
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.shared.lock_ttl
+        while True:
+            try:
+                state, result = self.shared.claim(key, owner)
+            except sqlite3.Error as e:
+                logger.warning('Single-flight store failed (%s), running call directly: %s', self.name, e)
+                self._count('store_errors')
+                self._count('leaders')
+                return fn()
+            if state == 'done':
+                self._count('shared_workers')
+                return result
+            if state == 'leader' or time.monotonic() > deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        self._count('leaders')
+        try:
+            result = fn()
+        except Exception:
+            self._release(self.shared.abandon, key, owner)
+            raise
+        self._release(self.shared.finish, key, owner, result)
+        return result
+
+    def _release(self, method, *args):
+        try:
+            method(*args)
+        except sqlite3.Error as e:
+            logger.warning('Single-flight store failed (%s): %s', self.name, e)
+            self._count('store_errors')
+
+    def stats(self):
+        with self._lock:
+            return {'name': self.name, **self.counts, 'in_flight': len(self._calls), 'shared_enabled': self.shared is not None}
@@ -0,0 +1,151 @@
+"""
+Parse quiz JSON out of model output without throwing away a paid call.
+
+Model output is read as a stream of characters. Every time an element of the
+first JSON array closes, that element is parsed on its own, so a reply that is
+truncated (max_tokens) or has one malformed item still yields the items before
+and after it. The array may be top level or inside an object, so
+{"questions": [...]} from JSON mode and a bare [...] parse the same way.
+
+Cheap local repairs are tried before an item is given up on: code fences, curly
+quotes and trailing commas. Items are then validated as {question, answer} pairs.
+"""
+import json
+import re
+
+FENCE_RE = re.compile(r'```[a-zA-Z]*')
+TRAILING_COMMA_RE = re.compile(r',\s*([\]}])')
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '‘': "'", '’': "'"})
+
+MAX_QUESTION_CHARS = 1000
+MAX_ANSWER_CHARS = 500
+
+
+def repair_json(text):
+    """Drop code fences and trailing commas, the mistakes models make most often."""
+    return TRAILING_COMMA_RE.sub(r'\1', FENCE_RE.sub('', text).strip())
+
+
+def loads_lenient(text):
+    """
+    json.loads, retried after repair_json and then with curly quotes straightened
+    (last, since it would break curly quotes inside valid strings). Raw newlines
+    inside strings are accepted. Raises ValueError if nothing parses.
+    """
+    attempts = [text, repair_json(text)]
+    attempts.append(attempts[1].translate(SMART_QUOTES))
+    for attempt in attempts[:-1]:
+        try:
+            return json.loads(attempt, strict=False)
+        except ValueError:
+            pass
+    return json.loads(attempts[-1], strict=False)
+
+
+class ArrayItemParser:
+    """
+    Incrementally pulls the elements of the first JSON array out of text fed
+    in pieces. feed() returns the raw text of each element completed so far.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0          # nesting depth counted from the first '['
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._finished = False
+
+    def feed(self, chunk):
+        items = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._depth > 1 or char not in ',]' or self._in_string:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finished = True
+                    items.extend(self._flush())
+                elif self._depth == 1 and char == '}':
+                    items.extend(self._flush())
+            elif char == ',' and self._depth == 1:
+                items.extend(self._flush())
+        return items
+
+    def _flush(self):
+        raw = ''.join(self._buffer).strip()
+        self._buffer = []
+        return [raw] if raw else []
+
+    @property
+    def finished(self):
+        return self._finished
+
+
+def iter_array_items(chunks):
+    """Yield (raw_text, parsed_or_None) for each array element in a stream of text chunks."""
+    parser = ArrayItemParser()
+    for chunk in chunks:
+        for raw in parser.feed(chunk):
+            try:
+                yield raw, loads_lenient(raw)
+            except ValueError:
+                yield raw, None
+        if parser.finished:
+            return
+
+
+def validate_qa_item(item):
+    """Return a clean {question, answer} dict, or None if the item isn't a usable pair."""
+    if not isinstance(item, dict):
+        return None
+    lowered = {str(k).strip().lower(): v for k, v in item.items()}
+    question, answer = lowered.get('question'), lowered.get('answer')
+    if isinstance(answer, (int, float)) and not isinstance(answer, bool):
+        answer = str(answer)
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer or len(question) > MAX_QUESTION_CHARS or len(answer) > MAX_ANSWER_CHARS:
+        return None
+    return {'question': question, 'answer': answer}
+
+
+def parse_qa_pairs(chunks):
+    """
+    Parse and validate QA pairs from model output (a string or an iterable of
+    text chunks). Returns (pairs, rejected) where rejected counts elements
+    that were malformed or failed validation.
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    pairs, rejected = [], 0
+    for _, item in iter_array_items(chunks):
+        pair = validate_qa_item(item)
+        if pair is None:
+            rejected += 1
+        else:
+            pairs.append(pair)
+    return pairs, rejected
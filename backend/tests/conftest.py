@@ -0,0 +1,101 @@
+"""
+Shared fixtures. Run from backend/ with `python -m pytest tests`.
+
+app.py reads its settings from the environment at import time, so the test
+settings are applied here before anything imports it: every AI call goes to
+the offline stub provider and the rate limits are high enough that only
+tests which install their own limiter see a 429.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.update({
+    'DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='thinkpal-test-'), 'import.db')}",
+    'SECRET_KEY': 'test',
+    'LLM_PROVIDERS': 'stub',
+    'LLM_STUB_LATENCY_MS': '0',
+    'LOG_LEVEL': 'WARNING',
+    'AI_RATE_PER_MIN': '100000', 'AI_RATE_BURST': '100000',
+    'AI_IP_RATE_PER_MIN': '100000', 'AI_IP_RATE_BURST': '100000',
+    'AI_MAX_INFLIGHT': '1000',
+})
+for name in ('GROQ_API_KEY', 'GEMINI_API_KEY', 'QUIZ_CACHE_DB', 'USER_CACHE_DB', 'RATE_LIMIT_DB',
+             'SINGLE_FLIGHT_DB', 'DB_UPGRADE_ON_STARTUP', 'METRICS_TOKEN', 'PROXY_COUNT', 'RENDER'):
+    os.environ.pop(name, None)
+
+from sqlalchemy import event  # noqa: E402
+
+import app as app_module  # noqa: E402
+from migrations import upgrade_database  # noqa: E402
+
+PASSWORD = 'test-password'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh, fully migrated SQLite database."""
+    flask_app = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'TESTING': True,
+        # The test client talks plain http
+        'SESSION_COOKIE_SECURE': False,
+    })
+    with flask_app.app_context():
+        upgrade_database(app_module.db.engine, app_module.db.metadata)
+    # Module level caches outlive the database; user 1 of the last test isn't user 1 of this one
+    app_module.user_cache.local.clear()
+    app_module.quiz_cache.local.clear()
+    yield flask_app
+    with flask_app.app_context():
+        app_module.db.session.remove()
+        app_module.db.engine.dispose()
+
+
+@pytest.fixture
+def make_client(app):
+    """make_client(username) -> a test client logged in as a newly registered user."""
+    def make(username='alice', role='user'):
+        client = app.test_client()
+        client.post('/login/register', json={'username': username, 'password': PASSWORD, 'role': role})
+        response = client.post('/login', json={'username': username, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return make
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client('alice')
+
+
+def create_title(client, title='Biology', notes=None):
+    """POST a title (and its note when `notes` is given); returns the title_num."""
+    title_num = client.post('/titles', json={'note_title': title}).get_json()['title_num']
+    if notes is not None:
+        response = client.post('/notes', json={'title_num': title_num, 'notes': notes})
+        assert response.status_code == 201, response.get_json()
+    return title_num
+
+
+@contextmanager
+def count_queries(app):
+    """Collect the SQL statements run on the app's engine inside the block."""
+    statements = []
+    with app.app_context():
+        engine = app_module.db.engine
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
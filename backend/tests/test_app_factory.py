@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+import app as app_module
+from tests.conftest import BACKEND_DIR
+
+SDK_MODULES = ('groq', 'google.generativeai', 'PyPDF2')
+
+
+def test_serving_a_request_does_not_load_the_sdks():
+    # A fresh interpreter, since this test session may already have imported them
+    script = (
+        'import json, sys\n'
+        'import app\n'
+        'built_on_import = app._app is not None\n'
+        'client = app.app.test_client()\n'
+        'status = client.get("/").status_code\n'
+        f'print(json.dumps([built_on_import, status, [m for m in {SDK_MODULES!r} if m in sys.modules]]))\n'
+    )
+    env = {**os.environ, 'GROQ_API_KEY': 'test', 'GEMINI_API_KEY': 'test', 'LLM_PROVIDERS': 'groq,gemini'}
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+    built_on_import, status, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert (built_on_import, status, loaded) == (False, 200, [])
+
+
+def test_each_factory_call_builds_an_independent_app(tmp_path):
+    first = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'a.db'}", 'TESTING': True})
+    second = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'b.db'}"})
+    assert first is not second
+    assert first.config['TESTING'] and not second.config.get('TESTING')
+    assert 'thinkpal' in first.blueprints and 'thinkpal' in second.blueprints
+
+
+def test_module_app_is_built_once():
+    assert app_module.app is app_module.app
+
+
+def test_logging_is_configured_by_the_factory_not_on_import():
+    script = (
+        'import json, logging\n'
+        'import app\n'
+        'on_import = [type(h).__name__ for h in logging.getLogger().handlers]\n'
+        'app.create_app()\n'
+        'print(json.dumps([on_import, [type(h).__name__ for h in logging.getLogger().handlers]]))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+    on_import, after_factory = json.loads(result.stdout.strip().splitlines()[-1])
+    assert (on_import, after_factory) == ([], ['QueueHandler'])
@@ -0,0 +1,74 @@
+import pytest
+
+import app as app_module
+from tests.conftest import count_queries, create_title
+
+
+def post_titles(client, count):
+    return client.post('/titles/batch', json={'titles': [{'note_title': f'Title {i}'} for i in range(count)]})
+
+
+def post_tasks(client, count):
+    return client.post('/task/batch', json={'tasks': [{'task_name': f'Task {i}', 'task_details': f'#{i}'}
+                                                      for i in range(count)]})
+
+
+@pytest.mark.parametrize('post', [post_titles, post_tasks])
+def test_batch_insert_costs_the_same_for_any_size(app, client, post):
+    post(client, 1)  # first write also creates the user's version row
+    with count_queries(app) as small:
+        post(client, 2)
+    with count_queries(app) as large:
+        post(client, 50)
+    assert len(large) == len(small)
+    assert len(large) <= 6
+
+
+def test_titles_batch_returns_the_new_rows(client):
+    response = post_titles(client, 3)
+    assert response.status_code == 201
+    titles = response.get_json()
+    assert [t['note_title'] for t in titles] == ['Title 0', 'Title 1', 'Title 2']
+    assert len({t['title_num'] for t in titles}) == 3
+
+    listed = {t['title_num']: t['note_title'] for t in client.get('/titles').get_json()}
+    assert listed == {t['title_num']: t['note_title'] for t in titles}
+
+
+def test_tasks_batch_returns_the_new_rows(client):
+    response = post_tasks(client, 3)
+    assert response.status_code == 201
+    tasks = response.get_json()['tasks']
+    assert [(t['task_name'], t['task_details'], t['status']) for t in tasks] == [
+        ('Task 0', '#0', 'Pending'), ('Task 1', '#1', 'Pending'), ('Task 2', '#2', 'Pending')
+    ]
+    assert {t['task_id'] for t in tasks} == {t['task_id'] for t in client.get('/task/all').get_json()}
+
+
+def test_batch_insert_without_multirow_returning(app, client, monkeypatch):
+    # MySQL can't RETURNING from a multi-row INSERT; the ORM path must not reload rows after commit
+    with app.app_context():
+        dialect = app_module.db.engine.dialect
+    monkeypatch.setattr(dialect, 'insert_executemany_returning', False)
+    monkeypatch.setattr(dialect, 'use_insertmanyvalues', False)
+
+    with count_queries(app) as statements:
+        response = post_tasks(client, 20)
+    assert [t['task_name'] for t in response.get_json()['tasks']] == [f'Task {i}' for i in range(20)]
+    assert not [s for s in statements if s.lstrip().startswith('SELECT') and 'FROM tbl_tasks' in s]
+
+
+@pytest.mark.parametrize('body', [{}, {'titles': []}, {'titles': [{'note_title': ''}]}, {'titles': ['x']}])
+def test_titles_batch_validation(client, body):
+    assert client.post('/titles/batch', json=body).status_code == 400
+
+
+def test_batch_deletes_only_touch_the_callers_rows(client, make_client):
+    mine = create_title(client, 'Mine', notes='Some notes')
+    other = make_client('mallory')
+    theirs = create_title(other, 'Theirs', notes='Other notes')
+
+    response = client.delete('/titles/batch', json={'title_nums': [mine, theirs]})
+    assert response.get_json()['deleted'] == 1
+    assert [t['title_num'] for t in other.get('/titles').get_json()] == [theirs]
+    assert client.get('/titles').get_json() == []
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+from benchmarks.bench_api import compare, percentile
+from tests.conftest import BACKEND_DIR
+
+
+def test_percentile_picks_the_nearest_rank():
+    ordered = list(range(1, 101))
+    assert (percentile(ordered, 50), percentile(ordered, 95), percentile(ordered, 100)) == (50, 95, 100)
+    assert percentile([7], 99) == 7
+
+
+def test_compare_flags_only_real_p95_regressions():
+    baseline = {'routes': {'GET /a': {'p95_ms': 10.0}, 'GET /b': {'p95_ms': 1.0}, 'GET /c': {'p95_ms': 10.0}}}
+    report = {'routes': {
+        'GET /a': {'p95_ms': 20.0},   # 100% slower
+        'GET /b': {'p95_ms': 1.5},    # 50% slower, but under the noise floor
+        'GET /c': {'p95_ms': 11.0},   # within max_regression
+        'GET /new': {'p95_ms': 99.0},  # not in the baseline
+    }}
+    assert compare(report, baseline, max_regression=0.25, noise_ms=1.0) == [
+        {'route': 'GET /a', 'baseline_p95_ms': 10.0, 'p95_ms': 20.0, 'change': 1.0}
+    ]
+
+
+def test_every_route_has_a_working_scenario(tmp_path):
+    result = subprocess.run(
+        [sys.executable, 'benchmarks/bench_api.py', '--users', '2', '--titles-per-user', '3',
+         '--quizzes-per-note', '2', '--tasks-per-user', '3', '--iterations', '1', '--warmup', '0',
+         '--concurrency', '1', '--llm-latency-ms', '0', '--output', str(tmp_path / 'report.json')],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['uncovered_routes'] == []
+    failing = {route: r['status_codes'] for route, r in report['routes'].items()
+               if r['errors'] or any(int(code) >= 400 for code in r['status_codes'])}
+    assert failing == {}
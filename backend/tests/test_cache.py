@@ -0,0 +1,88 @@
+import time
+
+import app as app_module
+from cache import MISSING, ResultCache, TTLCache, make_cache_key, normalize_text
+from tests.conftest import create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is MISSING
+    assert cache.get('c') == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl=60)
+    cache.set('a', 1, ttl=-1)
+    cache.set('b', 2)
+    assert cache.get('a') is MISSING
+    assert cache.get('b') == 2
+
+
+def test_shared_tier_is_seen_by_other_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    worker_a, worker_b = ResultCache('quiz', shared_path=path), ResultCache('quiz', shared_path=path)
+    worker_a.set('key', [{'question': 'Q', 'answer': 'A'}])
+
+    assert worker_b.get('key') == [{'question': 'Q', 'answer': 'A'}]
+    assert worker_b.get('key') == [{'question': 'Q', 'answer': 'A'}]
+    stats = worker_b.stats()
+    assert (stats['hits_shared'], stats['hits_local'], stats['misses']) == (1, 1, 0)
+
+    worker_a.delete('key')
+    worker_b.local.clear()
+    assert worker_b.get('key') is MISSING
+
+
+def test_shared_tier_failure_falls_back_to_a_miss(tmp_path):
+    cache = ResultCache('quiz', shared_path=str(tmp_path / 'cache.db'))
+    cache.shared.path = str(tmp_path / 'missing' / 'cache.db')
+    cache.set('key', 1)
+    cache.local.clear()
+    assert cache.get('key') is MISSING
+
+
+def test_cache_key_ignores_cosmetic_whitespace():
+    assert normalize_text('  a\n\nb\tc ') == 'a b c'
+    assert make_cache_key(normalize_text('a  b'), 3) == make_cache_key(normalize_text('a b'), 3)
+    assert make_cache_key('a b', 3) != make_cache_key('a b', 4)
+
+
+def test_quiz_for_unchanged_notes_reuses_the_cached_pairs(client):
+    first = create_title(client, 'One', notes=NOTES)
+    second = create_title(client, 'Two', notes=NOTES.replace(' ', '  '))
+    requests_before = app_module.llm_router.stats()['requests']
+
+    quiz_a = client.post('/generate_quiz', json={'title_num': first, 'quiz_title': 'A', 'num_questions': 2}).get_json()
+    quiz_b = client.post('/generate_quiz', json={'title_num': second, 'quiz_title': 'B', 'num_questions': 2}).get_json()
+    assert quiz_a['quiz'] == quiz_b['quiz']
+    assert app_module.llm_router.stats()['requests'] - requests_before == 1
+
+    client.post('/generate_quiz', json={'title_num': first, 'quiz_title': 'C', 'num_questions': 3})
+    assert app_module.llm_router.stats()['requests'] - requests_before == 2
+
+
+def test_failed_generations_are_not_cached(client, monkeypatch):
+    title_num = create_title(client, notes=NOTES)
+    results = [[], [{'question': 'Q?', 'answer': 'A'}]]
+    monkeypatch.setattr(app_module, 'generate_questions_and_answers_with_groq', lambda text, n: results.pop(0))
+
+    assert client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Q'}).get_json()['quiz'] == []
+    assert client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Q'}).get_json()['quiz'] == [
+        {'question': 'Q?', 'answer': 'A'}
+    ]
+
+
+def test_cached_entries_expire(monkeypatch):
+    cache = TTLCache(ttl=10)
+    cache.set('a', 1)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert cache.get('a') is MISSING
@@ -0,0 +1,61 @@
+import app as app_module
+from chunking import estimate_tokens, merge_qa_pairs, pick_evenly, split_into_chunks
+from tests.conftest import create_title
+
+
+def paragraph(n, sentences=20):
+    return ' '.join(f'Paragraph {n} sentence {i} is about topic {n}.' for i in range(sentences))
+
+
+def test_short_text_is_one_chunk():
+    assert split_into_chunks('One paragraph.\n\nAnother one.', max_tokens=100) == ['One paragraph.\n\nAnother one.']
+    assert split_into_chunks('   ', max_tokens=100) == []
+
+
+def test_chunks_break_at_paragraphs_and_fit_the_budget():
+    text = '\n\n'.join(paragraph(n) for n in range(6))
+    chunks = split_into_chunks(text, max_tokens=300)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+    assert '\n\n'.join(chunks).split() == text.split()
+
+
+def test_oversized_paragraph_falls_back_to_sentences_and_words():
+    chunks = split_into_chunks(paragraph(0, sentences=200), max_tokens=100)
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+    unbroken = 'x' * 2000
+    chunks = split_into_chunks(unbroken, max_tokens=100)
+    assert ''.join(chunks) == unbroken
+    assert all(len(chunk) <= 400 for chunk in chunks)
+
+
+def test_pick_evenly_spreads_across_the_note():
+    assert pick_evenly(list(range(10)), 5) == [0, 2, 4, 6, 8]
+    assert pick_evenly([1, 2], 5) == [1, 2]
+
+
+def test_merge_interleaves_chunks_and_drops_duplicates():
+    first = [{'question': 'What is A?', 'answer': 'a'}, {'question': 'What is B?', 'answer': 'b'}]
+    second = [{'question': 'what is  a', 'answer': 'a'}, {'question': 'What is C?', 'answer': 'c'}]
+    merged = merge_qa_pairs([first, second], 10)
+    assert [pair['answer'] for pair in merged] == ['a', 'b', 'c']
+    assert len(merge_qa_pairs([first, second], 2)) == 2
+
+
+def test_long_note_is_quizzed_chunk_by_chunk(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'QUIZ_CHUNK_TOKENS', 300)
+    monkeypatch.setattr(app_module, 'QUIZ_MAX_CHUNKS', 3)
+    prompts = []
+    original = app_module.generate_chunk_questions_with_groq
+
+    def record(text, num_questions):
+        prompts.append(text)
+        return original(text, num_questions)
+    monkeypatch.setattr(app_module, 'generate_chunk_questions_with_groq', record)
+
+    title_num = create_title(client, notes='\n\n'.join(paragraph(n) for n in range(8)))
+    response = client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Long', 'num_questions': 5})
+    assert response.status_code == 200
+    assert len(prompts) == 3
+    assert len(response.get_json()['quiz']) <= 5
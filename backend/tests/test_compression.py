@@ -0,0 +1,68 @@
+import gzip
+import json
+
+import pytest
+
+import app as app_module
+from compression import Compressor
+from tests.conftest import create_title
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    # Test the same encoding whether or not the optional brotli package is installed
+    monkeypatch.setattr(app_module.compressor, 'encodings', ['gzip'])
+
+
+def make_titles(client, count=30):
+    for i in range(count):
+        create_title(client, f'A reasonably long title for compression {i}')
+
+
+def test_large_json_is_gzipped_for_clients_that_accept_it(client, gzip_only):
+    make_titles(client)
+    plain = client.get('/titles')
+    compressed = client.get('/titles', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert int(compressed.headers['Content-Length']) < len(plain.get_data())
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+
+
+def test_small_bodies_are_sent_as_is(client, gzip_only):
+    create_title(client)
+    response = client.get('/titles', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_not_modified_and_streamed_responses_are_left_alone(client, gzip_only):
+    make_titles(client)
+    first = client.get('/titles', headers={'Accept-Encoding': 'gzip'})
+    again = client.get('/titles', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert 'Content-Encoding' not in again.headers
+
+    stream = client.post('/groq/elaborate_note/stream', json={'note_content': 'x ' * 2000, 'fidelity_mode': 'local'},
+                         headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in stream.headers
+
+
+def test_compressed_strong_etags_become_weak(app):
+    compressor = Compressor(min_bytes=10)
+    compressor.encodings = ['gzip']
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = app.response_class('{"a": "' + 'x' * 500 + '"}', mimetype='application/json')
+        response.set_etag('abc')
+        response = compressor(response)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.get_etag() == ('abc', True)
+
+
+def test_disabled_compressor_does_nothing(app):
+    compressor = Compressor(min_bytes=10, enabled=False)
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = compressor(app.response_class('x' * 500, mimetype='text/plain'))
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,62 @@
+import pytest
+
+from tests.conftest import count_queries, create_title
+
+
+def revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_unchanged_list_is_a_304_without_running_the_view(app, client):
+    create_title(client)
+    first = client.get('/titles')
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert 'Cookie' in first.headers['Vary']
+    assert {'private', 'no-cache'} <= set(first.headers['Cache-Control'].replace(' ', '').split(','))
+
+    with count_queries(app) as statements:
+        again = revalidate(client, '/titles', first)
+    assert again.status_code == 304
+    assert again.get_data() == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert not [s for s in statements if 'tbl_titles' in s]
+
+
+@pytest.mark.parametrize('change', [
+    lambda client, title_num: client.put(f'/titles/{title_num}', json={'note_title': 'Renamed'}),
+    lambda client, title_num: client.post('/notes', json={'title_num': title_num, 'notes': 'New note'}),
+    lambda client, title_num: client.post('/task/add', json={'task_name': 'Read chapter 3'}),
+    lambda client, title_num: client.delete(f'/titles/{title_num}'),
+])
+def test_writes_invalidate_every_listing(client, change):
+    title_num = create_title(client)
+    cached = {path: client.get(path) for path in ('/titles', '/notes', '/quizzes', '/task/all')}
+
+    assert change(client, title_num).status_code in (200, 201)
+    for path, response in cached.items():
+        assert revalidate(client, path, response).status_code == 200, path
+
+
+def test_etag_differs_per_url_and_per_user(client, make_client):
+    create_title(client)
+    titles, sorted_titles = client.get('/titles'), client.get('/titles/sorted')
+    assert titles.headers['ETag'] != sorted_titles.headers['ETag']
+    assert revalidate(client, '/titles?fields=note_title', titles).status_code == 200
+
+    other = make_client('bob')
+    assert revalidate(other, '/titles', titles).status_code == 200
+
+
+def test_if_modified_since(client):
+    create_title(client)
+    first = client.get('/titles')
+    since = first.headers['Last-Modified']
+    assert client.get('/titles', headers={'If-Modified-Since': since}).status_code == 304
+    assert client.get('/titles', headers={'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'}).status_code == 200
+
+
+def test_errors_are_not_given_an_etag(client):
+    response = client.get('/titles/999')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,51 @@
+from tests.conftest import count_queries, create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+def seed(client, titles=3, prefix='Title'):
+    title_nums = [create_title(client, f'{prefix} {i}', notes=NOTES) for i in range(titles)]
+    client.post('/generate_quiz', json={'title_num': title_nums[0], 'quiz_title': 'Q', 'num_questions': 2})
+    client.post('/generate_quiz', json={'title_num': title_nums[1], 'quiz_title': 'Q', 'num_questions': 3})
+    client.post('/task/batch', json={'tasks': [
+        {'task_name': 'Read'}, {'task_name': 'Review'}, {'task_name': 'Revise', 'status': 'Completed'},
+    ]})
+    return title_nums
+
+
+def test_summary_counts(client, make_client):
+    title_nums = seed(client)
+    seed(make_client('bob'))
+
+    summary = client.get('/dashboard/summary').get_json()
+    assert summary['user']['username'] == 'alice'
+    assert summary['title_count'] == 3
+    assert summary['tasks'] == {'total': 3, 'by_status': {'Pending': 2, 'Completed': 1}}
+    assert summary['quizzes']['total'] == 5
+    assert [(row['title_num'], row['quiz_count']) for row in summary['quizzes']['by_note']] == [
+        (title_nums[0], 2), (title_nums[1], 3)
+    ]
+
+
+def test_recent_titles_are_limited(client):
+    seed(client, titles=4)
+    summary = client.get('/dashboard/summary?limit=2').get_json()
+    assert len(summary['recent_titles']) == 2
+    assert client.get('/dashboard/summary?limit=51').status_code == 400
+
+
+def test_summary_query_count_does_not_grow_with_the_data(app, client):
+    seed(client, titles=2)
+    with count_queries(app) as few:
+        client.get('/dashboard/summary')
+    seed(client, titles=6, prefix='More')
+    with count_queries(app) as many:
+        client.get('/dashboard/summary')
+    assert len(many) == len(few)
+
+
+def test_empty_account(client):
+    summary = client.get('/dashboard/summary').get_json()
+    assert (summary['title_count'], summary['recent_titles']) == (0, [])
+    assert summary['tasks'] == {'total': 0, 'by_status': {}}
+    assert summary['quizzes'] == {'total': 0, 'by_note': []}
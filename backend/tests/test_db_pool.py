@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import app as app_module
+from db_pool import TimedQueuePool, engine_options, pool_metrics
+
+POSTGRES_URI = 'postgresql://user:pass@db/thinkpal'
+
+
+def test_sqlite_keeps_the_default_pool():
+    assert engine_options('sqlite:///thinkpal.db') == {'pool_pre_ping': True}
+
+
+def test_server_databases_get_a_sized_pool(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '12')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '3')
+    monkeypatch.setenv('DB_POOL_PRE_PING', '0')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '5000')
+    options = engine_options(POSTGRES_URI)
+    assert options['poolclass'] is TimedQueuePool
+    assert (options['pool_size'], options['max_overflow'], options['pool_pre_ping']) == (12, 3, False)
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+
+
+def test_statement_timeout_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('DB_STATEMENT_TIMEOUT_MS', raising=False)
+    assert 'connect_args' not in engine_options(POSTGRES_URI)
+
+
+def test_exhausted_pool_counts_the_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool_metrics, 'timeouts', 0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert pool_metrics.timeouts == 1
+    engine.dispose()
+
+
+def test_app_startup_does_not_touch_the_schema(tmp_path):
+    flask_app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'untouched.db'}", 'TESTING': True})
+    with flask_app.app_context():
+        assert inspect(app_module.db.engine).get_table_names() == []
+
+
+def test_pool_stats_are_admin_only(make_client):
+    assert make_client('alice').get('/admin/db-pool').status_code == 403
+    stats = make_client('root', role='admin').get('/admin/db-pool').get_json()
+    assert stats['checkouts'] >= 1
@@ -0,0 +1,83 @@
+import json
+
+import app as app_module
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+def read_events(response):
+    """Parse an SSE body into a list of (event, data) tuples."""
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_stream_sends_tokens_then_fidelity_then_done(client):
+    response = client.post('/groq/elaborate_note/stream', json={'note_content': NOTES, 'fidelity_mode': 'local'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    events = read_events(response)
+    names = [name for name, _ in events]
+    assert names[-2:] == ['fidelity', 'done']
+    assert set(names[:-2]) == {'token'}
+
+    streamed = ''.join(data['token'] for _, data in events[:-2]).strip()
+    assert streamed == app_module.elaborate_note_content(NOTES, 'local')['expanded_notes']
+    assert events[-2][1]['fidelity_score'].endswith('%')
+
+
+def test_stream_reports_upstream_failure_as_an_event(client, monkeypatch):
+    def broken_stream(*args, **kwargs):
+        yield '<ul>'
+        raise RuntimeError('connection reset')
+    monkeypatch.setattr(app_module.llm_router, 'stream', broken_stream)
+
+    events = read_events(client.post('/groq/elaborate_note/stream', json={'note_content': NOTES}))
+    assert events[0] == ('token', {'token': '<ul>'})
+    assert events[-1][0] == 'error'
+    assert 'connection reset' in events[-1][1]['error']
+
+
+def test_stream_requires_note_content(client):
+    response = client.post('/groq/elaborate_note/stream', json={})
+    assert response.status_code == 400
+
+
+def test_local_fidelity_scores_overlap_with_the_original():
+    from fidelity import estimate_fidelity
+    assert estimate_fidelity(NOTES, f'<ul><li>{NOTES}</li></ul>') == 100
+    assert estimate_fidelity(NOTES, 'Mitochondria are the powerhouse of the cell.') < 30
+    assert estimate_fidelity(NOTES, '') == 0
+
+
+def test_local_fidelity_mode_makes_one_upstream_call(client):
+    requests_before = app_module.llm_router.stats()['requests']
+    response = client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'local'})
+    assert response.status_code == 200
+    assert response.get_json()['fidelity_score'].endswith('%')
+    assert app_module.llm_router.stats()['requests'] - requests_before == 1
+
+
+def test_async_fidelity_mode_returns_a_job_for_the_score(client):
+    from tests.test_jobs import wait_for_job
+    response = client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'async'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['fidelity_score'] is None
+
+    job = wait_for_job(client, body['fidelity_job_id'])
+    assert job['result']['fidelity_score'].endswith('%')
+
+
+def test_async_fidelity_mode_needs_a_login(app):
+    response = app.test_client().post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'async'})
+    assert response.status_code == 401
+
+
+def test_unknown_fidelity_mode_is_rejected(client):
+    response = client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'exact'})
+    assert response.status_code == 400
@@ -0,0 +1,116 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from jobs import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, TIMED_OUT_ERROR, JobRunner
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+@pytest.fixture(autouse=True)
+def sweep_now(monkeypatch):
+    # Every test starts as a freshly started worker would, with its first sweep due
+    monkeypatch.setattr(app_module.job_runner, '_next_sweep', 0.0)
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in (JOB_DONE, JOB_FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def add_job(app, client, **values):
+    user_id = client.get('/current-user').get_json()['user_id']
+    with app.app_context():
+        job = app_module.Job(job_id=str(uuid.uuid4()), user_id=user_id, kind='elaborate_note', payload='{}', **values)
+        app_module.db.session.add(job)
+        app_module.db.session.commit()
+        return job.job_id
+
+
+def test_elaboration_job_runs_to_completion(client):
+    response = client.post('/jobs/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'local'})
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.get_json()['job_id'])
+    assert job['status'] == JOB_DONE
+    assert '<li>' in job['result']['expanded_notes']
+
+
+def test_jobs_are_private(client, make_client):
+    job_id = client.post('/jobs/elaborate_note', json={'note_content': NOTES}).get_json()['job_id']
+    assert make_client('mallory').get(f'/jobs/{job_id}').status_code == 404
+
+
+def test_job_left_running_by_a_dead_worker_is_failed(app, client):
+    long_ago = datetime.now() - timedelta(seconds=app_module.job_runner.timeout + 60)
+    running = add_job(app, client, status=JOB_RUNNING, date_created=long_ago, date_started=long_ago)
+    queued = add_job(app, client, status=JOB_QUEUED, date_created=long_ago)
+    recent = add_job(app, client, status=JOB_RUNNING, date_created=datetime.now(), date_started=datetime.now())
+
+    job = client.get(f'/jobs/{running}').get_json()
+    assert job['status'] == JOB_FAILED
+    assert job['error'] == TIMED_OUT_ERROR
+    assert client.get(f'/jobs/{queued}').get_json()['status'] == JOB_FAILED
+    assert client.get(f'/jobs/{recent}').get_json()['status'] == JOB_RUNNING
+
+
+def test_stream_of_a_stuck_job_ends(app, client):
+    long_ago = datetime.now() - timedelta(seconds=app_module.job_runner.timeout + 60)
+    job_id = add_job(app, client, status=JOB_RUNNING, date_created=long_ago, date_started=long_ago)
+
+    body = client.get(f'/jobs/{job_id}/stream').get_data(as_text=True)
+    assert '"status": "failed"' in body
+    assert body.rstrip().endswith('data: {}')
+
+
+def test_finished_jobs_are_deleted_after_retention(app, client):
+    expired = datetime.now() - timedelta(seconds=app_module.job_runner.retention + 60)
+    old = add_job(app, client, status=JOB_DONE, date_created=expired, date_completed=expired)
+    fresh = add_job(app, client, status=JOB_DONE, date_created=datetime.now(), date_completed=datetime.now())
+
+    assert client.get(f'/jobs/{old}').status_code == 404
+    assert client.get(f'/jobs/{fresh}').status_code == 200
+
+
+def test_sweeps_are_throttled(app, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.job_runner, 'sweep', lambda: calls.append(1))
+    job_id = add_job(app, client, status=JOB_QUEUED, date_created=datetime.now())
+    for _ in range(3):
+        client.get(f'/jobs/{job_id}')
+    assert len(calls) == 1
+
+
+def test_job_timed_out_while_running_stays_failed(app, client):
+    runner = JobRunner(app_module.db, app_module.Job, max_workers=1)
+
+    @runner.register('elaborate_note')
+    def outlive_the_timeout(payload):
+        runner.timeout = -1
+        runner.sweep()
+        return {'late': True}
+
+    job_id = add_job(app, client, status=JOB_QUEUED, date_created=datetime.now())
+    runner._run(app, job_id)
+
+    job = client.get(f'/jobs/{job_id}').get_json()
+    assert job['status'] == JOB_FAILED
+    assert job['result'] is None
+
+
+def test_swept_queued_job_is_not_started(app, client):
+    runner = JobRunner(app_module.db, app_module.Job, max_workers=1)
+    calls = []
+    runner.register('elaborate_note')(calls.append)
+
+    job_id = add_job(app, client, status=JOB_FAILED, date_created=datetime.now(), error=TIMED_OUT_ERROR)
+    runner._run(app, job_id)
+    assert calls == []
@@ -0,0 +1,100 @@
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date as werkzeug_http_date
+
+import json_provider
+from json_provider import OrjsonProvider, http_date, install_json_provider
+
+pytest.importorskip('orjson')
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    label: str
+
+
+PAYLOAD = {
+    'text': 'Photosynthèse — 光合作用 ✓',
+    'floats': [1e20, 1.5e-7, 0.1, -2.5e300, 123456789.125],
+    'when': datetime(2025, 1, 1, 10, 0, 0),
+    'aware': datetime(2025, 6, 30, 23, 59, 59, tzinfo=timezone(timedelta(hours=8))),
+    'day': date(2024, 2, 29),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'price': Decimal('19.99'),
+    'point': Point(3, 'ç'),
+    'huge': 2 ** 70,
+    'z': None, 'a': [True, False, {'b': 1, 'a': 2}],
+}
+
+
+@pytest.fixture
+def providers():
+    app = Flask(__name__)
+    return DefaultJSONProvider(app), OrjsonProvider(app)
+
+
+def test_output_decodes_to_the_same_values(providers):
+    default, fast = providers
+    assert json.loads(fast.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+
+
+def test_output_is_equivalent_not_identical(providers):
+    default, fast = providers
+    value = {'text': 'é', 'big': 1e20}
+    assert default.dumps(value) != fast.dumps(value)
+    assert fast.dumps(value) == '{"big":1e20,"text":"é"}'
+
+
+def test_keys_are_sorted(providers):
+    _, fast = providers
+    assert fast.dumps({'b': 1, 'a': {'d': 1, 'c': 2}}) == '{"a":{"c":2,"d":1},"b":1}'
+
+
+def test_jsonify_response_matches_the_default_provider():
+    app = Flask(__name__)
+    with app.app_context():
+        expected = json.loads(app.json.response(PAYLOAD).get_data())
+    assert install_json_provider(app) == 'orjson'
+    with app.app_context():
+        response = app.json.response(PAYLOAD)
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == expected
+
+
+def test_loads_accepts_what_the_standard_library_does(providers):
+    _, fast = providers
+    assert fast.loads('{"a": [1, 2]}') == {'a': [1, 2]}
+    assert str(fast.loads('[NaN]')[0]) == 'nan'
+    assert fast.loads(b'"\\u00e9"') == 'é'
+
+
+@pytest.mark.parametrize('value', [
+    datetime(2025, 1, 1), datetime(1999, 12, 31, 23, 59, 59), datetime(2024, 2, 29, 12, 30, 5),
+    datetime(2025, 3, 9, 1, 2, 3, tzinfo=timezone(timedelta(hours=-5))),
+])
+def test_http_date_matches_werkzeug(value):
+    assert http_date(value) == werkzeug_http_date(value)
+
+
+def test_provider_choice(monkeypatch):
+    monkeypatch.setenv('JSON_PROVIDER', 'std')
+    app = Flask(__name__)
+    assert install_json_provider(app) == 'std'
+    assert type(app.json) is DefaultJSONProvider
+
+    monkeypatch.setenv('JSON_PROVIDER', 'simdjson')
+    with pytest.raises(ValueError):
+        install_json_provider(Flask(__name__))
+
+    monkeypatch.setenv('JSON_PROVIDER', 'orjson')
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    with pytest.raises(RuntimeError):
+        install_json_provider(Flask(__name__))
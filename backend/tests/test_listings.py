@@ -0,0 +1,43 @@
+from tests.conftest import count_queries, create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+def add_notes_with_quizzes(client, count):
+    for i in range(count):
+        title_num = create_title(client, f'Title {i}', notes=NOTES)
+        client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': f'Quiz {i}', 'num_questions': 2})
+
+
+def queries_for(app, client, path):
+    with count_queries(app) as statements:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+def test_listings_run_a_fixed_number_of_queries(app, client):
+    add_notes_with_quizzes(client, 1)
+    few_notes, notes = queries_for(app, client, '/notes')
+    few_quizzes, quizzes = queries_for(app, client, '/quizzes')
+    assert len(notes) == 1 and len(quizzes) == 2
+
+    add_notes_with_quizzes(client, 5)
+    many_notes, notes = queries_for(app, client, '/notes')
+    many_quizzes, quizzes = queries_for(app, client, '/quizzes')
+    assert len(notes) == 6 and len(quizzes) == 12
+    assert (many_notes, many_quizzes) == (few_notes, few_quizzes)
+
+
+def test_listings_carry_the_joined_owner(client):
+    add_notes_with_quizzes(client, 1)
+    user_id = client.get('/current-user').get_json()['user_id']
+    assert {note['user_id'] for note in client.get('/notes').get_json()} == {user_id}
+    assert {quiz['user_id'] for quiz in client.get('/quizzes').get_json()} == {user_id}
+
+
+def test_listings_only_show_the_callers_rows(client, make_client):
+    add_notes_with_quizzes(client, 2)
+    other = make_client('bob')
+    assert other.get('/notes').get_json() == []
+    assert other.get('/quizzes').get_json() == []
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+
+from llm import CircuitBreaker, LLMRouter, LLMUnavailable, LazyClient, StubProvider, is_retryable
+
+MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+class FakeProvider:
+    def __init__(self, name, latency=0.0, errors=()):
+        self.name = name
+        self.model = f'{name}-model'
+        self.latency = latency
+        self.errors = list(errors)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages, max_tokens=None, temperature=0.0, timeout=None, json_mode=False):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        time.sleep(self.latency)
+        if error:
+            raise error
+        return f'{self.name} answer', (10, 2)
+
+    def stream(self, messages, max_tokens=None, temperature=0.0, timeout=None):
+        text, _ = self.complete(messages)
+        yield from text.split(' ')
+
+
+def router(*providers, **options):
+    return LLMRouter(list(providers), backoff_base=0.001, backoff_max=0.001, **options)
+
+
+def test_transient_errors_are_retried():
+    groq = FakeProvider('groq', errors=[ApiError(503), TimeoutError()])
+    llm = router(groq)
+    assert llm.complete(MESSAGES) == 'groq answer'
+    assert groq.calls == 3
+    assert llm.stats()['retries'] == 2
+
+
+def test_permanent_error_falls_back_without_retrying():
+    groq, gemini = FakeProvider('groq', errors=[ApiError(401)]), FakeProvider('gemini')
+    llm = router(groq, gemini)
+    assert llm.complete(MESSAGES) == 'gemini answer'
+    assert groq.calls == 1
+    assert llm.stats()['fallbacks'] == 1
+
+
+def test_unavailable_when_every_provider_fails():
+    llm = router(FakeProvider('groq', errors=[ApiError(500)] * 3), FakeProvider('gemini', errors=[ApiError(400)]))
+    with pytest.raises(LLMUnavailable):
+        llm.complete(MESSAGES)
+
+
+def test_unexpected_error_fails_fast_without_tripping_the_breaker():
+    groq, gemini = FakeProvider('groq', errors=[KeyError('choices')] * 3), FakeProvider('gemini')
+    llm = router(groq, gemini, breaker_failures=2, breaker_reset=60)
+    for _ in range(3):
+        assert llm.complete(MESSAGES) == 'gemini answer'
+    assert groq.calls == 3
+    assert llm.stats()['retries'] == 0
+    assert llm.stats()['providers']['groq']['breaker'] == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_skips_the_provider():
+    groq, gemini = FakeProvider('groq', errors=[ApiError(500)] * 10), FakeProvider('gemini')
+    llm = router(groq, gemini, retries=0, breaker_failures=2, breaker_reset=60)
+    llm.complete(MESSAGES)
+    llm.complete(MESSAGES)
+    assert llm.stats()['providers']['groq']['breaker'] == CircuitBreaker.OPEN
+
+    assert llm.complete(MESSAGES) == 'gemini answer'
+    assert groq.calls == 2
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_retries_until_the_first_delta():
+    groq = FakeProvider('groq', errors=[ApiError(502)])
+    llm = router(groq)
+    assert list(llm.stream(MESSAGES)) == ['groq', 'answer']
+    assert groq.calls == 2
+
+
+def test_slow_primary_is_hedged():
+    groq, gemini = FakeProvider('groq', latency=0.5), FakeProvider('gemini')
+    llm = router(groq, gemini, hedge_percentile=50, hedge_min_samples=1)
+    llm.states[0].latency.add(0.02)
+
+    started = time.monotonic()
+    assert llm.complete(MESSAGES) == 'gemini answer'
+    assert time.monotonic() - started < 0.4
+    assert llm.stats()['hedges'] == 1
+    assert llm.stats()['hedge_wins'] == 1
+
+
+def test_waiting_for_a_hedge_thread_does_not_trigger_hedges():
+    # Two pool threads for eight callers: most primaries queue for longer than the hedge delay
+    groq, gemini = FakeProvider('groq', latency=0.05), FakeProvider('gemini')
+    llm = router(groq, gemini, hedge_percentile=50, hedge_min_samples=1, hedge_workers=2)
+    llm.states[0].latency.add(0.15)
+
+    callers = [threading.Thread(target=llm.complete, args=(MESSAGES,)) for _ in range(8)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert llm.stats()['hedges'] == 0
+    assert gemini.calls == 0
+
+
+def test_hedge_pool_size_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv('LLM_HEDGE_PERCENTILE', '95')
+    monkeypatch.setenv('LLM_HEDGE_WORKERS', '123')
+    llm = LLMRouter.from_env({'groq': FakeProvider('groq'), 'gemini': None})
+    assert llm._hedge_executor._max_workers == 123
+
+
+class APIConnectionError(Exception):
+    """Named like the groq SDK's transport error"""
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (ApiError(429), True), (ApiError(503), True), (ApiError(408), True),
+    (ApiError(400), False), (ApiError(401), False), (ConnectionError(), True), (TimeoutError(), True),
+    (APITimeoutError(), True),
+    (ValueError('response was blocked'), False), (AttributeError('choices'), False), (KeyError('text'), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_lazy_client_builds_once_on_first_use():
+    built = []
+    client = LazyClient(lambda: built.append(1) or FakeProvider('groq'))
+    assert built == []
+    assert client.name == 'groq'
+    assert client.model == 'groq-model'
+    assert built == [1]
+
+
+def test_stub_provider_answers_quiz_prompts_deterministically():
+    stub = StubProvider(latency_ms=0)
+    prompt = [{'role': 'user', 'content': 'generate 3 question-answer pairs. "questions" Text: Chlorophyll absorbs light'}]
+    first, _ = stub.complete(prompt)
+    assert first == stub.complete(prompt)[0]
+    assert first.count('"question"') == 3
@@ -0,0 +1,61 @@
+import json
+import logging
+
+import pytest
+
+import app as app_module
+from logs import JsonFormatter
+from metrics import Registry
+
+
+def test_metrics_does_not_exist_without_a_token(client):
+    assert client.get('/metrics').status_code == 404
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'scrape-secret')
+    return 'scrape-secret'
+
+
+@pytest.mark.parametrize('headers', [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'scrape-secret'}])
+def test_metrics_rejects_a_missing_or_wrong_token(app, token, headers):
+    assert app.test_client().get('/metrics', headers=headers).status_code == 401
+
+
+def test_metrics_are_served_with_the_token(client, token):
+    client.get('/titles')
+    response = client.get('/metrics', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'thinkpal_http_request_duration_seconds_count{method="GET",route="/titles",status="200"}' in body
+    assert 'thinkpal_http_request_db_queries_bucket{method="GET",route="/titles",le="+Inf"}' in body
+    assert '# TYPE thinkpal_llm_router_events_total counter' in body
+
+
+def test_registry_renders_counters_histograms_and_collectors():
+    registry = Registry()
+    calls = registry.counter('calls_total', 'Calls', ('kind',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    calls.inc(kind='a')
+    calls.inc(2, kind='a')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    registry.collector(lambda: [('size', 'gauge', 'Size', [({'cache': 'q"1'}, 3.0)])])
+
+    lines = registry.render().splitlines()
+    assert 'calls_total{kind="a"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert 'size{cache="q\\"1"} 3' in lines
+
+
+def test_json_log_lines_carry_extra_fields():
+    record = logging.makeLogRecord({'name': 'thinkpal', 'levelname': 'INFO', 'msg': 'Saved note %d',
+                                    'args': (3,), 'note_num': 3})
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry['level'], entry['logger'], entry['message'], entry['note_num']) == ('INFO', 'thinkpal', 'Saved note 3', 3)
+    assert 'args' not in entry
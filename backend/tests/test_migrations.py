@@ -0,0 +1,58 @@
+from sqlalchemy import create_engine, inspect, text
+
+import app as app_module
+from migrations import MIGRATIONS, current_version, upgrade_database
+
+
+def index_names(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def test_fresh_database_gets_every_migration_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    assert upgrade_database(engine, app_module.db.metadata) == [number for number, _, _ in MIGRATIONS]
+    assert upgrade_database(engine, app_module.db.metadata) == []
+    with engine.connect() as conn:
+        assert current_version(conn) == MIGRATIONS[-1][0]
+
+    assert 'ix_tbl_titles_user_id_date_accessed' in index_names(engine, 'tbl_titles')
+    assert 'ix_tbl_quiz_note_num' in index_names(engine, 'tbl_quiz')
+    assert 'ix_tbl_tasks_user_id' in index_names(engine, 'tbl_tasks')
+
+
+def test_pre_migration_database_is_brought_up_to_date(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # tbl_note as it was created before indexes and note versions existed
+        conn.execute(text('CREATE TABLE tbl_note (note_num INTEGER PRIMARY KEY, title_num INTEGER NOT NULL, notes TEXT NOT NULL)'))
+        conn.execute(text("INSERT INTO tbl_note (note_num, title_num, notes) VALUES (1, 1, 'kept')"))
+
+    upgrade_database(engine, app_module.db.metadata)
+
+    assert 'ix_tbl_note_title_num' in index_names(engine, 'tbl_note')
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT notes, version FROM tbl_note')).one() == ('kept', 1)
+
+
+def test_db_upgrade_command(tmp_path):
+    flask_app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'cli.db'}", 'TESTING': True})
+    runner = flask_app.test_cli_runner()
+    assert f'Applied migrations: {[number for number, _, _ in MIGRATIONS]}' in runner.invoke(args=['db-upgrade']).output
+    assert 'schema is up to date' in runner.invoke(args=['db-upgrade']).output
+
+
+def test_note_documents_are_reindexed_as_plain_text(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'html.db'}")
+    upgrade_database(engine, app_module.db.metadata)
+    with engine.begin() as conn:
+        # A note indexed from its HTML before migration 6
+        conn.execute(text("INSERT INTO tbl_users (user_id, username, password, role) VALUES (1, 'a', 'x', 'user')"))
+        conn.execute(text("INSERT INTO tbl_titles (title_num, user_id, note_title) VALUES (1, 1, 'Plants')"))
+        conn.execute(text("INSERT INTO tbl_note (note_num, title_num, notes) VALUES (1, 1, '<p><strong>Light</strong></p>')"))
+        conn.execute(text("INSERT INTO tbl_search_documents (kind, ref_id, user_id, title_num, title, body)"
+                          " VALUES ('note', 1, 1, 1, 'Plants', '<p><strong>Light</strong></p>')"))
+        conn.execute(text('DELETE FROM tbl_schema_version WHERE version = 6'))
+
+    assert upgrade_database(engine, app_module.db.metadata) == [6]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT body FROM tbl_search_documents WHERE kind = 'note'")).scalars().all() == ['Light']
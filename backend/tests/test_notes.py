@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import text
+
+import app as app_module
+from tests.conftest import create_title
+
+NOTES = 'The mitochondria is the powerhouse of the cell.'
+
+
+@pytest.fixture
+def note_num(client):
+    return create_title(client, notes=NOTES)
+
+
+@pytest.fixture
+def concurrent_save(app, monkeypatch):
+    """Another save lands between the route loading the note and writing it."""
+    load = app_module.get_user_note_or_404
+
+    def load_then_race(num):
+        note = load(num)
+        with app_module.db.engine.begin() as conn:
+            conn.execute(text("UPDATE tbl_note SET notes = 'theirs', version = version + 1 WHERE note_num = :n"),
+                         {'n': num})
+        return note
+
+    monkeypatch.setattr(app_module, 'get_user_note_or_404', load_then_race)
+
+
+def test_put_bumps_the_version(client, note_num):
+    response = client.put(f'/notes/{note_num}', json={'notes': 'Edited', 'version': 1})
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 2
+    assert client.get(f'/notes/{note_num}').get_json()['notes'] == 'Edited'
+
+
+def test_put_with_stale_version_conflicts(client, note_num):
+    client.put(f'/notes/{note_num}', json={'notes': 'First', 'version': 1})
+    response = client.put(f'/notes/{note_num}', json={'notes': 'Second', 'version': 1})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 2
+
+
+def test_put_unchanged_text_keeps_the_version(client, note_num):
+    response = client.put(f'/notes/{note_num}', json={'notes': NOTES, 'version': 1})
+    assert response.get_json()['version'] == 1
+
+
+def test_put_loses_a_race_from_the_same_version(client, note_num, concurrent_save):
+    response = client.put(f'/notes/{note_num}', json={'notes': 'Mine', 'version': 1})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 2
+    assert client.get(f'/notes/{note_num}').get_json()['notes'] == 'theirs'
+
+
+def test_put_without_version_still_bumps_atomically(client, note_num, concurrent_save):
+    response = client.put(f'/notes/{note_num}', json={'notes': 'Mine'})
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 3
+
+
+def test_patch_applies_edits(client, note_num):
+    response = client.patch(f'/notes/{note_num}', json={
+        'version': 1, 'ops': [{'start': 4, 'end': 16, 'text': 'nucleus'}, {'start': 0, 'end': 0, 'text': '> '}]
+    })
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 2
+    assert client.get(f'/notes/{note_num}').get_json()['notes'] == '> The nucleus is the powerhouse of the cell.'
+
+
+def test_patch_loses_a_race_from_the_same_version(client, note_num, concurrent_save):
+    response = client.patch(f'/notes/{note_num}', json={'version': 1, 'ops': [{'start': 0, 'end': 3, 'text': 'A'}]})
+    assert response.status_code == 409
+    assert client.get(f'/notes/{note_num}').get_json()['notes'] == 'theirs'
+
+
+@pytest.mark.parametrize('body', [
+    {'ops': []},
+    {'version': 1, 'ops': 'x'},
+    {'version': 1, 'ops': [{'start': 5, 'end': 2}]},
+    {'version': 1, 'ops': [{'start': 0, 'end': 999, 'text': ''}]},
+    {'version': 1, 'ops': [{'start': 0, 'end': 5}, {'start': 3, 'end': 8}]},
+])
+def test_patch_rejects_bad_edits(client, note_num, body):
+    assert client.patch(f'/notes/{note_num}', json=body).status_code == 400
+
+
+def test_notes_of_other_users_are_hidden(client, make_client, note_num):
+    other = make_client('mallory')
+    assert other.put(f'/notes/{note_num}', json={'notes': 'x'}).status_code == 404
+    assert other.patch(f'/notes/{note_num}', json={'version': 1, 'ops': []}).status_code == 404
+    assert other.get(f'/notes/{note_num}').status_code == 403
@@ -0,0 +1,79 @@
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import pytest
+
+from pagination import NEXT_CURSOR_HEADER, ListRequestError, decode_cursor, encode_cursor
+from tests.conftest import create_title
+
+
+def walk(client, path, limit):
+    """Follow X-Next-Cursor from the first page to the last; returns every item and the page count."""
+    items, pages, cursor = [], 0, None
+    while True:
+        separator = '&' if '?' in path else '?'
+        url = f'{path}{separator}limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        items.extend(response.get_json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return items, pages
+
+
+def test_cursor_round_trips_datetimes():
+    values = [datetime(2024, 5, 1, 12, 30, 15, 250), 7]
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', encode_cursor([1]), encode_cursor({'a': 1})])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(ListRequestError):
+        decode_cursor(cursor, 2)
+
+
+def test_pages_cover_every_row_once(client):
+    created = [create_title(client, f'Title {i}') for i in range(7)]
+    items, pages = walk(client, '/titles', limit=3)
+    assert [item['title_num'] for item in items] == created
+    assert pages == 3
+
+
+def test_descending_pages_break_timestamp_ties(client):
+    # Titles created in the same instant share date_accessed; title_num keeps the order total
+    created = [create_title(client, f'Title {i}') for i in range(5)]
+    items, _ = walk(client, '/titles/sorted', limit=2)
+    assert sorted(item['title_num'] for item in items) == created
+    keys = [(parsedate_to_datetime(item['date_accessed']), item['title_num']) for item in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_without_a_limit_the_whole_list_is_returned(client):
+    for i in range(3):
+        create_title(client, f'Title {i}')
+    response = client.get('/titles')
+    assert len(response.get_json()) == 3
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_fields_projects_the_payload(client):
+    create_title(client, 'Only')
+    assert client.get('/titles').get_json()[0].keys() == {'title_num', 'note_title', 'user_id'}
+    assert client.get('/titles?fields=note_title').get_json() == [{'note_title': 'Only'}]
+
+
+def test_paging_with_projection_still_returns_a_cursor(client):
+    for i in range(3):
+        create_title(client, f'Title {i}')
+    items, pages = walk(client, '/titles?fields=note_title', limit=2)
+    assert [item['note_title'] for item in items] == ['Title 0', 'Title 1', 'Title 2']
+    assert pages == 2
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'limit=100000', 'fields=password', 'cursor=xyz'])
+def test_bad_list_parameters_are_a_400(client, query):
+    create_title(client)
+    response = client.get(f'/titles?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
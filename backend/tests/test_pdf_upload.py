@@ -0,0 +1,157 @@
+import io
+from functools import partial
+
+import pytest
+
+import app as app_module
+import pdf_ingest
+from benchmarks.bench_api import make_pdf
+from pdf_ingest import InvalidPdf, PdfTooLarge, extract_pdf_text, iter_pdf_pages, read_limited
+from tests.conftest import create_title
+
+
+def upload(client, title_num, data, **kwargs):
+    return client.post(f'/notes/upload?title_num={title_num}', data=data, content_type='application/pdf', **kwargs)
+
+
+def test_read_limited_stops_past_the_limit():
+    assert read_limited(io.BytesIO(b'x' * 100), limit=100, chunk_size=30) == b'x' * 100
+    with pytest.raises(PdfTooLarge):
+        read_limited(io.BytesIO(b'x' * 101), limit=100, chunk_size=30)
+
+
+def test_page_limit():
+    data = make_pdf(['one', 'two', 'three'])
+    assert extract_pdf_text(data, max_pages=3) == 'one\n\ntwo\n\nthree'
+    with pytest.raises(PdfTooLarge):
+        list(iter_pdf_pages(data, max_pages=2))
+
+
+@pytest.mark.parametrize('data', [b'hello', b'%PDF-1.4 truncated'])
+def test_unreadable_files_are_invalid(data):
+    with pytest.raises(InvalidPdf):
+        list(iter_pdf_pages(data))
+
+
+def test_large_documents_are_extracted_in_page_order(monkeypatch):
+    monkeypatch.setattr(pdf_ingest, 'PDF_PARALLEL_MIN_PAGES', 2)
+    monkeypatch.setattr(pdf_ingest, 'PDF_WORKERS', 2)
+    monkeypatch.setattr(pdf_ingest, '_executor', None)
+    pages = [f'page {i}' for i in range(5)]
+    try:
+        assert list(iter_pdf_pages(make_pdf(pages))) == pages
+    finally:
+        pdf_ingest._executor.shutdown()
+
+
+def test_upload_saves_the_extracted_text(client):
+    title_num = create_title(client)
+    response = upload(client, title_num, make_pdf(['Chlorophyll absorbs light.', 'The Calvin cycle fixes carbon.']))
+    assert response.status_code == 201
+    assert response.get_json()['notes'] == 'Chlorophyll absorbs light.\n\nThe Calvin cycle fixes carbon.'
+
+    # A second upload replaces the note and bumps its version
+    response = upload(client, title_num, make_pdf(['Mitochondria make ATP.']))
+    assert (response.get_json()['notes'], response.get_json()['version']) == ('Mitochondria make ATP.', 2)
+
+
+def test_multipart_upload(client):
+    title_num = create_title(client)
+    response = client.post(f'/notes/upload?title_num={title_num}', data={
+        'file': (io.BytesIO(make_pdf(['From a form.'])), 'notes.pdf'),
+    })
+    assert response.status_code == 201
+    assert response.get_json()['notes'] == 'From a form.'
+
+
+def test_oversized_upload_is_a_413(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'PDF_MAX_BYTES', 100)
+    title_num = create_title(client)
+    assert upload(client, title_num, make_pdf(['too big'])).status_code == 413
+
+
+def test_too_many_pages_is_a_413(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'extract_pdf_text', partial(extract_pdf_text, max_pages=1))
+    title_num = create_title(client)
+    assert upload(client, title_num, make_pdf(['one', 'two'])).status_code == 413
+
+
+def test_bad_uploads(client, make_client):
+    title_num = create_title(client)
+    assert upload(client, title_num, b'not a pdf').status_code == 400
+    assert upload(client, title_num, make_pdf([''])).status_code == 422
+    assert client.post('/notes/upload', data=make_pdf(['x']), content_type='application/pdf').status_code == 400
+    assert upload(make_client('bob'), title_num, make_pdf(['x'])).status_code == 403
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(app_module, 'PDF_MAX_BYTES', 100)
+
+
+def test_oversized_multipart_upload_is_rejected_before_parsing(client, small_limit):
+    title_num = create_title(client)
+    response = client.post(f'/notes/upload?title_num={title_num}', data={
+        'file': (io.BytesIO(make_pdf(['too big'])), 'notes.pdf'),
+    })
+    assert response.status_code == 413
+    assert 'error' in response.get_json()
+
+
+def test_chunked_upload_without_a_length_is_bounded(client, small_limit):
+    title_num = create_title(client)
+    # A chunked body has no usable Content-Length; the server marks the de-chunked input as terminated
+    response = client.post(f'/notes/upload?title_num={title_num}', input_stream=io.BytesIO(make_pdf(['too big'])),
+                           content_type='application/pdf', headers={'Transfer-Encoding': 'chunked'},
+                           environ_overrides={'wsgi.input_terminated': True})
+    assert response.status_code == 413
+
+
+def test_title_num_in_the_form_is_ignored(client):
+    title_num = create_title(client)
+    response = client.post('/notes/upload', data={
+        'title_num': str(title_num),
+        'file': (io.BytesIO(make_pdf(['From a form.'])), 'notes.pdf'),
+    })
+    assert response.status_code == 400
+
+
+def test_multipart_uploads_stay_in_memory(client, monkeypatch):
+    import tempfile
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError('upload spooled to a temp file')
+    monkeypatch.setattr(tempfile, 'SpooledTemporaryFile', no_temp_files)
+    monkeypatch.setattr(tempfile, 'TemporaryFile', no_temp_files)
+    title_num = create_title(client)
+    # Larger than the 500 KB Werkzeug keeps in memory by default
+    pdf = make_pdf(['Large upload.'] + ['x' * 6000] * 100)
+    response = client.post(f'/notes/upload?title_num={title_num}', data={'file': (io.BytesIO(pdf), 'notes.pdf')})
+    assert response.status_code == 201
+
+
+@pytest.fixture
+def corrupt_second_page(monkeypatch):
+    from PyPDF2 import PageObject
+    extract_text = PageObject.extract_text
+
+    def fail_on_page_two(page, *args, **kwargs):
+        text = extract_text(page, *args, **kwargs)
+        if text == 'two':
+            raise KeyError('/Filter')
+        return text
+    monkeypatch.setattr(PageObject, 'extract_text', fail_on_page_two)
+
+
+def test_unreadable_page_is_invalid(corrupt_second_page):
+    data = make_pdf(['one', 'two', 'three'])
+    with pytest.raises(InvalidPdf, match='page 2'):
+        list(iter_pdf_pages(data))
+    # The same check in the code the worker processes run
+    with pytest.raises(InvalidPdf, match='page 2'):
+        pdf_ingest._extract_range(data, 0, 3)
+
+
+def test_upload_with_an_unreadable_page_keeps_the_old_note(client, corrupt_second_page):
+    title_num = create_title(client, notes='Old note')
+    assert upload(client, title_num, make_pdf(['one', 'two'])).status_code == 400
+    assert client.get(f'/notes/{title_num}').get_json()['notes'] == 'Old note'
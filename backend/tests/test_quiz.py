@@ -0,0 +1,28 @@
+from tests.conftest import create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+def test_generate_quiz_saves_pairs(client):
+    title_num = create_title(client, notes=NOTES)
+    response = client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Plants', 'num_questions': 3})
+    assert response.status_code == 200
+    assert len(response.get_json()['quiz']) == 3
+    assert len(client.get('/quizzes').get_json()) == 3
+
+
+def test_generate_quiz_rejects_another_users_note(client, make_client):
+    title_num = create_title(client, notes=NOTES)
+    other = make_client('mallory')
+
+    response = other.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Stolen'})
+    assert response.status_code == 404
+    assert client.get('/quizzes').get_json() == []
+
+
+def test_quiz_job_rejects_another_users_note(client, make_client):
+    title_num = create_title(client, notes=NOTES)
+    other = make_client('mallory')
+
+    response = other.post('/jobs/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Stolen'})
+    assert response.status_code == 404
@@ -0,0 +1,187 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app as app_module
+from ratelimit import Limit, MemoryBackend, RateLimiter, SQLiteBackend
+from tests.conftest import BACKEND_DIR, create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    return MemoryBackend() if request.param == 'memory' else SQLiteBackend(str(tmp_path / 'rate.db'))
+
+
+def test_bucket_allows_the_burst_then_throttles(backend):
+    limit = Limit(rate_per_min=60, burst=3)
+    assert [backend.take('k', limit)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = backend.take('k', limit)
+    assert not allowed
+    assert 0 < retry_after <= 1
+
+
+def test_buckets_are_separate_per_key(backend):
+    limit = Limit(rate_per_min=60, burst=1)
+    assert backend.take('a', limit)[0]
+    assert backend.take('b', limit)[0]
+    assert not backend.take('a', limit)[0]
+
+
+def test_cost_is_charged_in_full(backend):
+    limit = Limit(rate_per_min=60, burst=5)
+    assert backend.take('k', limit, cost=3)[0]
+    assert not backend.take('k', limit, cost=3)[0]
+    assert backend.take('k', limit, cost=2)[0]
+
+
+def test_cost_above_the_burst_needs_a_full_bucket_and_leaves_debt(backend):
+    limit = Limit(rate_per_min=60, burst=5)
+    assert backend.take('k', limit, cost=8)[0]
+    allowed, retry_after = backend.take('k', limit)
+    assert not allowed
+    # 3 tokens of debt plus the one this request needs, at one token per second
+    assert 3.5 < retry_after <= 4
+
+
+def test_inflight_slots_are_capped_and_released(backend):
+    first = backend.acquire('user:1', 3, ttl=60, count=2)
+    assert len(first) == 2
+    assert backend.acquire('user:1', 3, ttl=60, count=2) is None
+    second = backend.acquire('user:1', 3, ttl=60)
+    assert backend.acquire('user:1', 3, ttl=60) is None
+    assert backend.acquire('user:2', 3, ttl=60) is not None
+
+    backend.release('user:1', first)
+    assert backend.acquire('user:1', 3, ttl=60, count=2) is not None
+    backend.release('user:1', second)
+
+
+def test_expired_sqlite_slots_are_reclaimed(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'rate.db'))
+    assert backend.acquire('user:1', 1, ttl=-1) is not None
+    assert backend.acquire('user:1', 1, ttl=60) is not None
+
+
+def test_limiter_checks_user_then_ip():
+    limiter = RateLimiter(MemoryBackend(), Limit(60, 1), Limit(60, 2))
+    assert limiter.check('ai', 1, '10.0.0.1') is None
+    assert limiter.check('ai', 1, '10.0.0.1')[0] == 'user'
+    assert limiter.check('ai', 2, '10.0.0.1') is None
+    assert limiter.check('ai', 3, '10.0.0.1')[0] == 'ip'
+    assert limiter.stats()['throttled_ip'] == 1
+
+
+def test_refund_gives_back_tokens_up_to_the_burst(backend):
+    limit = Limit(rate_per_min=1, burst=2)
+    assert backend.take('k', limit, cost=2)[0]
+    backend.refund('k', limit, cost=2)
+    backend.refund('k', limit, cost=2)
+    assert backend.take('k', limit, cost=2)[0]
+    assert not backend.take('k', limit)[0]
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_ip_rejection_does_not_spend_the_users_tokens(kind, tmp_path):
+    backend = MemoryBackend() if kind == 'memory' else SQLiteBackend(str(tmp_path / 'rate.db'))
+    limiter = RateLimiter(backend, Limit(1, 2), Limit(1, 1))
+    assert limiter.check('ai', 1, '10.0.0.1') is None
+    for _ in range(3):
+        assert limiter.check('ai', 1, '10.0.0.1')[0] == 'ip'
+    # The user still has the token the IP-rejected requests would have taken
+    assert limiter.check('ai', 1, '10.0.0.2') is None
+    assert limiter.check('ai', 1, '10.0.0.3')[0] == 'user'
+
+
+def test_limiter_holds_at_most_the_whole_allowance():
+    limiter = RateLimiter(MemoryBackend(), Limit(60, 10), Limit(60, 10), max_inflight=2)
+    slots = limiter.acquire('user:1', 10)
+    assert len(slots) == 2
+    assert limiter.acquire('user:1') is None
+    limiter.release('user:1', slots)
+    assert limiter.acquire('user:1') is not None
+
+
+def test_store_errors_let_requests_through(tmp_path):
+    limiter = RateLimiter(SQLiteBackend(str(tmp_path / 'rate.db')), Limit(60, 1), Limit(60, 1))
+    limiter.backend.path = str(tmp_path / 'missing' / 'rate.db')
+    assert limiter.check('ai', 1, 'ip') is None
+    assert limiter.acquire('user:1') == []
+    assert limiter.stats()['backend_errors'] == 3
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(MemoryBackend(), Limit(rate_per_min=1, burst=5), Limit(rate_per_min=1000, burst=1000),
+                          max_inflight=2)
+    monkeypatch.setattr(app_module, 'rate_limiter', limiter)
+    return limiter
+
+
+def test_ai_route_is_throttled_with_retry_after(client, limiter):
+    for _ in range(5):
+        assert client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'local'}).status_code == 200
+    response = client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'local'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+
+def test_quiz_batch_is_charged_per_note(client, limiter):
+    title_nums = [create_title(client, f'Title {i}', notes=f'{NOTES} ({i})') for i in range(5)]
+    response = client.post('/generate_quiz/batch', json={'title_nums': title_nums, 'quiz_title': 'Q', 'num_questions': 1})
+    assert response.status_code == 200
+
+    response = client.post('/generate_quiz', json={'title_num': title_nums[0], 'quiz_title': 'Q'})
+    assert response.status_code == 429
+
+
+def test_quiz_batch_holds_the_users_slots_while_it_runs(client, limiter, monkeypatch):
+    title_nums = [create_title(client, f'Title {i}', notes=f'{NOTES} ({i})') for i in range(3)]
+    held = []
+    generate = app_module.get_or_generate_quiz_pairs
+
+    def record_slots(text, num_questions):
+        held.append(len(limiter.backend._inflight.get('inflight:user:1', ())))
+        return generate(text, num_questions)
+
+    monkeypatch.setattr(app_module, 'get_or_generate_quiz_pairs', record_slots)
+    client.post('/generate_quiz/batch', json={'title_nums': title_nums, 'quiz_title': 'Q', 'num_questions': 1})
+    assert held == [2, 2, 2]
+    assert limiter.backend._inflight == {}
+
+
+def ip_limited_app(monkeypatch, tmp_path, proxy_count):
+    monkeypatch.setattr(app_module, 'PROXY_COUNT', proxy_count)
+    monkeypatch.setattr(app_module, 'rate_limiter',
+                        RateLimiter(MemoryBackend(), Limit(1000, 1000), Limit(rate_per_min=1, burst=1)))
+    return app_module.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'proxy.db'}", 'TESTING': True})
+
+
+def elaborate_from(client, forwarded_for):
+    return client.post('/groq/elaborate_note', json={'note_content': NOTES, 'fidelity_mode': 'local'},
+                       headers={'X-Forwarded-For': forwarded_for}).status_code
+
+
+def test_clients_behind_the_proxy_get_their_own_ip_bucket(monkeypatch, tmp_path):
+    client = ip_limited_app(monkeypatch, tmp_path, proxy_count=1).test_client()
+    assert elaborate_from(client, '203.0.113.1') == 200
+    assert elaborate_from(client, '203.0.113.2') == 200
+    assert elaborate_from(client, '203.0.113.1') == 429
+
+
+def test_unused_forwarded_for_is_warned_about(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(app_module, '_proxy_warning_logged', False)
+    client = ip_limited_app(monkeypatch, tmp_path, proxy_count=0).test_client()
+    assert elaborate_from(client, '203.0.113.1') == 200
+    assert elaborate_from(client, '203.0.113.2') == 429
+    assert 'PROXY_COUNT is 0' in caplog.text
+
+
+@pytest.mark.parametrize('env, expected', [({}, '0'), ({'RENDER': 'true'}, '1'), ({'RENDER': 'true', 'PROXY_COUNT': '2'}, '2')])
+def test_proxy_count_defaults_to_one_on_render(env, expected):
+    result = subprocess.run([sys.executable, '-c', 'import app; print(app.PROXY_COUNT)'], cwd=BACKEND_DIR,
+                            env={**os.environ, **env}, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == expected
@@ -0,0 +1,140 @@
+import pytest
+
+import app as app_module
+from search import fts5_query, html_to_text, like_snippet, search_documents_for_user
+from tests.conftest import create_title
+
+PLANTS = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+CELLS = 'Mitochondria produce ATP through cellular respiration.'
+# What the Quill editor saves
+PLANTS_HTML = ('<p><strong>Chlorophyll</strong> absorbs <span class="ql-size-large">blue</span> light.</p>'
+               '<ul><li>Uses x &lt; y &amp; <em>CO2</em></li></ul><p><br></p>')
+
+
+def search(client, query, **params):
+    response = client.get('/search', query_string={'q': query, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_finds_notes_by_body_and_highlights_the_match(client):
+    plants = create_title(client, 'Plants', notes=PLANTS)
+    create_title(client, 'Cells', notes=CELLS)
+
+    results = search(client, 'chlorophyll')['results']
+    assert [(r['kind'], r['ref_id']) for r in results] == [('note', plants)]
+    assert '<mark>Chlorophyll</mark>' in results[0]['snippet']
+
+
+def test_title_matches_rank_above_body_matches(client):
+    in_body = create_title(client, 'Cells', notes='Respiration happens in mitochondria.')
+    in_title = create_title(client, 'Respiration', notes='Glycolysis, Krebs cycle, electron transport.')
+    assert [r['ref_id'] for r in search(client, 'respiration')['results']] == [in_title, in_body]
+
+
+def test_last_term_matches_as_a_prefix(client):
+    plants = create_title(client, 'Plants', notes=PLANTS)
+    assert [r['ref_id'] for r in search(client, 'photosyn')['results']] == [plants]
+
+
+def test_index_follows_note_edits_and_deletes(client):
+    title_num = create_title(client, 'Plants', notes=PLANTS)
+    client.put(f'/notes/{title_num}', json={'notes': CELLS})
+    assert search(client, 'chlorophyll')['results'] == []
+    assert len(search(client, 'mitochondria')['results']) == 1
+
+    client.delete(f'/titles/{title_num}')
+    assert search(client, 'mitochondria')['results'] == []
+
+
+def test_quizzes_are_searchable_by_kind(client):
+    title_num = create_title(client, 'Plants', notes=PLANTS)
+    client.post('/generate_quiz', json={'title_num': title_num, 'quiz_title': 'Photosynthesis quiz', 'num_questions': 2})
+
+    quizzes = search(client, 'photosynthesis', kind='quiz')['results']
+    assert quizzes and {r['kind'] for r in quizzes} == {'quiz'}
+    assert {r['kind'] for r in search(client, 'photosynthesis', kind='note')['results']} == {'note'}
+
+
+def test_results_are_private(client, make_client):
+    create_title(client, 'Plants', notes=PLANTS)
+    assert search(make_client('bob'), 'chlorophyll')['results'] == []
+
+
+def test_results_are_paged(client):
+    for i in range(3):
+        create_title(client, f'Plants {i}', notes=PLANTS)
+    first = search(client, 'light', limit=2)
+    assert len(first['results']) == 2 and first['next_offset'] == 2
+    second = search(client, 'light', limit=2, offset=2)
+    assert len(second['results']) == 1 and second['next_offset'] is None
+
+
+@pytest.mark.parametrize('query', ['"', 'light AND (', 'NEAR(a b)', '*'])
+def test_fts_syntax_in_the_query_is_not_an_error(client, query):
+    create_title(client, 'Plants', notes=PLANTS)
+    search(client, query)
+
+
+def test_fts5_query_quotes_terms():
+    assert fts5_query('red "light') == '"red" "light"*'
+    assert fts5_query('()*') is None
+
+
+def test_like_fallback_matches_every_term(app, client):
+    plants = create_title(client, 'Plants', notes=PLANTS)
+    create_title(client, 'Cells', notes=CELLS)
+    with app.app_context():
+        conn = app_module.db.session.connection()
+        results = search_documents_for_user(conn, 1, 'red light', backend='like')
+        assert search_documents_for_user(conn, 1, 'red mitochondria', backend='like') == []
+    assert [r['ref_id'] for r in results] == [plants]
+    assert '<mark>light</mark>' in results[0]['snippet']
+
+
+@pytest.mark.parametrize('params, status', [({}, 400), ({'q': 'x', 'kind': 'task'}, 400), ({'q': 'x', 'offset': 'a'}, 400)])
+def test_bad_search_parameters(client, params, status):
+    assert client.get('/search', query_string=params).status_code == status
+
+
+def test_html_to_text_keeps_only_the_words():
+    assert html_to_text(PLANTS_HTML) == 'Chlorophyll absorbs blue light.\nUses x < y & CO2'
+    assert html_to_text(None) == ''
+
+
+def test_note_markup_is_not_searchable(client):
+    create_title(client, 'Plants', notes=PLANTS_HTML)
+    for markup in ('strong', 'span', 'class', 'ql', 'amp'):
+        assert search(client, markup)['results'] == [], markup
+    assert len(search(client, 'chlorophyll')['results']) == 1
+
+
+def test_snippets_are_escaped_text_with_marks(client):
+    create_title(client, 'Plants', notes=PLANTS_HTML)
+    snippet = search(client, 'uses')['results'][0]['snippet']
+    assert '<mark>Uses</mark> x &lt; y &amp; CO2' in snippet
+    assert '<strong>' not in snippet and '<li>' not in snippet
+
+
+def test_like_snippet_escapes_the_text():
+    assert like_snippet('if a < b & c then', ['b', 'c']) == 'if a &lt; <mark>b</mark> &amp; <mark>c</mark> then'
+
+
+def test_backend_is_rechecked_until_the_index_exists(tmp_path, monkeypatch):
+    import search
+    from sqlalchemy import create_engine
+    monkeypatch.setattr(search, 'LIKE_RECHECK_SECONDS', 0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'late.db'}")
+    with engine.begin() as conn:
+        assert search.detect_backend(conn) == 'like'
+        search.create_search_index(conn)
+        assert search.detect_backend(conn) == 'fts5'
+
+
+def test_like_fallback_treats_wildcards_literally(app, client):
+    exact = create_title(client, 'Snake', notes='The variable is called max_len here.')
+    create_title(client, 'Other', notes='The word maxxlen looks alike.')
+    with app.app_context():
+        conn = app_module.db.session.connection()
+        results = search_documents_for_user(conn, 1, 'max_len', backend='like')
+    assert [r['ref_id'] for r in results] == [exact]
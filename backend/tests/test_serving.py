@@ -0,0 +1,108 @@
+import os
+import runpy
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+import app as app_module
+from tests.conftest import BACKEND_DIR, create_title
+
+NOTES = 'Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs blue and red light.'
+
+
+@pytest.fixture
+def connections_during_llm_calls(app, monkeypatch):
+    """Record how many pooled connections are checked out whenever the LLM is called."""
+    with app.app_context():
+        pool = app_module.db.engine.pool
+    seen = []
+    complete = app_module.llm_router.complete
+
+    def record(*args, **kwargs):
+        seen.append(pool.checkedout())
+        return complete(*args, **kwargs)
+    monkeypatch.setattr(app_module.llm_router, 'complete', record)
+    return seen
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/generate_quiz', lambda title_num: {'title_num': title_num, 'quiz_title': 'Q'}),
+    ('/generate_quiz/batch', lambda title_num: {'title_nums': [title_num], 'quiz_title': 'Q'}),
+    ('/groq/elaborate_note', lambda title_num: {'note_content': NOTES, 'fidelity_mode': 'local'}),
+])
+def test_no_connection_is_held_while_waiting_on_the_llm(client, connections_during_llm_calls, path, body):
+    title_num = create_title(client, notes=NOTES)
+    response = client.post(path, json=body(title_num))
+    assert response.status_code == 200, response.get_json()
+    assert connections_during_llm_calls and set(connections_during_llm_calls) == {0}
+
+
+def load_gunicorn_conf(monkeypatch, **env):
+    environ = {k: v for k, v in os.environ.items()
+               if not k.startswith(('GUNICORN_', 'WEB_', 'DB_POOL', 'DB_MAX', 'QUIZ_CHUNK', 'JOB_WORKERS', 'LLM_HEDGE'))}
+    environ.update(env)
+    monkeypatch.setattr(os, 'environ', environ)
+    return runpy.run_path(os.path.join(BACKEND_DIR, 'gunicorn.conf.py')), environ
+
+
+def test_sync_is_the_default_profile(monkeypatch):
+    conf, environ = load_gunicorn_conf(monkeypatch)
+    # The same worker model and process count as gunicorn without this file
+    assert (conf['worker_class'], conf['workers'], conf['concurrency']) == ('sync', 1, 1)
+    assert 'threads' not in conf
+    assert (environ['DB_POOL_SIZE'], environ['DB_MAX_OVERFLOW']) == ('5', '5')
+
+
+def test_gthread_profile_scales_the_per_process_limits(monkeypatch):
+    conf, environ = load_gunicorn_conf(monkeypatch, GUNICORN_PROFILE='gthread')
+    assert (conf['worker_class'], conf['workers'], conf['threads']) == ('gthread', 2, 100)
+    assert (environ['DB_POOL_SIZE'], environ['QUIZ_CHUNK_WORKERS'], environ['JOB_WORKERS']) == ('10', '25', '10')
+    assert environ['LLM_HEDGE_WORKERS'] == str(2 * (100 + 2 * 25 + 10))
+
+
+def test_gevent_profile_scales_the_per_process_limits(monkeypatch):
+    conf, environ = load_gunicorn_conf(monkeypatch, GUNICORN_PROFILE='gevent', GUNICORN_CONNECTIONS='1000',
+                                       DB_POOL_SIZE='7')
+    assert (conf['worker_class'], conf['worker_connections']) == ('gevent', 1000)
+    assert conf['preload_app'] is False
+    assert (environ['DB_POOL_SIZE'], environ['DB_MAX_OVERFLOW'], environ['JOB_WORKERS']) == ('7', '20', '32')
+
+
+def test_sync_profile_serves_one_request_per_process(monkeypatch):
+    conf, environ = load_gunicorn_conf(monkeypatch, GUNICORN_PROFILE='sync', WEB_CONCURRENCY='3')
+    assert (conf['worker_class'], conf['workers'], conf['concurrency']) == ('sync', 3, 1)
+    assert environ['DB_POOL_SIZE'] == '5'
+
+
+def test_unknown_profile_is_rejected(monkeypatch):
+    with pytest.raises(ValueError):
+        load_gunicorn_conf(monkeypatch, GUNICORN_PROFILE='eventlet')
+
+
+class FakeServer:
+    class log:
+        info = error = staticmethod(lambda *args: None)
+
+
+def test_gunicorn_upgrades_the_schema_before_starting(monkeypatch, tmp_path):
+    path = tmp_path / 'deploy.db'
+    # The upgrade runs in a child process, which gets the real environment
+    monkeypatch.setenv('DATABASE_URI', f'sqlite:///{path}')
+    conf, _ = load_gunicorn_conf(monkeypatch)
+    conf['on_starting'](FakeServer)
+    assert 'tbl_titles' in inspect(create_engine(f'sqlite:///{path}')).get_table_names()
+
+
+def test_gunicorn_upgrade_can_be_left_to_the_deploy(monkeypatch, tmp_path):
+    path = tmp_path / 'deploy.db'
+    monkeypatch.setenv('DATABASE_URI', f'sqlite:///{path}')
+    conf, _ = load_gunicorn_conf(monkeypatch, DB_UPGRADE_ON_DEPLOY='0')
+    conf['on_starting'](FakeServer)
+    assert not path.exists()
+
+
+def test_failed_upgrade_stops_gunicorn(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'missing' / 'deploy.db'}")
+    conf, _ = load_gunicorn_conf(monkeypatch)
+    with pytest.raises(SystemExit):
+        conf['on_starting'](FakeServer)
@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight, SQLiteFlights
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def run_concurrently(flights, key, fn, callers=5):
+    """Start a leader, wait for it to be running, then add followers; returns every caller's future."""
+    pool = ThreadPoolExecutor(max_workers=callers)
+    futures = [pool.submit(flights[0].do, key, fn)]
+    # The leader is counted once it holds the key, just before it calls fn
+    wait_until(lambda: flights[0].stats()['leaders'] == 1)
+    futures += [pool.submit(flights[i % len(flights)].do, key, fn) for i in range(1, callers)]
+    return pool, futures
+
+
+def test_concurrent_callers_share_one_call():
+    flight, release, calls = SingleFlight('test'), threading.Event(), []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {'pairs': 3}
+
+    pool, futures = run_concurrently([flight], 'key', slow)
+    wait_until(lambda: flight.stats()['shared_local'] == 4)
+    release.set()
+    assert [f.result() for f in futures] == [{'pairs': 3}] * 5
+    assert len(calls) == 1
+    pool.shutdown()
+
+    # Once finished, the next call for the key runs again
+    release.set()
+    flight.do('key', slow)
+    assert len(calls) == 2
+
+
+def test_followers_get_the_leaders_error():
+    flight, release = SingleFlight('test'), threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError('upstream down')
+
+    pool, futures = run_concurrently([flight], 'key', failing, callers=3)
+    wait_until(lambda: flight.stats()['shared_local'] == 2)
+    release.set()
+    for future in futures:
+        with pytest.raises(RuntimeError, match='upstream down'):
+            future.result()
+    assert flight.stats()['in_flight'] == 0
+    pool.shutdown()
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight, release = SingleFlight('test'), threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    blocked = pool.submit(flight.do, 'a', lambda: release.wait(5))
+    wait_until(lambda: flight.stats()['in_flight'] == 1)
+    assert flight.do('b', lambda: 'b') == 'b'
+    release.set()
+    blocked.result()
+    pool.shutdown()
+
+
+def workers(tmp_path, count=2, **kwargs):
+    """SingleFlight instances standing in for separate gunicorn workers on one box."""
+    path = str(tmp_path / 'flights.db')
+    return [SingleFlight('test', SQLiteFlights(path, **kwargs), poll_interval=0.01) for _ in range(count)]
+
+
+def test_workers_share_one_call_through_the_lock_table(tmp_path):
+    first, second = workers(tmp_path)
+    release, calls = threading.Event(), []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {'pairs': 3}
+
+    pool, futures = run_concurrently([first, second], 'key', slow, callers=2)
+    time.sleep(0.05)
+    release.set()
+    assert [f.result() for f in futures] == [{'pairs': 3}] * 2
+    assert len(calls) == 1
+    assert second.stats()['shared_workers'] == 1
+    pool.shutdown()
+
+
+def test_a_failed_leader_hands_the_call_to_a_waiting_worker(tmp_path):
+    first, second = workers(tmp_path)
+    release, attempts = threading.Event(), []
+
+    def fail_first_time():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(5)
+            raise RuntimeError('upstream down')
+        return 'retried'
+
+    pool, futures = run_concurrently([first, second], 'key', fail_first_time, callers=2)
+    time.sleep(0.05)
+    release.set()
+    with pytest.raises(RuntimeError):
+        futures[0].result()
+    assert futures[1].result() == 'retried'
+    assert len(attempts) == 2
+    pool.shutdown()
+
+
+def test_claim_of_a_crashed_worker_expires(tmp_path):
+    first, second = workers(tmp_path, lock_ttl=0.1)
+    assert first.shared.claim('test:key', 'crashed-worker') == ('leader', None)
+    assert second.do('key', lambda: 'ran') == 'ran'
+
+
+def test_store_failure_runs_the_call_directly(tmp_path):
+    flight = workers(tmp_path, count=1)[0]
+    flight.shared.path = str(tmp_path / 'missing' / 'flights.db')
+    assert flight.do('key', lambda: 'ran') == 'ran'
+    assert flight.stats()['store_errors'] == 1
@@ -0,0 +1,65 @@
+import pytest
+
+import app as app_module
+from structured_output import parse_qa_pairs
+
+PAIRS = [{'question': 'What absorbs light?', 'answer': 'Chlorophyll'},
+         {'question': 'What fixes carbon?', 'answer': 'Calvin cycle'}]
+
+
+@pytest.mark.parametrize('reply', [
+    '{"questions": [{"question": "What absorbs light?", "answer": "Chlorophyll"},'
+    ' {"question": "What fixes carbon?", "answer": "Calvin cycle"}]}',
+    '[{"question": "What absorbs light?", "answer": "Chlorophyll"},'
+    ' {"question": "What fixes carbon?", "answer": "Calvin cycle"}]',
+    'Here is your quiz:\n```json\n[{"question": "What absorbs light?", "answer": "Chlorophyll",},'
+    ' {"question": "What fixes carbon?", "answer": "Calvin cycle"},]\n```',
+    '[{“question”: “What absorbs light?”, “answer”: “Chlorophyll”},'
+    ' {"Question": " What fixes carbon? ", "ANSWER": "Calvin cycle"}]',
+])
+def test_reply_shapes_parse_to_the_same_pairs(reply):
+    assert parse_qa_pairs(reply) == (PAIRS, 0)
+
+
+def test_truncated_reply_keeps_the_complete_items():
+    reply = ('{"questions": [{"question": "What absorbs light?", "answer": "Chlorophyll"},'
+             ' {"question": "What fixes carbon?", "answer": "Calvin cycle"}, {"question": "What is ATP')
+    assert parse_qa_pairs(reply) == (PAIRS, 0)
+
+
+def test_malformed_item_is_dropped_and_the_rest_kept():
+    reply = ('[{"question": "What absorbs light?", "answer": "Chlorophyll"},'
+             ' {"question": "Broken" "answer": "x"},'
+             ' {"question": "No answer"},'
+             ' "just a string",'
+             ' {"question": "What fixes carbon?", "answer": "Calvin cycle"}]')
+    assert parse_qa_pairs(reply) == (PAIRS, 3)
+
+
+def test_items_split_across_chunks():
+    reply = '[{"question": "What absorbs light?", "answer": "Chlorophyll"}, {"question": "What fixes carbon?", "answer": "Calvin cycle"}]'
+    chunks = [reply[i:i + 7] for i in range(0, len(reply), 7)]
+    assert parse_qa_pairs(chunks) == (PAIRS, 0)
+
+
+def test_brackets_and_escapes_inside_strings():
+    reply = r'[{"question": "What is [x] in \"f(x)\"?", "answer": "a, b]"}]'
+    assert parse_qa_pairs(reply) == ([{'question': 'What is [x] in "f(x)"?', 'answer': 'a, b]'}], 0)
+
+
+def test_numeric_answers_are_kept_as_text():
+    assert parse_qa_pairs('[{"question": "How many?", "answer": 3}]') == ([{'question': 'How many?', 'answer': '3'}], 0)
+
+
+def test_reply_without_pairs_is_retried(monkeypatch):
+    replies = ['Sorry, I cannot help with that.', '[{"question": "What absorbs light?", "answer": "Chlorophyll"}]']
+    monkeypatch.setattr(app_module.llm_router, 'complete', lambda *args, **kwargs: replies.pop(0))
+    assert app_module.generate_chunk_questions_with_groq('text', 5) == PAIRS[:1]
+    assert replies == []
+
+
+def test_retries_are_bounded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.llm_router, 'complete', lambda *args, **kwargs: calls.append(1) or 'no json')
+    assert app_module.generate_chunk_questions_with_groq('text', 5) == []
+    assert len(calls) == app_module.QUIZ_PARSE_RETRIES + 1
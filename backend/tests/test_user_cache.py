@@ -0,0 +1,49 @@
+import app as app_module
+from cache import MISSING, ResultCache
+from tests.conftest import count_queries
+
+
+def user_selects(statements):
+    return [s for s in statements if 'FROM tbl_users' in s]
+
+
+def test_logged_in_requests_skip_the_user_query(app, client):
+    client.get('/current-user')
+    with count_queries(app) as statements:
+        assert client.get('/protected').status_code == 200
+    assert user_selects(statements) == []
+
+
+def test_role_change_is_seen_on_the_next_request(client, make_client):
+    admin = make_client('root', role='admin')
+    user_id = client.get('/current-user').get_json()['user_id']
+    assert client.get('/admin/db-pool').status_code == 403
+
+    assert admin.put(f'/admin/update-user/{user_id}', json={'role': 'admin'}).status_code == 200
+    assert client.get('/current-user').get_json()['role'] == 'admin'
+    assert client.get('/admin/db-pool').status_code == 200
+
+
+def test_deleted_user_is_logged_out(client, make_client):
+    admin = make_client('root', role='admin')
+    user_id = client.get('/current-user').get_json()['user_id']
+
+    assert admin.delete(f'/admin/delete-user/{user_id}').status_code == 200
+    assert app_module.user_cache.get(str(user_id)) is MISSING
+    assert client.get('/current-user').status_code == 302
+
+
+def test_shared_user_cache_invalidates_every_worker(tmp_path):
+    path = str(tmp_path / 'users.db')
+    worker_a, worker_b = (ResultCache('user', shared_path=path, shared_only=True) for _ in range(2))
+    worker_a.set('1', {'user_id': 1, 'username': 'root', 'role': 'admin'})
+    assert worker_b.get('1')['role'] == 'admin'
+
+    worker_a.delete('1')
+    assert worker_b.get('1') is MISSING
+
+
+def test_user_cache_without_a_shared_tier_stays_local():
+    cache = ResultCache('user', shared_only=True)
+    cache.set('1', {'role': 'admin'})
+    assert cache.get('1') == {'role': 'admin'}